@@ -1,13 +1,18 @@
 import streamlit as st
-import yaml
 import os
 import asyncio
 import time
 import logging
 from datetime import datetime
-from dotenv import load_dotenv
 from debate_system import DebateAgent
 from debate_manager import DebateManager
+import transport
+import config_service
+import key_pool
+import tracing
+import debate_store
+import log_archive
+from usage import UsageTotals, BudgetExceeded, check_budget
 import json
 from logging.handlers import RotatingFileHandler
 from google.cloud import storage
@@ -93,19 +98,7 @@ def setup_logging():
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-# Clean up old log files at startup
-def cleanup_old_logs():
-    try:
-        for file in os.listdir():
-            if file.startswith('debate_logs_') and file.endswith('.log'):
-                os.remove(file)
-                logger.info(f"Cleaned up old log file: {file}")
-    except Exception as e:
-        logger.error(f"Error cleaning up old logs: {str(e)}")
-
-cleanup_old_logs()
-
-load_dotenv()
+config_service.load_env()
 st.set_page_config(page_title="AI Dinner Battle", layout="wide")
 
 # Define agent avatars and colors
@@ -126,38 +119,38 @@ AGENT_STYLES = {
 
 def load_config():
     try:
-        with open('config.yaml', 'r') as file:
-            config = yaml.safe_load(file)
-            logger.info("Configuration loaded successfully")
-            return config
-    except Exception as e:
+        config = config_service.get_config()
+        logger.debug("Configuration snapshot loaded")
+        return config
+    except config_service.ConfigError as e:
         logger.error(f"Failed to load configuration: {str(e)}")
         raise
 
 def init_agents(config):
-    # First try to get API key from .env file for local development
-    api_key = os.getenv("OPENROUTER_API_KEY")
+    # Keys from .env for local development (OPENROUTER_API_KEYS, a keys file or OPENROUTER_API_KEY)
+    pool = key_pool.get_pool()
     
     # If not found in .env, try Streamlit secrets
-    if not api_key:
-        api_key = st.secrets.get("OPENROUTER_API_KEY")
+    if not pool.has_keys():
+        secret_keys = st.secrets.get("OPENROUTER_API_KEYS", [])
+        if isinstance(secret_keys, str):
+            secret_keys = secret_keys.replace(",", " ").split()
+        pool.add_keys(list(secret_keys) + [st.secrets.get("OPENROUTER_API_KEY", "")])
     
-    if not api_key:
+    if not pool.has_keys():
         logger.error("OpenRouter API key not found in .env file or secrets")
         st.error("OpenRouter API key not found! Please check your .env file or secrets.")
         st.stop()
     
-    # Clean the API key
-    api_key = api_key.strip()
-    
-    # Log API key details (safely)
-    logger.info(f"API Key length: {len(api_key)}")
-    logger.info(f"API Key format check: starts with 'sk-or-v1-': {api_key.startswith('sk-or-v1-')}")
+    # Log API key pool details (safely - labels only, never the keys themselves)
+    logger.info(f"API key pool size: {len(pool)}")
+    for key_stats in pool.stats():
+        logger.info(f"API key available: {key_stats['label']}")
     
     try:
         agents = [
-            DebateAgent(config['agents']['openai'], api_key),
-            DebateAgent(config['agents']['deepseek'], api_key)
+            DebateAgent(name=config['agents']['openai']['name'], personality=config['agents']['openai']['personality']),
+            DebateAgent(name=config['agents']['deepseek']['name'], personality=config['agents']['deepseek']['personality'])
         ]
         logger.info("Agents initialized successfully")
         return agents
@@ -188,21 +181,36 @@ def show_debate_stats():
         
         st.sidebar.metric("Total Exchanges", len(st.session_state.conversation))
 
+def show_usage_stats():
+    """Show token usage and cost for the current debate and the whole session"""
+    debate = st.session_state.debate_usage.as_dict()
+    session = st.session_state.session_usage.as_dict()
+    st.sidebar.subheader("Token Usage")
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        st.metric("Debate Tokens", f"{debate['total_tokens']:,}")
+        st.metric("Session Tokens", f"{session['total_tokens']:,}")
+    with col2:
+        st.metric("Debate Cost", f"${debate['cost']:.4f}")
+        st.metric("Session Cost", f"${session['cost']:.4f}")
+    st.sidebar.caption(f"Average turn latency: {debate['avg_latency']:.2f}s")
+
 def export_conversation():
     conversation_text = ""
     for msg in st.session_state.conversation:
         conversation_text += f"{msg['agent']}: {msg['message']}\n\n"
     return conversation_text
 
-async def get_agent_response(agent, last_message, debate_prompt, conversation_history=None):
+async def get_agent_response(agent, last_message, conversation_history=None):
     try:
         logger.info(f"Getting response from {agent.name}")
         logger.debug(f"Last message: {last_message[:100]}...")
         
+        # Same arguments as the streamed and prefetched paths
         response = await agent.generate_response(
-            last_message,
-            debate_prompt,
-            conversation_history
+            context="",
+            opponent_message=last_message,
+            conversation_history=conversation_history
         )
         
         logger.info(f"Got response from {agent.name} ({len(response)} chars)")
@@ -214,48 +222,144 @@ async def get_agent_response(agent, last_message, debate_prompt, conversation_hi
         st.error(f"Failed to get response: {str(e)}")
         return None
 
-def save_conversation_to_json(message_data):
+def stream_agent_response(agent, last_message, conversation_history=None):
+    """Render an agent's reply token by token and return the full text"""
     try:
-        # Add timestamp if not present
-        if 'timestamp' not in message_data:
-            message_data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        bucket = init_storage()
-        if bucket:
-            # Cloud storage mode
-            conversation_file = 'debate_conversation.json'
-            blob = bucket.blob(f"conversations/{conversation_file}")
-            conversation = []
-            if blob.exists():
-                try:
-                    conversation = json.loads(blob.download_as_string())
-                except json.JSONDecodeError:
-                    logger.warning("Could not read existing conversation file, starting fresh")
-            
-            conversation.append(message_data)
-            blob.upload_from_string(
-                json.dumps(conversation, indent=2, ensure_ascii=False),
-                content_type='application/json'
-            )
-        else:
-            # Local file mode
-            conversation_file = 'debate_conversation.json'
-            conversation = []
-            if os.path.exists(conversation_file):
-                try:
-                    with open(conversation_file, 'r', encoding='utf-8') as f:
-                        conversation = json.load(f)
-                except json.JSONDecodeError:
-                    logger.warning("Could not read existing conversation file, starting fresh")
-            
-            conversation.append(message_data)
-            with open(conversation_file, 'w', encoding='utf-8') as f:
-                json.dump(conversation, f, indent=2, ensure_ascii=False)
-        
-        logger.info("Successfully saved conversation")
+        logger.info(f"Streaming response from {agent.name}")
+        style = AGENT_STYLES[agent.name]
         
+        span = tracing.start_span("ui.render", agent=agent.name, streamed=True)
+        with st.chat_message(name=agent.name, avatar=style['avatar']):
+            placeholder = st.empty()
+            placeholder.markdown(f"*{style['full_name']} is thinking...*")
+            
+            response = ""
+            stream = agent.generate_response_stream("", last_message, conversation_history)
+            for token in transport.iterate(stream):
+                response += token
+                placeholder.markdown(response + "▌")
+            placeholder.markdown(response)
+        span.end()
+        
+        timing = agent.last_timing or {}
+        logger.info(
+            f"Streamed response from {agent.name} ({len(response)} chars, "
+            f"ttft {timing.get('ttft', 0):.2f}s, total {timing.get('total_time', 0):.2f}s)"
+        )
+        return response
     except Exception as e:
-        logger.error(f"Failed to save conversation: {str(e)}")
+        logger.error(f"Failed to stream response from {agent.name}: {str(e)}")
+        st.error(f"Failed to get response: {str(e)}")
+        return None
+
+async def prefetch_agent_response(agent, last_message, conversation_history=None, totals=()):
+    """Generate a turn in the background, returning the reply with its timing and usage
+    
+    If the turn is cancelled, whatever usage the agent had already recorded
+    is added to ``totals`` as discarded usage.
+    """
+    try:
+        response = await agent.generate_response("", last_message, conversation_history)
+    except asyncio.CancelledError:
+        for total in totals:
+            total.add_discarded(agent.last_usage)
+        raise
+    return {
+        "response": response,
+        "timing": agent.last_timing or {},
+        "usage": agent.last_usage or {}
+    }
+
+def start_prefetch(speaker, last_message):
+    """Start the next speaker's turn so generation overlaps the response delay
+    
+    Nothing is started once the debate or session budget is spent; the check
+    at the top of the next rerun then stops the debate.
+    """
+    try:
+        check_budget(st.session_state.debate_usage, "debate")
+        check_budget(st.session_state.session_usage, "session")
+    except BudgetExceeded:
+        return False
+    agent = st.session_state.agents[speaker]
+    logger.info(f"Pre-generating response from {agent.name}")
+    # The totals are captured here: a new debate replaces debate_usage, and a
+    # turn discarded by it still belongs to the debate that started it
+    totals = (st.session_state.debate_usage, st.session_state.session_usage)
+    st.session_state.pending_turn = {
+        "speaker": speaker,
+        "future": transport.submit(
+            prefetch_agent_response(agent, last_message, list(st.session_state.conversation), totals)
+        ),
+        "totals": totals,
+        "reveal_at": time.monotonic() + st.session_state.debate_speed
+    }
+    return True
+
+def cancel_prefetch():
+    """Cancel or discard a pre-generated turn, keeping the usage it already spent"""
+    pending = st.session_state.get("pending_turn")
+    if pending:
+        future = pending["future"]
+        # A turn still in flight records its own usage when cancelled;
+        # a finished one is discarded here
+        if not future.cancel() and future.exception() is None:
+            for total in pending["totals"]:
+                total.add_discarded(future.result().get("usage"))
+        st.session_state.pending_turn = None
+
+def reveal_prefetched_turn(pending, agent):
+    """Wait out the response delay, then return the pre-generated turn (or None on failure)"""
+    remaining = pending["reveal_at"] - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+    
+    style = AGENT_STYLES[agent.name]
+    try:
+        with st.spinner(f"{style['avatar']} {style['full_name']} is thinking..."):
+            result = pending["future"].result()
+        logger.info(f"Got pre-generated response from {agent.name} ({len(result['response'] or '')} chars)")
+        return result
+    except Exception as e:
+        logger.error(f"Failed to get response from {agent.name}: {str(e)}")
+        st.error(f"Failed to get response: {str(e)}")
+        return None
+
+def save_conversation_to_json(message_data, debate_id=None):
+    """Save one message; locally it goes to the debate store under ``debate_id``"""
+    with tracing.span("app.save_conversation", agent=message_data.get("agent")) as span:
+        try:
+            # Add timestamp if not present
+            if 'timestamp' not in message_data:
+                message_data['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            bucket = init_storage()
+            span.set(storage="gcs" if bucket else "local")
+            if bucket:
+                # Cloud storage mode
+                conversation_file = 'debate_conversation.json'
+                blob = bucket.blob(f"conversations/{conversation_file}")
+                conversation = []
+                if blob.exists():
+                    try:
+                        conversation = json.loads(blob.download_as_string())
+                    except json.JSONDecodeError:
+                        logger.warning("Could not read existing conversation file, starting fresh")
+                
+                conversation.append(message_data)
+                blob.upload_from_string(
+                    json.dumps(conversation, indent=2, ensure_ascii=False),
+                    content_type='application/json'
+                )
+            else:
+                # Local mode: one row in the debate store instead of rewriting a JSON file
+                debate_id = debate_id or debate_store.new_debate_id()
+                debate_store.get_store().add_turn(debate_id, message_data)
+            
+            logger.info("Successfully saved conversation")
+            
+        except Exception as e:
+            logger.error(f"Failed to save conversation: {str(e)}")
 
 def export_conversation_to_text():
     try:
@@ -299,27 +403,12 @@ def export_conversation_to_text():
         logger.error(f"Failed to export conversation: {str(e)}")
         return None
 
-def manage_old_logs(max_logs=10):
-    """Keep only the most recent N session logs"""
-    try:
-        # Get all debate session logs (both regular and full logs)
-        logs = [f for f in os.listdir() if 
-                (f.startswith('debate_session_') and 
-                 (f.endswith('.log') or f.endswith('_full.log')))]
-        # Sort by modification time (newest first)
-        logs.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-        
-        # Remove old logs beyond max_logs
-        for old_log in logs[max_logs:]:
-            os.remove(old_log)
-            print(f"Removed old session log: {old_log}")
-    except Exception as e:
-        print(f"Error managing old logs: {str(e)}")
-
 def setup_debate_log():
     """Create a new debate log file for the session"""
     session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     debate_log_file = f'debate_session_{session_timestamp}_full.log'
+    # Appended to for the whole session, possibly with long idle gaps
+    log_archive.hold(debate_log_file)
     
     with open(debate_log_file, 'w') as f:
         f.write("=== AI Dinner Battle Debate Log ===\n")
@@ -328,32 +417,34 @@ def setup_debate_log():
     return debate_log_file
 
 def log_debate_message(log_file: str, agent: str, message: str, is_thinking: bool = False):
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        content = f"[{timestamp}] {agent}"
-        content += " is thinking...\n" if is_thinking else f":\n{message}\n\n"
-        
-        bucket = init_storage()
-        if bucket:
-            # Cloud storage mode
-            blob = bucket.blob(f"debate_logs/{log_file}")
-            current_content = ""
-            if blob.exists():
-                current_content = blob.download_as_string().decode('utf-8')
-            blob.upload_from_string(current_content + content)
-        else:
-            # Local file mode
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(content)
-        
-    except Exception as e:
-        logger.error(f"Failed to log debate message: {str(e)}")
+    with tracing.span("app.log_message", agent=agent, thinking=is_thinking) as span:
+        try:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            content = f"[{timestamp}] {agent}"
+            content += " is thinking...\n" if is_thinking else f":\n{message}\n\n"
+            
+            bucket = init_storage()
+            span.set(storage="gcs" if bucket else "local")
+            if bucket:
+                # Cloud storage mode
+                blob = bucket.blob(f"debate_logs/{log_file}")
+                current_content = ""
+                if blob.exists():
+                    current_content = blob.download_as_string().decode('utf-8')
+                blob.upload_from_string(current_content + content)
+            else:
+                # Local file mode
+                with open(log_file, 'a', encoding='utf-8') as f:
+                    f.write(content)
+            
+        except Exception as e:
+            logger.error(f"Failed to log debate message: {str(e)}")
 
 def main():
     # Set up new logging session when starting new debate
     if 'config' not in st.session_state:
-        cleanup_old_logs()  # Clean up old format logs
-        manage_old_logs()   # Manage session logs
+        # Archive and expire old logs on a background thread, off the request path
+        log_archive.start()
         
         global logger
         logger = setup_logging()
@@ -362,6 +453,7 @@ def main():
         # Set up debate log file
         st.session_state.debate_log_file = setup_debate_log()
         logger.info(f"Created debate log file: {st.session_state.debate_log_file}")
+        st.session_state.debate_id = debate_store.new_debate_id()
         
         st.session_state.config = load_config()
         st.session_state.agents = init_agents(st.session_state.config)
@@ -369,6 +461,12 @@ def main():
         st.session_state.current_speaker = 0
         st.session_state.debate_active = False
         st.session_state.debate_speed = 5
+        st.session_state.stream_responses = True
+        st.session_state.debate_usage = UsageTotals()
+        st.session_state.session_usage = UsageTotals()
+    else:
+        # Cheap snapshot lookup; picks up live edits to config.yaml
+        st.session_state.config = load_config()
     
     # Title with styled header
     st.markdown("""
@@ -566,12 +664,16 @@ def main():
             st.session_state.conversation = []
             st.session_state.current_speaker = 0
             st.session_state.debate_active = True
+            st.session_state.debate_usage = UsageTotals()
+            st.session_state.debate_id = debate_store.new_debate_id()
+            cancel_prefetch()
             st.rerun()
     
     with col2:
         if st.button("🛑 Stop Debate", key="stop_button"):
             logger.info("Stopping debate")
             st.session_state.debate_active = False
+            cancel_prefetch()
             st.info("Debate stopped")
     
     with col3:
@@ -581,6 +683,10 @@ def main():
             max_value=10, 
             value=st.session_state.debate_speed
         )
+        st.session_state.stream_responses = st.checkbox(
+            "⚡ Stream Responses",
+            value=st.session_state.get("stream_responses", True)
+        )
     
     with col4:
         if st.button("📝 Export Transcript", key="export_button"):
@@ -594,6 +700,7 @@ def main():
     st.markdown("<div class='message-container'><div class='timeline'>", unsafe_allow_html=True)
     
     # Reverse the conversation list to show newest messages first
+    render_span = tracing.start_span("ui.render_conversation", messages=len(st.session_state.conversation))
     for msg in reversed(st.session_state.conversation):
         with st.chat_message(
             name=msg["agent"], 
@@ -639,6 +746,22 @@ def main():
                 """, unsafe_allow_html=True)
     
     st.markdown("</div></div>", unsafe_allow_html=True)
+    render_span.end()
+    
+    show_debate_stats()
+    show_usage_stats()
+    
+    # Stop before the next call once the debate or session budget is spent
+    if st.session_state.debate_active:
+        try:
+            check_budget(st.session_state.debate_usage, "debate")
+            check_budget(st.session_state.session_usage, "session")
+        except BudgetExceeded as e:
+            logger.warning(str(e))
+            log_debate_message(st.session_state.debate_log_file, "System", f"Debate stopped: {e}")
+            st.warning(f"Debate stopped: {e}")
+            st.session_state.debate_active = False
+            cancel_prefetch()
     
     # Continue debate if active
     if st.session_state.debate_active:
@@ -648,48 +771,86 @@ def main():
         # Log thinking state
         log_debate_message(st.session_state.debate_log_file, current_agent.name, "", True)
         
-        # Show thinking indicator with colored avatar
-        with st.spinner(f"{AGENT_STYLES[current_agent.name]['avatar']} {AGENT_STYLES[current_agent.name]['full_name']} is thinking..."):
-            last_message = (st.session_state.conversation[-1]["message"] 
-                          if st.session_state.conversation 
-                          else "Start the debate by introducing yourself and your approach to AI development.")
-            
-            logger.info(f"Getting response from {current_agent.name}")
-            response = asyncio.run(get_agent_response(
+        last_message = (st.session_state.conversation[-1]["message"] 
+                      if st.session_state.conversation 
+                      else "Start the debate by introducing yourself and your approach to AI development.")
+        
+        pending = st.session_state.get("pending_turn")
+        if pending and pending["speaker"] != st.session_state.current_speaker:
+            cancel_prefetch()
+            pending = None
+        
+        if pending:
+            # Started in the background while the previous reply was on screen
+            result = reveal_prefetched_turn(pending, current_agent) or {}
+            st.session_state.pending_turn = None
+            response = result.get("response")
+            timing = result.get("timing", {})
+            usage = result.get("usage", {})
+        elif st.session_state.stream_responses:
+            # Render tokens as they arrive instead of waiting behind a spinner
+            response = stream_agent_response(
                 current_agent,
                 last_message,
-                st.session_state.config['debate_prompt'],
                 st.session_state.conversation
-            ))
+            )
+        else:
+            # Show thinking indicator with colored avatar
+            with st.spinner(f"{AGENT_STYLES[current_agent.name]['avatar']} {AGENT_STYLES[current_agent.name]['full_name']} is thinking..."):
+                logger.info(f"Getting response from {current_agent.name}")
+                response = transport.run(get_agent_response(
+                    current_agent,
+                    last_message,
+                    st.session_state.conversation
+                ))
+        
+        if not pending:
+            timing = current_agent.last_timing or {}
+            usage = current_agent.last_usage or {}
+        
+        if response:
+            logger.info(f"Adding response from {current_agent.name}")
+            # Log the debate message
+            log_debate_message(st.session_state.debate_log_file, current_agent.name, response)
             
-            if response:
-                logger.info(f"Adding response from {current_agent.name}")
-                # Log the debate message
-                log_debate_message(st.session_state.debate_log_file, current_agent.name, response)
-                
-                message_data = {
-                    "agent": current_agent.name,
-                    "message": response,
-                    "recipient": st.session_state.agents[1 - st.session_state.current_speaker].name
-                }
-                
-                # Save to conversation JSON file
-                save_conversation_to_json(message_data)
-                
-                st.session_state.conversation.append({
-                    "agent": current_agent.name,
-                    "message": response
-                })
-                st.session_state.current_speaker = 1 - st.session_state.current_speaker
+            st.session_state.debate_usage.add(usage)
+            st.session_state.session_usage.add(usage)
+            message_data = {
+                "agent": current_agent.name,
+                "message": response,
+                "recipient": st.session_state.agents[1 - st.session_state.current_speaker].name,
+                "ttft": timing.get("ttft"),
+                "total_time": timing.get("total_time"),
+                "model": usage.get("model"),
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "cost": usage.get("cost", 0.0)
+            }
+            
+            # Save to conversation JSON file
+            save_conversation_to_json(message_data, st.session_state.debate_id)
+            
+            st.session_state.conversation.append({
+                "agent": current_agent.name,
+                "message": response
+            })
+            st.session_state.current_speaker = 1 - st.session_state.current_speaker
+            if st.session_state.stream_responses:
+                # A prefetched turn is generated without streaming, so with
+                # streaming on the next turn is generated (and shown) after the delay
                 time.sleep(st.session_state.debate_speed)
-                st.rerun()
             else:
-                error_msg = f"Failed to get response from {current_agent.name}"
-                logger.error(error_msg)
-                # Log the error in debate log
-                log_debate_message(st.session_state.debate_log_file, "System", f"Error: {error_msg}")
-                st.error(error_msg)
-                st.session_state.debate_active = False
+                # The delay slider only controls when the next reply is revealed;
+                # its generation starts now, so each turn takes max(delay, generation time)
+                start_prefetch(st.session_state.current_speaker, response)
+            st.rerun()
+        else:
+            error_msg = f"Failed to get response from {current_agent.name}"
+            logger.error(error_msg)
+            # Log the error in debate log
+            log_debate_message(st.session_state.debate_log_file, "System", f"Error: {error_msg}")
+            st.error(error_msg)
+            st.session_state.debate_active = False
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,301 @@
+"""Headless batch runner: many debates at once on a single event loop.
+
+Every combination of ``topics`` and ``debate_styles`` in config.yaml (or a
+filtered subset) becomes one debate with its own DebateManager and fresh
+agents, whose prompts carry the topic and the style's ``prompt_suffix``. A
+semaphore bounds how many debates are in flight; the shared connection
+pool, rate limiter and key pool keep the provider side in check. Each
+transcript is written as JSON to the output directory, followed by a
+``summary.json`` with throughput figures.
+
+A debate that ran all its turns is ``completed`` only if every turn is a
+real model reply. Turns that fell back to a placeholder (no API key, or
+the API call failed) make it ``degraded``, or ``failed`` if no turn got a
+real reply; the transcript's ``error`` says how many.
+
+Usage:
+    python batch_runner.py --turns 6 --concurrency 16 --output-dir logs/batch
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config_service
+import response_cache
+import transport
+from debate_manager import DebateManager
+from debate_system import DebateAgent
+from usage import BudgetExceeded, UsageTotals, check_budget
+
+
+def slugify(text: str) -> str:
+    return re.sub(r'[^\w\-]+', '_', text).strip('_').lower()
+
+
+def build_jobs(config: dict, topics: Optional[List[str]] = None, styles: Optional[List[str]] = None) -> List[Dict]:
+    """Cross product of topics and debate styles, optionally filtered by name/key"""
+    jobs = []
+    for topic in config.get('topics', []):
+        if topics and topic['name'] not in topics:
+            continue
+        for style_key, style in config.get('debate_styles', {}).items():
+            if styles and style_key not in styles:
+                continue
+            jobs.append({
+                "id": f"{len(jobs):04d}_{slugify(topic['name'])}_{style_key}",
+                "topic": topic,
+                "style_key": style_key,
+                "style": style
+            })
+    return jobs
+
+
+def job_prompt_suffix(job: Dict) -> str:
+    """Topic line, the style's prompt_suffix and the language, appended to both agents' prompts"""
+    topic = job["topic"]
+    lines = [f"Debate topic: {topic['name']}"]
+    if topic.get("description"):
+        lines[0] += f" - {topic['description']}"
+    if job["style"].get("prompt_suffix"):
+        lines.append(job["style"]["prompt_suffix"])
+    if job.get("language"):
+        lines.append(f"Respond in {job['language']}.")
+    return "\n".join(lines)
+
+
+def make_agents(config: dict, job: Dict):
+    """Fresh agents per debate, so timing and usage never mix across debates
+    
+    A job may override each agent's model (``models``, keyed like the
+    ``agents`` section) and the sampling ``temperature``.
+    """
+    suffix = job_prompt_suffix(job)
+    agents = config.get('agents', {})
+    models = job.get("models") or {}
+    return tuple(
+        DebateAgent(name=agents[key]['name'], personality=agents[key]['personality'], prompt_suffix=suffix,
+                    model=models.get(key), temperature=job.get("temperature"))
+        for key in ("openai", "deepseek")
+    )
+
+
+def _turn_usage(turn: Dict) -> Dict:
+    return {
+        "prompt_tokens": turn.get("prompt_tokens", 0),
+        "completion_tokens": turn.get("completion_tokens", 0),
+        "cost": turn.get("cost", 0.0),
+        "latency": turn.get("total_time")
+    }
+
+
+def placeholder_turns(conversation: List[Dict]) -> int:
+    """Number of turns answered by a placeholder instead of a model"""
+    return sum(1 for turn in conversation if turn.get("model") is None)
+
+
+async def run_job(job: Dict, config: dict, turns: int, use_cache: bool, session_totals: UsageTotals,
+                  budget_scale: float = 1.0) -> Dict:
+    """Run one debate to ``turns`` turns (or until its budget runs out)
+    
+    ``budget_scale`` is the share of the session budget ``session_totals``
+    may spend (see ``usage.check_budget``).
+    """
+    started = time.perf_counter()
+    start_time = datetime.now().isoformat()
+    status = "completed"
+    error = None
+    manager = None
+
+    try:
+        check_budget(session_totals, "session", budget_scale)
+        agent1, agent2 = make_agents(config, job)
+        manager = DebateManager(agent1, agent2, job["topic"]["name"], use_cache=use_cache)
+
+        await manager.start_debate()
+        session_totals.add(_turn_usage(manager.conversation_history[-1]))
+        while len(manager.conversation_history) < turns:
+            check_budget(session_totals, "session", budget_scale)
+            await manager.next_turn()
+            session_totals.add(_turn_usage(manager.conversation_history[-1]))
+    except BudgetExceeded as e:
+        status = "budget_exceeded"
+        error = str(e)
+    except Exception as e:
+        status = "failed"
+        error = f"{type(e).__name__}: {e}"
+
+    conversation = []
+    for turn in (manager.conversation_history if manager else []):
+        turn = dict(turn)
+        turn["timestamp"] = turn["timestamp"].isoformat()
+        conversation.append(turn)
+
+    placeholders = placeholder_turns(conversation)
+    if status == "completed" and placeholders:
+        status = "failed" if placeholders == len(conversation) else "degraded"
+        error = f"{placeholders} of {len(conversation)} turns are placeholder replies"
+
+    return {
+        "metadata": {
+            "id": job["id"],
+            "topic": job["topic"]["name"],
+            "style": job["style_key"],
+            "language": job.get("language"),
+            "models": job.get("models"),
+            "temperature": job.get("temperature"),
+            "prompt_suffix": job_prompt_suffix(job),
+            "start_time": start_time,
+            "end_time": datetime.now().isoformat(),
+            "duration": round(time.perf_counter() - started, 3),
+            "status": status,
+            "error": error,
+            "usage": manager.usage_totals.as_dict() if manager else UsageTotals().as_dict()
+        },
+        "conversation": conversation
+    }
+
+
+def write_transcript(output_dir: Path, result: Dict) -> Path:
+    path = output_dir / f"debate_{result['metadata']['id']}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(p * len(values)) - 1))]
+
+
+def summarize(results: List[Dict], wall_time: float, concurrency: int) -> Dict:
+    """Throughput, latency and cost figures for a finished batch"""
+    totals = UsageTotals()
+    latencies = []
+    statuses: Dict[str, int] = {}
+    for result in results:
+        status = result["metadata"]["status"]
+        statuses[status] = statuses.get(status, 0) + 1
+        for turn in result["conversation"]:
+            totals.add(_turn_usage(turn))
+            if turn.get("total_time") is not None:
+                latencies.append(turn["total_time"])
+
+    usage = totals.as_dict()
+    summary = {
+        "debates": len(results),
+        "statuses": statuses,
+        "turns": usage["turns"],
+        "concurrency": concurrency,
+        "wall_time": round(wall_time, 3),
+        "debates_per_minute": round(len(results) / wall_time * 60, 2) if wall_time else 0.0,
+        "turns_per_second": round(usage["turns"] / wall_time, 3) if wall_time else 0.0,
+        "tokens_per_second": round(usage["total_tokens"] / wall_time, 1) if wall_time else 0.0,
+        "turn_latency_p50": round(_percentile(latencies, 0.5), 3),
+        "turn_latency_p95": round(_percentile(latencies, 0.95), 3),
+        "usage": usage
+    }
+    cache = response_cache.get_cache()
+    if cache:
+        summary["cache"] = cache.stats()
+    return summary
+
+
+def print_summary(summary: Dict, out=sys.stdout):
+    usage = summary["usage"]
+    print("\n=== Batch Summary ===", file=out)
+    print(f"Debates: {summary['debates']} ({', '.join(f'{k}: {v}' for k, v in summary['statuses'].items())})", file=out)
+    print(f"Turns: {summary['turns']} in {summary['wall_time']:.1f}s with concurrency {summary['concurrency']}", file=out)
+    print(f"Throughput: {summary['debates_per_minute']:.1f} debates/min, "
+          f"{summary['turns_per_second']:.2f} turns/s, {summary['tokens_per_second']:.0f} tokens/s", file=out)
+    print(f"Turn latency: p50 {summary['turn_latency_p50']:.2f}s, p95 {summary['turn_latency_p95']:.2f}s", file=out)
+    print(f"Tokens: {usage['total_tokens']} ({usage['prompt_tokens']} prompt / {usage['completion_tokens']} completion), "
+          f"cost ${usage['cost']:.4f}", file=out)
+    if "cache" in summary:
+        print(f"Cache hit rate: {summary['cache']['hit_rate']:.0%}", file=out)
+
+
+async def run_batch(jobs: List[Dict], config: dict, turns: int = 6, concurrency: int = 8,
+                    output_dir: str = "logs/batch", use_cache: bool = True, out=sys.stdout) -> Dict:
+    """Run ``jobs`` with at most ``concurrency`` debates in flight and write their transcripts
+
+    Returns:
+        The batch summary (also written to ``summary.json``)
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    session_totals = UsageTotals()
+    results = []
+
+    async def worker(job):
+        async with semaphore:
+            result = await run_job(job, config, turns, use_cache, session_totals)
+        write_transcript(output_path, result)
+        results.append(result)
+        meta = result["metadata"]
+        print(f"[{len(results)}/{len(jobs)}] {meta['id']}: {meta['status']} "
+              f"({len(result['conversation'])} turns, {meta['duration']:.1f}s)", file=out)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(job) for job in jobs))
+    finally:
+        await transport.aclose()
+
+    results.sort(key=lambda r: r["metadata"]["id"])
+    summary = summarize(results, time.perf_counter() - started, concurrency)
+    with open(output_path / "summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run many debates concurrently across topics and debate styles')
+    parser.add_argument('--turns', type=int, default=6,
+                        help='Number of turns per debate')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum number of debates in flight')
+    parser.add_argument('--output-dir', default=os.path.join('logs', 'batch', datetime.now().strftime("%Y%m%d_%H%M%S")),
+                        help='Directory for transcripts and summary.json')
+    parser.add_argument('--topics', nargs='+',
+                        help='Only run these topic names (default: all topics in config.yaml)')
+    parser.add_argument('--styles', nargs='+',
+                        help='Only run these debate style keys (default: all debate_styles)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always request fresh responses instead of reusing cached ones')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show per-turn agent output instead of progress lines only')
+    args = parser.parse_args()
+
+    try:
+        config = config_service.get_config()
+    except config_service.ConfigError as e:
+        parser.error(str(e))
+
+    jobs = build_jobs(config, args.topics, args.styles)
+    if not jobs:
+        parser.error("No debates match the selected topics and styles")
+    print(f"Running {len(jobs)} debates x {args.turns} turns (concurrency {args.concurrency}) -> {args.output_dir}")
+
+    out = sys.stdout
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)):
+        summary = asyncio.run(run_batch(jobs, config, args.turns, args.concurrency, args.output_dir,
+                                        use_cache=not args.no_cache, out=out))
+    print_summary(summary, out)
+
+
+if __name__ == "__main__":
+    main()
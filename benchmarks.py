@@ -0,0 +1,437 @@
+"""Offline benchmark suite for the turn pipeline, logger and exporters.
+
+Each benchmark times a target over several rounds (with untimed setup per
+round, in the style of pytest-benchmark's ``pedantic`` mode) and reports
+min/max/mean/median/stddev. Nothing touches the network: the turn
+pipeline runs against an ``httpx.MockTransport`` and file writers work in
+a temporary directory.
+
+Results are written as JSON (pytest-benchmark's layout: ``machine_info``,
+``datetime`` and a ``benchmarks`` list). ``--compare`` checks the run
+against a stored baseline and exits with status 1 if any median got
+slower than the threshold allows.
+
+Usage:
+    python benchmarks.py --save-baseline logs/benchmarks/baseline.json
+    python benchmarks.py --compare logs/benchmarks/baseline.json [--threshold 0.25]
+    python benchmarks.py --quick --only logger
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+import debate_store
+import key_pool
+import rate_limiter
+import transport
+
+# Turn counts for the logger benchmarks; --quick swaps the largest for 1000
+LOGGER_SIZES = (10, 100, 10000)
+QUICK_LOGGER_SIZES = (10, 100, 1000)
+
+MESSAGE = ("*delicately plates a dish with tweezers*\n\"Our approach to AI is like fine dining - "
+           "it costs more, but the quality speaks for itself.\"")
+
+_registry: List[Dict] = []
+
+
+def benchmark(group: str, name: str, **params):
+    """Register a benchmark factory
+
+    The factory takes a scratch directory plus ``params`` and returns
+    ``(target, setup, rounds, teardown)``: ``setup()`` runs before every
+    round and is not timed, ``target()`` is timed, and ``teardown()`` runs
+    once at the end. ``setup`` and ``teardown`` may be None.
+    """
+    def register(factory: Callable):
+        _registry.append({"group": group, "name": name, "params": params, "factory": factory})
+        return factory
+    return register
+
+
+def measure(target: Callable, setup: Optional[Callable] = None, rounds: int = 5) -> Dict:
+    """Time ``target`` over ``rounds`` rounds, calling ``setup`` untimed before each"""
+    timings = []
+    for _ in range(rounds):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        target()
+        timings.append(time.perf_counter() - start)
+    mean = statistics.mean(timings)
+    return {
+        "min": min(timings),
+        "max": max(timings),
+        "mean": mean,
+        "median": statistics.median(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "rounds": rounds,
+        "ops": 1 / mean if mean else 0.0,
+        "data": timings
+    }
+
+
+def fake_history(turns: int) -> List[Dict]:
+    """Alternating turns in the shape DebateLogger and the managers store"""
+    now = datetime.now()
+    history = []
+    for i in range(turns):
+        agent = "OpenAI" if i % 2 == 0 else "DeepSeek"
+        history.append({
+            "agent": agent,
+            "agent_identity": agent,
+            "message": MESSAGE,
+            "timestamp": now.isoformat(),
+            "model": "openai/gpt-4-turbo-preview" if agent == "OpenAI" else "deepseek/deepseek-chat",
+            "prompt_tokens": 500,
+            "completion_tokens": 40,
+            "latency": 1.0,
+            "cost": 0.0001
+        })
+    return history
+
+
+def quiet_logger_handlers():
+    """Keep the debate loggers' shared console handler off the benchmark output"""
+    from debate_logger import get_console_handler
+    get_console_handler().setLevel(logging.CRITICAL + 1)
+
+
+def make_logger(log_dir: str, debate_id: str = "bench"):
+    from debate_logger import DebateLogger
+    quiet_logger_handlers()
+    logger = DebateLogger(log_dir=log_dir, debate_id=debate_id)
+    return logger
+
+
+def close_logger(logger):
+    logger.close()
+    logger.flush()
+
+
+# --- Turn pipeline ---------------------------------------------------------
+
+def _mock_completion(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    return httpx.Response(200, json={
+        "choices": [{"message": {"role": "assistant", "content": MESSAGE}}],
+        "usage": {"prompt_tokens": len(body["messages"][1]["content"]) // 4, "completion_tokens": 40}
+    })
+
+
+@benchmark("turn_pipeline", "next_turn", turns=50)
+def bench_next_turn(workdir: str, turns: int):
+    from debate_manager import DebateManager
+    from debate_system import DebateAgent
+
+    transport.configure(transport=httpx.MockTransport(_mock_completion))
+    key_pool.get_pool().add_keys(["benchmark-key"])
+    # Measure the pipeline, not the client-side rate limits
+    rate_limiter.limiter.scale = 1e6
+
+    loop = asyncio.new_event_loop()
+    state = {}
+
+    def setup():
+        manager = DebateManager(DebateAgent("OpenAI", "benchmark"), DebateAgent("DeepSeek", "benchmark"),
+                                "Benchmark", use_cache=False)
+        loop.run_until_complete(manager.start_debate())
+        state["manager"] = manager
+
+    async def run_turns():
+        for _ in range(turns):
+            await state["manager"].next_turn()
+
+    def teardown():
+        loop.run_until_complete(transport.aclose())
+        loop.close()
+        transport.reset()
+        rate_limiter.limiter.scale = 1.0
+
+    return (lambda: loop.run_until_complete(run_turns())), setup, 5, teardown
+
+
+# --- Logger and exporters --------------------------------------------------
+
+def _log_turns_factory():
+    def factory(workdir: str, turns: int):
+        state = {}
+
+        def setup():
+            if "logger" in state:
+                close_logger(state["logger"])
+            state["logger"] = make_logger(tempfile.mkdtemp(dir=workdir))
+
+        def target():
+            logger = state["logger"]
+            for i in range(turns):
+                agent = "OpenAI" if i % 2 == 0 else "DeepSeek"
+                logger.log_debate_turn(agent, MESSAGE, agent, usage={
+                    "model": "bench", "prompt_tokens": 500, "completion_tokens": 40, "latency": 1.0, "cost": 0.0001
+                })
+            # Include the background writer's work, not just the enqueueing
+            logger.flush()
+
+        def teardown():
+            close_logger(state["logger"])
+
+        return target, setup, 5 if turns <= 1000 else 1, teardown
+    return factory
+
+
+def _export_factory():
+    def factory(workdir: str, turns: int):
+        logger = make_logger(tempfile.mkdtemp(dir=workdir))
+        logger.debate_metadata["topic"] = "Benchmark"
+        logger.conversation_history = fake_history(turns)
+
+        def target():
+            logger.export_debate("all", incremental=False)
+
+        return target, None, 5, lambda: close_logger(logger)
+    return factory
+
+
+def _export_append_factory():
+    def factory(workdir: str, turns: int):
+        logger = make_logger(tempfile.mkdtemp(dir=workdir))
+        logger.debate_metadata["topic"] = "Benchmark"
+        history = fake_history(turns + 1)
+
+        def setup():
+            # A full export of ``turns`` turns, then one new turn to append
+            logger.conversation_history = history[:turns]
+            logger.export_debate("all", incremental=False)
+            logger.conversation_history = history
+
+        def target():
+            logger.export_debate("all")
+
+        return target, setup, 5, lambda: close_logger(logger)
+    return factory
+
+
+def _save_conversation_factory():
+    def factory(workdir: str, turns: int):
+        import app
+        app.logger = logging.getLogger("benchmarks")
+        directory = tempfile.mkdtemp(dir=workdir)
+        # A local .env selects file storage instead of Cloud Storage
+        Path(directory, ".env").touch()
+        previous_cwd = os.getcwd()
+        os.chdir(directory)
+        # A debate that already has ``turns`` turns in the store
+        store = debate_store.get_store()
+        for turn in fake_history(turns):
+            store.add_turn("benchmark", {"agent": turn["agent"], "message": turn["message"],
+                                         "timestamp": "2025-01-01 12:00:00"})
+
+        def target():
+            app.save_conversation_to_json({"agent": "OpenAI", "message": MESSAGE, "recipient": "DeepSeek"},
+                                          "benchmark")
+
+        return target, None, 5, lambda: os.chdir(previous_cwd)
+    return factory
+
+
+def _transcript_factory(method: str):
+    def factory(workdir: str, turns: int):
+        from educational_debate import DebateManager as EducationalDebateManager
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            manager = EducationalDebateManager(None, None, "Benchmark")
+        for turn in fake_history(turns):
+            manager._record_turn(turn["agent"], turn["message"])
+        return getattr(manager, method), None, 5, None
+    return factory
+
+
+def _export_list_factory():
+    def factory(workdir: str, files: int):
+        import exporter
+        directory = Path(tempfile.mkdtemp(dir=workdir))
+        for n in range(files):
+            Path(directory, f"debate_export_d{n}_20250101_120000.{('json', 'txt', 'md', 'csv')[n % 4]}").touch()
+        store = debate_store.DebateStore(directory / "debates.sqlite")
+        manifest = exporter.ExportManifest(directory, store)
+        # The first listing scans the directory; later ones only stat it
+        manifest.refresh()
+
+        def target():
+            manifest.list(10)
+            manifest.count()
+
+        return target, None, 5, store.close
+    return factory
+
+
+def _store_query_factory(query: Callable):
+    def factory(workdir: str, debates: int):
+        path = Path(tempfile.mkdtemp(dir=workdir)) / "debates.sqlite"
+        store = debate_store.DebateStore(path)
+        start = datetime(2025, 1, 1).timestamp()
+        history = fake_history(10)
+        for n in range(debates):
+            started = datetime.fromtimestamp(start + n * 600)
+            store.save_debate({"id": f"d{n}", "topic": f"Topic {n % 20}", "start_time": started.isoformat()})
+            for seq, turn in enumerate(history):
+                store.add_turn(f"d{n}", dict(turn, message=f"{MESSAGE} Course {n}.",
+                                             timestamp=datetime.fromtimestamp(start + n * 600 + seq).isoformat()), seq)
+        week_ago = start + debates * 600 - 7 * 24 * 3600
+        # Query a freshly opened store, as the apps do
+        store.close()
+        store = debate_store.DebateStore(path)
+
+        def target():
+            query(store, week_ago)
+
+        return target, None, 5, store.close
+    return factory
+
+
+def register_size_benchmarks(logger_sizes=LOGGER_SIZES):
+    for turns in logger_sizes:
+        benchmark("logger", "log_debate_turn", turns=turns)(_log_turns_factory())
+    for turns in (100, 1000):
+        benchmark("exporters", "export_debate_all", turns=turns)(_export_factory())
+        benchmark("exporters", "export_debate_append", turns=turns)(_export_append_factory())
+        benchmark("exporters", "save_conversation_to_json", turns=turns)(_save_conversation_factory())
+    benchmark("exporters", "list_exports", files=10000)(_export_list_factory())
+    benchmark("store", "query_turns", debates=2000)(_store_query_factory(
+        lambda store, week_ago: store.query_turns(agent="DeepSeek", topic="Topic 3", since=week_ago)))
+    benchmark("store", "search", debates=2000)(_store_query_factory(
+        lambda store, week_ago: store.search("quality course 1234", limit=20)))
+    for turns in (100, 1000, 10000):
+        benchmark("transcripts", "get_transcript", turns=turns)(_transcript_factory("get_transcript"))
+        benchmark("transcripts", "build_conversation_context", turns=turns)(
+            _transcript_factory("_build_conversation_context"))
+
+
+# --- Running and comparing -------------------------------------------------
+
+def fullname(entry: Dict) -> str:
+    params = ",".join(f"{k}={v}" for k, v in sorted(entry["params"].items()))
+    return f"{entry['group']}/{entry['name']}[{params}]" if params else f"{entry['group']}/{entry['name']}"
+
+
+def machine_info() -> Dict:
+    return {
+        "node": platform.node(),
+        "processor": platform.processor(),
+        "machine": platform.machine(),
+        "python_implementation": platform.python_implementation(),
+        "python_version": platform.python_version(),
+        "system": platform.system(),
+        "release": platform.release(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def run_benchmarks(only: Optional[str] = None, out=sys.stdout) -> Dict:
+    """Run every registered benchmark (or those whose name contains ``only``)"""
+    results = []
+    with tempfile.TemporaryDirectory(prefix="debate-bench-") as workdir:
+        for entry in _registry:
+            name = fullname(entry)
+            if only and only not in name:
+                continue
+            record = {"group": entry["group"], "name": entry["name"], "fullname": name,
+                      "params": entry["params"]}
+            teardown = None
+            try:
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    target, setup, rounds, teardown = entry["factory"](workdir, **entry["params"])
+                    record["stats"] = measure(target, setup, rounds)
+            except ImportError as e:
+                # e.g. app.py without streamlit installed
+                record["skipped"] = f"{type(e).__name__}: {e}"
+            finally:
+                if teardown:
+                    teardown()
+            results.append(record)
+            if "stats" in record:
+                stats = record["stats"]
+                print(f"{name:<60} median {stats['median'] * 1000:10.3f} ms  "
+                      f"(min {stats['min'] * 1000:.3f}, max {stats['max'] * 1000:.3f}, rounds {stats['rounds']})", file=out)
+            else:
+                print(f"{name:<60} skipped ({record['skipped']})", file=out)
+    return {
+        "machine_info": machine_info(),
+        "datetime": datetime.now().isoformat(),
+        "benchmarks": results
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = 0.25, out=sys.stdout) -> List[str]:
+    """Compare medians against a baseline run
+
+    Returns:
+        Full names of benchmarks whose median grew by more than ``threshold`` (a fraction)
+    """
+    previous = {b["fullname"]: b for b in baseline.get("benchmarks", []) if "stats" in b}
+    regressions = []
+    print(f"\n{'benchmark':<60} {'baseline ms':>12} {'current ms':>12} {'change':>9}", file=out)
+    for entry in current["benchmarks"]:
+        if "stats" not in entry or entry["fullname"] not in previous:
+            continue
+        before = previous[entry["fullname"]]["stats"]["median"]
+        after = entry["stats"]["median"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(entry["fullname"])
+            flag = "  REGRESSION"
+        print(f"{entry['fullname']:<60} {before * 1000:12.3f} {after * 1000:12.3f} {change:+9.1%}{flag}", file=out)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the debate pipeline, logger and exporters')
+    parser.add_argument('--output', default=os.path.join('logs', 'benchmarks',
+                                                         f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"),
+                        help='Where to write the JSON results')
+    parser.add_argument('--save-baseline', metavar='PATH',
+                        help='Also store the results as the baseline for later --compare runs')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='Compare against a stored baseline; exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown of a median before it counts as a regression (fraction)')
+    parser.add_argument('--only', help='Only run benchmarks whose name contains this text')
+    parser.add_argument('--quick', action='store_true',
+                        help='Use 1000 instead of 10,000 turns for the log_debate_turn benchmark')
+    args = parser.parse_args()
+
+    register_size_benchmarks(QUICK_LOGGER_SIZES if args.quick else LOGGER_SIZES)
+    results = run_benchmarks(args.only)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == "__main__":
+    main()
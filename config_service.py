@@ -0,0 +1,172 @@
+"""Shared configuration service.
+
+``config.yaml`` is parsed and validated once, then handed out as an immutable
+snapshot. The file's mtime is checked (at most every ``CHECK_INTERVAL``
+seconds) and the snapshot is rebuilt only when it changes, so personas and
+``debate_prompt`` can be edited live without restarting and without YAML
+parsing on the hot path.
+"""
+
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+import yaml
+from dotenv import load_dotenv
+
+CONFIG_PATH = "config.yaml"
+
+# Minimum number of seconds between mtime checks of the same file
+CHECK_INTERVAL = 1.0
+
+
+class ConfigError(ValueError):
+    """Raised when the configuration file is missing or invalid"""
+
+
+class _Entry:
+    __slots__ = ("snapshot", "mtime", "checked_at")
+
+    def __init__(self, snapshot, mtime, checked_at):
+        self.snapshot = snapshot
+        self.mtime = mtime
+        self.checked_at = checked_at
+
+
+_cache: Dict[str, _Entry] = {}
+_lock = threading.Lock()
+_env_loaded = False
+
+
+def load_env():
+    """Load variables from .env once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+
+def freeze(value):
+    """Recursively convert dicts to read-only mappings and lists to tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Return a mutable deep copy of a frozen snapshot"""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def validate_config(config) -> None:
+    """Check the structure the debate code relies on
+
+    Raises:
+        ConfigError: If a required section or field is missing or malformed
+    """
+    if not isinstance(config, dict):
+        raise ConfigError("config must be a mapping")
+
+    agents = config.get("agents")
+    if not isinstance(agents, dict) or not agents:
+        raise ConfigError("'agents' must be a non-empty mapping")
+    for key, agent in agents.items():
+        if not isinstance(agent, dict):
+            raise ConfigError(f"agents.{key} must be a mapping")
+        for field in ("name", "model", "personality"):
+            if not isinstance(agent.get(field), str) or not agent[field].strip():
+                raise ConfigError(f"agents.{key}.{field} must be a non-empty string")
+        fallbacks = agent.get("fallback_models", [])
+        if not isinstance(fallbacks, list) or any(not isinstance(m, str) for m in fallbacks):
+            raise ConfigError(f"agents.{key}.fallback_models must be a list of model names")
+
+    if not isinstance(config.get("debate_prompt"), str):
+        raise ConfigError("'debate_prompt' must be a string")
+
+    topics = config.get("topics", [])
+    if not isinstance(topics, list) or any(not isinstance(t, dict) or "name" not in t for t in topics):
+        raise ConfigError("'topics' must be a list of mappings with a 'name'")
+
+    styles = config.get("debate_styles", {})
+    if not isinstance(styles, dict) or any(not isinstance(s, dict) for s in styles.values()):
+        raise ConfigError("'debate_styles' must be a mapping of mappings")
+
+    for section in ("http", "cache", "resilience", "hedging", "rate_limits", "api_keys",
+                    "pricing", "budget", "tracing", "memory", "log_writer", "store",
+                    "retention"):
+        if section in config and not isinstance(config[section], dict):
+            raise ConfigError(f"'{section}' must be a mapping")
+
+
+def _parse(path: str):
+    with open(path, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file) or {}
+    validate_config(config)
+    return freeze(config)
+
+
+def get_config(path: str = CONFIG_PATH, force_check: bool = False) -> Mapping:
+    """Return the current immutable config snapshot
+
+    Args:
+        path: Path to the YAML config file
+        force_check: Check the file's mtime even if CHECK_INTERVAL has not elapsed
+
+    Returns:
+        A read-only mapping (nested dicts are read-only, lists are tuples)
+
+    Raises:
+        ConfigError: If the file cannot be loaded and no earlier snapshot exists.
+            When a reload of an edited file fails, the previous snapshot is kept.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and not force_check and now - entry.checked_at < CHECK_INTERVAL:
+            return entry.snapshot
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError as e:
+            if entry is not None:
+                entry.checked_at = now
+                return entry.snapshot
+            raise ConfigError(f"Cannot read {path}: {e}") from e
+
+        if entry is not None and entry.mtime == mtime:
+            entry.checked_at = now
+            return entry.snapshot
+
+        try:
+            snapshot = _parse(path)
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            if entry is not None:
+                print(f"Error reloading {path}, keeping previous config: {e}")
+                entry.mtime = mtime
+                entry.checked_at = now
+                return entry.snapshot
+            if isinstance(e, ConfigError):
+                raise
+            raise ConfigError(f"Cannot load {path}: {e}") from e
+
+        if entry is not None:
+            print(f"Reloaded configuration from {path}")
+        _cache[path] = _Entry(snapshot, mtime, now)
+        return snapshot
+
+
+def clear_cache(path: Optional[str] = None):
+    """Drop cached snapshots so the next get_config() re-parses the file"""
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(path, None)
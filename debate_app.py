@@ -1,20 +1,23 @@
 import streamlit as st
 from debate_manager import DebateManager
 from debate_system import DebateAgent
+import transport
 import asyncio
-import json
-import yaml
+import config_service
+import usage
+import tracing
 from datetime import datetime
-from debate_logger import DebateLogger
+from debate_logger import DebateLogger, load_debate_log
+import exporter
+import debate_store
+import log_archive
 import os
 from pathlib import Path
 
 def load_config():
     try:
-        with open('config.yaml', 'r') as file:
-            config = yaml.safe_load(file)
-            return config
-    except Exception as e:
+        return config_service.get_config()
+    except config_service.ConfigError as e:
         st.error(f"Failed to load configuration: {str(e)}")
         return None
 
@@ -31,7 +34,7 @@ class StreamlitDebateManager:
         print("DeepSeek config:", self.config['agents']['deepseek']['name'])
         
         # Create debate ID
-        self.debate_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.debate_id = debate_store.new_debate_id()
         
         # Initialize enhanced logger
         self.logger = DebateLogger(debate_id=self.debate_id)
@@ -57,7 +60,8 @@ class StreamlitDebateManager:
         self.debate = DebateManager(
             agent1=self.agent1,
             agent2=self.agent2,
-            topic=self.topic
+            topic=self.topic,
+            debate_id=self.debate_id
         )
         
         # Set debate metadata
@@ -79,38 +83,66 @@ class StreamlitDebateManager:
             response = await self.debate.next_turn()
         return response
     
+    async def get_next_response_stream(self):
+        """Stream the next turn's tokens as they are generated"""
+        if not self.debate.conversation_history:
+            async for token in self.debate.start_debate_stream():
+                yield token
+            self.logger.log_event("Debate Started", "First turn initiated")
+        else:
+            async for token in self.debate.next_turn_stream():
+                yield token
+    
     def end_debate(self):
         """End the debate session and finalize logs"""
-        self.logger.end_debate()
-        
-        # Export the debate in all formats
-        export_files = self.logger.export_debate("all")
-        return export_files
+        # Export the debate in all formats before its log is closed
+        return self.logger.end_debate(export_format="all")
 
-def load_conversation_history():
-    try:
-        with open('debate_conversation.json', 'r') as f:
-            return json.load(f)
-    except:
-        return []
+EXPORTS_PER_PAGE = 10
 
-def get_export_list():
-    """Get list of available exports"""
-    export_dir = Path("logs/exports")
-    if not export_dir.exists():
-        return []
+def prepared_download_button(label, key, render, file_name, mime):
+    """Download button whose data is only rendered when asked for
     
-    files = []
-    for ext in [".txt", ".json", ".md", ".csv"]:
-        files.extend(list(export_dir.glob(f"*{ext}")))
+    ``st.download_button`` needs its bytes up front, which would render the
+    export on every rerun. Instead a "Prepare" button renders it once and
+    keeps it in session state for as long as ``key`` (e.g. debate id, turn
+    count and format) stays the same.
+    """
+    prepared = st.session_state.prepared_downloads
+    if prepared.get(label, (None,))[0] != key:
+        if not st.button(f"📦 Prepare {label}", use_container_width=True):
+            return
+        prepared[label] = (key, render())
+    st.download_button(
+        f"⬇️ {label}",
+        data=prepared[label][1],
+        file_name=file_name,
+        mime=mime,
+        use_container_width=True
+    )
+
+def get_export_list(page=0, per_page=EXPORTS_PER_PAGE):
+    """Get a page of available exports, newest first
+    
+    Read from the export manifest in the debate store, so the cost does
+    not grow with the number of files in logs/exports.
     
-    # Sort by modification time (newest first)
-    files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-    return files[:10]  # Return 10 most recent
+    Returns:
+        (files, total number of exports, page shown), the page being the
+        last one if ``page`` is past the end
+    """
+    manifest = exporter.ExportManifest("logs/exports", debate_store.get_store())
+    count = manifest.count()
+    page = min(page, max(0, (count - 1) // per_page))
+    files = [Path(entry["path"]) for entry in manifest.list(per_page, page * per_page)]
+    return files, count, page
 
 def main():
     st.title("🤖 AI Debate: OpenAI vs DeepSeek")
     
+    # Archive and expire old logs on a background thread (started once per process)
+    log_archive.start()
+    
     # Load config
     config = load_config()
     if not config:
@@ -134,6 +166,12 @@ def main():
     
     if 'exports' not in st.session_state:
         st.session_state.exports = None
+    if 'export_page' not in st.session_state:
+        st.session_state.export_page = 0
+    if 'prepared_downloads' not in st.session_state:
+        st.session_state.prepared_downloads = {}
+    if 'past_log' not in st.session_state:
+        st.session_state.past_log = None
 
     # Sidebar for exports and logs
     with st.sidebar:
@@ -150,10 +188,35 @@ def main():
             for format_type, filepath in st.session_state.exports.items():
                 filename = os.path.basename(filepath)
                 st.markdown(f"- [{format_type.upper()}] {filename}")
+
+        # Download the debate so far without writing export files
+        download_format = st.selectbox("Download format", exporter.FORMATS)
+        current = st.session_state.debate_manager.logger
+        prepared_download_button(
+            "Download Debate",
+            (current.debate_id, len(current.conversation_history), download_format),
+            lambda: current.export_bytes(download_format),
+            file_name=f"debate_{current.debate_id}.{exporter.EXTENSIONS[download_format]}",
+            mime=exporter.MIME_TYPES[download_format]
+        )
                 
         # Show recent debate exports
         st.subheader("Browse Exports")
-        export_files = get_export_list()
+        
+        # Full-text search over every stored turn
+        search_query = st.text_input("Search transcripts", placeholder="e.g. truffle efficiency")
+        if search_query:
+            hits = st.session_state.debate_manager.logger.store.search(search_query, limit=10)
+            if hits:
+                for hit in hits:
+                    st.markdown(
+                        f"**{hit['debate_id']}** · turn {hit['seq'] + 1} · {hit['agent']}\n\n"
+                        f"> {hit['snippet']}"
+                    )
+            else:
+                st.info("No matching turns")
+        
+        export_files, export_count, st.session_state.export_page = get_export_list(st.session_state.export_page)
         if export_files:
             for file in export_files:
                 col1, col2 = st.columns([3, 1])
@@ -162,9 +225,47 @@ def main():
                 with col2:
                     ext = file.suffix.strip(".")
                     st.markdown(f"`{ext.upper()}`")
+            
+            # Page through older exports
+            pages = (export_count + EXPORTS_PER_PAGE - 1) // EXPORTS_PER_PAGE
+            col1, col2, col3 = st.columns([1, 2, 1])
+            with col1:
+                if st.button("◀", disabled=st.session_state.export_page == 0):
+                    st.session_state.export_page -= 1
+                    st.rerun()
+            with col2:
+                st.caption(f"Page {st.session_state.export_page + 1} of {pages} ({export_count} files)")
+            with col3:
+                if st.button("▶", disabled=st.session_state.export_page + 1 >= pages):
+                    st.session_state.export_page += 1
+                    st.rerun()
         else:
             st.info("No previous debate exports found")
         
+        # Past debates from the debate store
+        st.subheader("Past Debates")
+        store = st.session_state.debate_manager.logger.store
+        past_debates = store.list_debates(limit=10)
+        if past_debates:
+            labels = {d["id"]: f"{d['id']} · {d['topic'] or 'No topic'} ({d['turns']} turns)" for d in past_debates}
+            past_id = st.selectbox("Debate", list(labels), format_func=labels.get)
+            past_turns = next(d["turns"] for d in past_debates if d["id"] == past_id)
+            prepared_download_button(
+                "Download Past Debate",
+                (past_id, past_turns, download_format),
+                lambda: exporter.export_bytes(store.get_debate(past_id), store.get_turns(past_id), download_format),
+                file_name=f"debate_{past_id}.{exporter.EXTENSIONS[download_format]}",
+                mime=exporter.MIME_TYPES[download_format]
+            )
+            with st.expander("View log"):
+                # Loaded on request: the log may have to be decompressed from the archive
+                if st.button("Load log", key="load_past_log"):
+                    st.session_state.past_log = (past_id, load_debate_log(current.log_dir, past_id))
+                if st.session_state.past_log and st.session_state.past_log[0] == past_id:
+                    st.code(st.session_state.past_log[1] or "No log file for this debate", language=None)
+        else:
+            st.info("No past debates stored yet")
+        
         # Stats section
         if st.session_state.conversation:
             st.subheader("Debate Statistics")
@@ -179,6 +280,15 @@ def main():
                 st.metric("OpenAI Turns", openai_count)
             with col2:
                 st.metric("DeepSeek Turns", deepseek_count)
+            
+            # Token usage and cost for this debate
+            totals = st.session_state.debate_manager.debate.usage_totals.as_dict()
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Tokens", f"{totals['total_tokens']:,}")
+            with col2:
+                st.metric("Cost", f"${totals['cost']:.4f}")
+            st.caption(f"Average turn latency: {totals['avg_latency']:.2f}s")
     
     # Main content area
     # Display conversation history with improved formatting
@@ -201,7 +311,27 @@ def main():
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("🎭 Next Turn", use_container_width=True):
-            response = asyncio.run(st.session_state.debate_manager.get_next_response())
+            # Render the reply as it streams in
+            render_span = tracing.start_span(
+                "ui.render",
+                debate_id=st.session_state.debate_manager.debate_id,
+                turn=len(st.session_state.debate_manager.debate.conversation_history),
+                streamed=True
+            )
+            try:
+                with st.chat_message("assistant"):
+                    placeholder = st.empty()
+                    response = ""
+                    for token in transport.iterate(st.session_state.debate_manager.get_next_response_stream()):
+                        response += token
+                        placeholder.markdown(response + "▌")
+                    placeholder.markdown(response)
+                render_span.end()
+            except usage.BudgetExceeded as e:
+                render_span.end(e)
+                st.session_state.debate_manager.logger.log_event("Budget Exceeded", str(e))
+                st.warning(f"Debate stopped: {e}")
+                st.stop()
             
             # Get the last entry from the debate manager's conversation history
             latest_entry = st.session_state.debate_manager.debate.conversation_history[-1]
@@ -217,7 +347,9 @@ def main():
                 "agent": agent_name,
                 "agent_identity": agent_identity,
                 "message": response,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "ttft": latest_entry.get("ttft"),
+                "total_time": latest_entry.get("total_time")
             }
             
             st.session_state.conversation.append(message_data)
@@ -226,7 +358,14 @@ def main():
             st.session_state.debate_manager.logger.log_debate_turn(
                 agent_name, 
                 response,
-                agent_identity
+                agent_identity,
+                usage={
+                    "model": latest_entry.get("model"),
+                    "prompt_tokens": latest_entry.get("prompt_tokens", 0),
+                    "completion_tokens": latest_entry.get("completion_tokens", 0),
+                    "latency": latest_entry.get("total_time"),
+                    "cost": latest_entry.get("cost", 0.0)
+                }
             )
             
             st.rerun()
@@ -239,9 +378,10 @@ def main():
 
     with col3:
         if st.button("🔄 Reset Debate", use_container_width=True):
-            # End current debate if any
+            # End current debate if any, and release its log files either way
             if st.session_state.conversation:
                 st.session_state.debate_manager.end_debate()
+            st.session_state.debate_manager.logger.close()
             
             # Clear conversation and create new debate manager
             st.session_state.conversation = []
@@ -3,12 +3,112 @@ from datetime import datetime
 import os
 from pathlib import Path
 import json
-import csv
 import shutil
 import re
+import threading
+from collections import OrderedDict
+from usage import UsageTotals
+import tracing
+import log_writer
+import exporter
+import debate_store
+import log_archive
+
+LOG_FORMAT = logging.Formatter(
+    '%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+_console_handler = None
+
+def get_console_handler():
+    """Console handler shared by every debate logger"""
+    global _console_handler
+    if _console_handler is None:
+        _console_handler = log_writer.BatchStreamHandler()
+        _console_handler.setLevel(logging.INFO)
+        _console_handler.setFormatter(LOG_FORMAT)
+    return _console_handler
+
+class LoggerRegistry:
+    """Debate loggers with open files, least recently used first
+    
+    Past ``max_open`` loggers the least recently used one is closed; its
+    files reopen if it logs again. Loggers are not registered with the
+    ``logging`` module, so an ended or evicted debate holds no file
+    descriptors and can be garbage collected.
+    """
+    
+    def __init__(self, max_open=None):
+        self.max_open = max_open or log_writer.get_settings()["max_open_loggers"]
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def touch(self, debate_logger):
+        """Mark a logger as in use, closing the least recently used ones over the cap"""
+        key = id(debate_logger)
+        evicted = []
+        with self._lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return
+            self._open[key] = debate_logger
+            # Idle but open: keep the retention thread from archiving it underneath us
+            log_archive.hold(debate_logger.log_file)
+            while len(self._open) > self.max_open:
+                evicted.append(self._open.popitem(last=False)[1])
+        for old in evicted:
+            old.close()
+    
+    def discard(self, debate_logger):
+        with self._lock:
+            self._open.pop(id(debate_logger), None)
+    
+    def __len__(self):
+        return len(self._open)
+
+registry = LoggerRegistry()
+
+def load_conversation_history(log_dir, debate_id):
+    """Read a debate's history from the debate store
+    
+    Debates logged before the store existed are read from their
+    debate_history_<id>.json file.
+    """
+    history = debate_store.get_store(log_dir).get_turns(debate_id)
+    if history:
+        return history
+    return load_legacy_history(log_dir, debate_id)
+
+def load_legacy_history(log_dir, debate_id):
+    """Read a debate_history_<id>.json file, which may have been compressed into the log archive"""
+    history_file = Path(log_dir) / f"debate_history_{debate_id}.json"
+    if not log_archive.log_exists(history_file):
+        return []
+    with log_archive.open_log(history_file) as f:
+        return json.load(f)
+
+def load_debate_log(log_dir, debate_id):
+    """A debate's log file as text, whether still in place or archived
+    
+    Returns:
+        The log text, or None if there is no log for the debate
+    """
+    log_file = Path(log_dir) / f"debate_log_{debate_id}.log"
+    if not log_archive.log_exists(log_file):
+        return None
+    with log_archive.open_log(log_file) as f:
+        return f.read()
 
 class DebateLogger:
-    def __init__(self, log_dir="logs", debate_id=None):
+    def __init__(self, log_dir="logs", debate_id=None, fsync=False):
+        """
+        Args:
+            log_dir: Directory for logs, metadata, history and exports
+            debate_id: Debate identifier (defaults to a timestamp)
+            fsync: Force each stored turn to disk before returning (survives
+                power loss, not just a crash of the process)
+        """
         # Create logs directory if it doesn't exist
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
@@ -18,13 +118,17 @@ class DebateLogger:
         self.export_dir.mkdir(exist_ok=True)
         
         # Create debate ID or use provided one
-        self.debate_id = debate_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.debate_id = debate_id or debate_store.new_debate_id()
         
         # Create log file name with debate ID
         self.log_file = self.log_dir / f"debate_log_{self.debate_id}.log"
         
-        # Store debate conversation history
+        # Conversation history, metadata and events are saved to the debate
+        # store as they happen; conversation_history is the in-memory copy
         self.conversation_history = []
+        self.store = debate_store.get_store(self.log_dir, durable=fsync)
+        # Listing of logs/exports, updated by export_debate
+        self.export_manifest = exporter.ExportManifest(self.export_dir, self.store)
         self.debate_metadata = {
             "id": self.debate_id,
             "start_time": datetime.now().isoformat(),
@@ -33,35 +137,28 @@ class DebateLogger:
             "agents": []
         }
         
-        # Configure logging
-        self.logger = logging.getLogger(f"DebateLogger_{self.debate_id}")
-        self.logger.setLevel(logging.INFO)
+        # Export files, updated in place by repeated exports
+        self.exporter = exporter.IncrementalExporter(self.export_dir, self.debate_id)
         
-        # Remove existing handlers if any (to avoid duplicate logs)
-        for handler in self.logger.handlers[:]:
-            self.logger.removeHandler(handler)
+        # Running token/cost totals, rolled up into debate_metadata["usage"]
+        self.usage_totals = UsageTotals()
+        self.debate_metadata["usage"] = self.usage_totals.as_dict()
         
-        # File handler with timestamp
-        file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
+        # Configure logging; the logger is not registered with logging.getLogger,
+        # so it goes away with this object instead of living for the whole process
+        self.logger = logging.Logger(f"DebateLogger_{self.debate_id}", logging.INFO)
+        self.logger.parent = logging.getLogger()
         
-        # Console handler
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
+        # File handler with timestamp (closed by close() or when evicted from the registry)
+        self.file_handler = log_writer.BatchFileHandler(self.log_file, encoding='utf-8')
+        self.file_handler.setLevel(logging.INFO)
+        self.file_handler.setFormatter(LOG_FORMAT)
         
-        # Create formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        # Add formatter to handlers
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        # Add handlers to logger
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        # Both handlers run on the background log writer; logging a record
+        # only puts it on the writer's queue
+        self.writer_handler = log_writer.WriterHandler([self.file_handler, get_console_handler()])
+        self.logger.addHandler(self.writer_handler)
+        registry.touch(self)
         
         # Save a symlink to the most recent log file
         self.create_latest_symlink()
@@ -96,54 +193,123 @@ class DebateLogger:
         # Log the debate initiation
         self.log_event("Debate Initialized", f"Topic: {topic}, Agents: {', '.join(a['name'] for a in agents)}")
     
-    def log_debate_turn(self, agent_name: str, message: str, agent_identity: str = None):
-        """Log a debate turn with agent name and message"""
-        # Record in structured history
-        turn_data = {
-            "agent": agent_name,
-            "agent_identity": agent_identity or agent_name,
-            "message": message,
-            "timestamp": datetime.now().isoformat()
-        }
-        self.conversation_history.append(turn_data)
+    def log_debate_turn(self, agent_name: str, message: str, agent_identity: str = None, usage: dict = None):
+        """Log a debate turn with agent name and message
         
-        # Log to file
-        self.logger.info(f"Agent: {agent_name} ({agent_identity or agent_name})\nMessage: {message}\n{'-'*50}")
+        Args:
+            usage: Optional token usage for the turn (model, prompt_tokens,
+                completion_tokens, latency, cost), rolled up into the metadata
+        """
+        usage = usage or {}
+        registry.touch(self)
         
-        # Save the updated conversation history
-        self.save_conversation_history()
+        with tracing.span("logger.log_turn", debate_id=self.debate_id, agent=agent_name,
+                          turn=len(self.conversation_history)):
+            # Record in structured history
+            turn_data = {
+                "agent": agent_name,
+                "agent_identity": agent_identity or agent_name,
+                "message": message,
+                "timestamp": datetime.now().isoformat(),
+                "model": usage.get("model"),
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0),
+                "latency": usage.get("latency"),
+                "cost": usage.get("cost", 0.0)
+            }
+            self.conversation_history.append(turn_data)
+            
+            # Roll up usage for the whole debate
+            self.usage_totals.add(usage)
+            self.debate_metadata["usage"] = self.usage_totals.as_dict()
+            
+            # Log to file
+            self.logger.info(
+                f"Agent: {agent_name} ({agent_identity or agent_name})\nMessage: {message}\n"
+                f"Tokens: {turn_data['prompt_tokens']} prompt / {turn_data['completion_tokens']} completion, "
+                f"Cost: ${turn_data['cost']:.6f}\n{'-'*50}"
+            )
+            
+            # Save the turn and the updated usage totals to the store
+            self.save_turn(turn_data)
     
     def log_event(self, event_type: str, description: str):
         """Log general events in the debate system"""
+        registry.touch(self)
         self.logger.info(f"Event: {event_type}\nDescription: {description}\n{'-'*50}")
+        self.save_event(event_type, description, "INFO")
     
     def log_error(self, error_type: str, error_message: str):
         """Log errors that occur during the debate"""
+        registry.touch(self)
         self.logger.error(f"Error: {error_type}\nMessage: {error_message}\n{'-'*50}")
+        self.save_event(error_type, error_message, "ERROR")
     
     def save_metadata(self):
-        """Save debate metadata to a JSON file"""
-        metadata_file = self.log_dir / f"debate_metadata_{self.debate_id}.json"
+        """Save debate metadata to the debate store"""
         try:
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.debate_metadata, f, indent=2, ensure_ascii=False)
+            with tracing.span("logger.save_metadata", debate_id=self.debate_id):
+                self.store.save_debate(self.debate_metadata)
         except Exception as e:
             self.log_error("Metadata Save Error", str(e))
     
-    def save_conversation_history(self):
-        """Save the current conversation history to a JSON file"""
-        history_file = self.log_dir / f"debate_history_{self.debate_id}.json"
+    def save_turn(self, turn_data):
+        """Save one turn, with the debate's updated metadata, in a single commit"""
         try:
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_history, f, indent=2, ensure_ascii=False)
+            with tracing.span("logger.save_turn", debate_id=self.debate_id):
+                self.store.add_turn(self.debate_id, turn_data, len(self.conversation_history) - 1,
+                                    self.debate_metadata)
         except Exception as e:
             self.log_error("Conversation Save Error", str(e))
     
-    def end_debate(self):
-        """Mark the debate as ended and finalize logs"""
+    def save_event(self, event_type, description, level):
+        try:
+            self.store.add_event(self.debate_id, event_type, description, level)
+        except Exception as e:
+            # Not log_error, which would try the store again
+            self.logger.error(f"Error: Event Save Error\nMessage: {e}\n{'-'*50}")
+    
+    def end_debate(self, export_format=None):
+        """Mark the debate as ended and finalize logs
+        
+        Exporting logs an event, which would reopen a closed log file, so an
+        ended debate is exported here (``export_format``, as for
+        ``export_debate``) before its log is closed.
+        
+        Returns:
+            Dict of exported filenames, or None without ``export_format``
+        """
         self.debate_metadata["end_time"] = datetime.now().isoformat()
         self.save_metadata()
-        self.log_event("Debate Ended", f"Total turns: {len(self.conversation_history)}")
+        totals = self.debate_metadata["usage"]
+        self.log_event(
+            "Debate Ended",
+            f"Total turns: {len(self.conversation_history)}, "
+            f"Tokens: {totals['total_tokens']}, Cost: ${totals['cost']:.6f}"
+        )
+        export_files = self.export_debate(export_format) if export_format else None
+        self.close()
+        self.flush()
+        return export_files
+    
+    def close(self):
+        """Close this debate's log file
+        
+        It reopens in append mode if the debate logs again. The file handler
+        is closed on the writer thread, after records already queued.
+        """
+        registry.discard(self)
+        self.writer_handler.writer.call(self.file_handler.close)
+        log_archive.release(self.log_file)
+    
+    def flush(self):
+        """Wait until every record logged so far has been written"""
+        self.writer_handler.flush()
+    
+    @property
+    def dropped_records(self):
+        """Log records dropped because the background writer's queue was full"""
+        return self.writer_handler.dropped
     
     def get_safe_filename(self, filename):
         """Create a safe filename that works across all operating systems"""
@@ -151,92 +317,35 @@ class DebateLogger:
         safe_name = re.sub(r'[^\w\-]', '_', filename)
         return safe_name
     
-    def export_debate(self, format_type="all"):
+    def export_debate(self, format_type="all", incremental=True):
         """Export the debate in various formats
         
+        All formats are rendered in a single pass over the conversation.
+        Repeated exports append only the turns added since the last one.
+        
         Args:
             format_type: Format to export (json, txt, markdown, csv, or all)
+            incremental: Update this debate's previous export files; False
+                writes new timestamped files
         
         Returns:
             Dict of exported filenames
         """
-        exports = {}
-        # Use a timestamp format that's safe for filenames (no colons, spaces, etc.)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Always export JSON version
-        if format_type in ["json", "all"]:
-            json_export = self.export_dir / f"debate_export_{self.debate_id}_{timestamp}.json"
-            data = {
-                "metadata": self.debate_metadata,
-                "conversation": self.conversation_history
-            }
-            with open(json_export, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            exports["json"] = str(json_export)
-        
-        # Export as plain text
-        if format_type in ["txt", "all"]:
-            txt_export = self.export_dir / f"debate_export_{self.debate_id}_{timestamp}.txt"
-            with open(txt_export, 'w', encoding='utf-8') as f:
-                f.write(f"AI Dinner Battle - Debate Transcript\n")
-                f.write(f"Topic: {self.debate_metadata['topic']}\n")
-                f.write("=" * 50 + "\n\n")
-                
-                for turn in self.conversation_history:
-                    agent = turn["agent"]
-                    identity = turn.get("agent_identity", agent)
-                    # Format timestamp safely
-                    turn_time = datetime.fromisoformat(turn["timestamp"])
-                    time_str = turn_time.strftime("%Y-%m-%d %H:%M:%S")
-                    message = turn["message"]
-                    
-                    f.write(f"[{time_str}] {agent} ({identity}):\n")
-                    f.write(f"{message}\n\n")
-            exports["txt"] = str(txt_export)
-        
-        # Export as markdown
-        if format_type in ["markdown", "all"]:
-            md_export = self.export_dir / f"debate_export_{self.debate_id}_{timestamp}.md"
-            with open(md_export, 'w', encoding='utf-8') as f:
-                f.write(f"# AI Dinner Battle - Debate Transcript\n\n")
-                f.write(f"**Topic:** {self.debate_metadata['topic']}\n\n")
-                f.write(f"**Date:** {datetime.now().strftime('%Y-%m-%d')}\n\n")
-                f.write("---\n\n")
-                
-                for turn in self.conversation_history:
-                    agent = turn["agent"]
-                    identity = turn.get("agent_identity", agent)
-                    avatar = "🎩" if identity == "OpenAI" else "🍜"
-                    # Format timestamp safely
-                    turn_time = datetime.fromisoformat(turn["timestamp"])
-                    time_str = turn_time.strftime("%H:%M:%S")
-                    message = turn["message"]
-                    
-                    f.write(f"## {avatar} {agent}\n\n")
-                    f.write(f"*{time_str}*\n\n")
-                    f.write(f"{message}\n\n")
-                    f.write("---\n\n")
-            exports["markdown"] = str(md_export)
-        
-        # Export as CSV
-        if format_type in ["csv", "all"]:
-            csv_export = self.export_dir / f"debate_export_{self.debate_id}_{timestamp}.csv"
-            with open(csv_export, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["Timestamp", "Agent", "Identity", "Message"])
-                
-                for turn in self.conversation_history:
-                    writer.writerow([
-                        turn["timestamp"],
-                        turn["agent"],
-                        turn.get("agent_identity", turn["agent"]),
-                        turn["message"]
-                    ])
-            exports["csv"] = str(csv_export)
+        formats = exporter.FORMATS if format_type == "all" else [format_type]
+        mtime_before = self.export_manifest.dir_mtime()
+        exports = self.exporter.export(self.debate_metadata, self.conversation_history, formats, incremental)
+        self.export_manifest.record(exports, self.debate_id, mtime_before)
         
         self.log_event("Debate Exported", f"Formats: {', '.join(exports.keys())}")
         return exports
+    
+    def export_stream(self, format_type):
+        """Yield an export as UTF-8 chunks without writing a file"""
+        return exporter.stream_export(self.debate_metadata, self.conversation_history, format_type)
+    
+    def export_bytes(self, format_type):
+        """An export rendered in memory, e.g. for st.download_button"""
+        return exporter.export_bytes(self.debate_metadata, self.conversation_history, format_type)
 
 # Update .gitignore to exclude log files
 def update_gitignore():
@@ -288,5 +397,4 @@ if __name__ == "__main__":
     )
     
     # End debate and export
-    logger.end_debate()
-    logger.export_debate("all") 
\ No newline at end of file
+    logger.end_debate(export_format="all")
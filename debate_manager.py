@@ -1,10 +1,15 @@
 from typing import List, Dict
 from debate_system import DebateAgent
+from usage import UsageTotals, check_budget
+from memory import create_memory
+from debate_store import new_debate_id
+import tracing
 import asyncio
 from datetime import datetime
 
 class DebateManager:
-    def __init__(self, agent1: DebateAgent, agent2: DebateAgent, topic: str):
+    def __init__(self, agent1: DebateAgent, agent2: DebateAgent, topic: str, use_cache: bool = True,
+                 debate_id: str = None, memory_mode: str = None):
         # Ensure the first agent is OpenAI and the second is DeepSeek
         if agent1.name == "OpenAI" and agent2.name == "DeepSeek":
             self.agent1 = agent1  # OpenAI
@@ -21,45 +26,89 @@ class DebateManager:
             print(f"Warning: Expected agent names 'OpenAI' and 'DeepSeek', but got '{agent1.name}' and '{agent2.name}'")
         
         self.topic = topic
+        self.use_cache = use_cache
+        # Tags this debate's tracing spans
+        self.debate_id = debate_id or new_debate_id()
         self.conversation_history: List[Dict] = []
         self.current_turn = 0
+        # Fixed-size prompt context: rolling summary or retrieval of relevant turns (memory.mode)
+        self.memory = create_memory(memory_mode)
+        
+        # Token and cost totals for this debate (see usage.py for budgets)
+        self.usage_totals = UsageTotals()
         
         # DEBUG: Verify the agent names are correctly assigned
         print(f"DebateManager initialized with agent1={self.agent1.name} and agent2={self.agent2.name}")
         
-    async def start_debate(self):
-        # Set initial context
-        context = f"""
+    def _opening_context(self) -> str:
+        return f"""
         Scene: {self.topic}
         Participants: {self.agent1.name} vs {self.agent2.name}
         """
         
-        # Initial message - OpenAI should always go first
-        print(f"Starting debate with first agent: {self.agent1.name}")
-        first_response = await self.agent1.generate_response(context, "", self.conversation_history)
-        
-        # Strictly verify the response is attributed to the correct agent
+    def _record_turn(self, agent: DebateAgent, response: str, agent_identity: str):
+        """Append a turn to the history along with the agent's timing and token usage"""
+        timing = agent.last_timing or {}
+        turn_usage = agent.last_usage or {}
+        self.usage_totals.add(turn_usage)
+        self.memory.add(agent.name, response)
         self.conversation_history.append({
-            "agent": self.agent1.name,
-            "message": first_response,
+            "agent": agent.name,
+            "message": response,
             "timestamp": datetime.now(),
-            "agent_identity": "OpenAI"  # Add explicit identity
+            "agent_identity": agent_identity,  # Add explicit identity
+            "ttft": timing.get("ttft"),
+            "total_time": timing.get("total_time"),
+            "model": turn_usage.get("model"),
+            "prompt_tokens": turn_usage.get("prompt_tokens", 0),
+            "completion_tokens": turn_usage.get("completion_tokens", 0),
+            "cost": turn_usage.get("cost", 0.0)
         })
         
+    def check_budget(self):
+        """Raise usage.BudgetExceeded if this debate has hit its token or cost ceiling"""
+        check_budget(self.usage_totals, "debate")
+        
+    async def start_debate(self):
+        # Set initial context
+        context = self._opening_context()
+        
+        # Initial message - OpenAI should always go first
+        print(f"Starting debate with first agent: {self.agent1.name}")
+        with tracing.span("debate.turn", tags={"debate_id": self.debate_id, "turn": 0, "agent": self.agent1.name}):
+            first_response = await self.agent1.generate_response(context, "", self.conversation_history, use_cache=self.use_cache)
+            
+            # Strictly verify the response is attributed to the correct agent
+            self._record_turn(self.agent1, first_response, "OpenAI")
+        
         return first_response
+        
+    async def start_debate_stream(self):
+        """Streaming variant of start_debate that yields tokens as they arrive"""
+        print(f"Starting streamed debate with first agent: {self.agent1.name}")
+        span = tracing.start_span("debate.turn", tags={"debate_id": self.debate_id, "turn": 0, "agent": self.agent1.name},
+                                  streamed=True)
+        chunks = []
+        stream = self.agent1.generate_response_stream(self._opening_context(), "", self.conversation_history,
+                                                      use_cache=self.use_cache)
+        async for token in tracing.traced(stream, span):
+            chunks.append(token)
+            yield token
+        
+        self._record_turn(self.agent1, "".join(chunks), "OpenAI")
+        span.end()
 
-    async def next_turn(self) -> str:
+    def _select_speaker(self):
+        """Pick the agent whose turn it is and its expected identity"""
         # Determine which agent's turn it is based on conversation length
         # OpenAI agent should always be on even turns, DeepSeek on odd turns
         
         # Force OpenAI for even turns, DeepSeek for odd
         if len(self.conversation_history) % 2 == 0:
             current_agent = self.agent1  # Should be OpenAI
-            opponent_agent = self.agent2  # Should be DeepSeek
             agent_identity = "OpenAI"
         else:
             current_agent = self.agent2  # Should be DeepSeek
-            opponent_agent = self.agent1  # Should be OpenAI
             agent_identity = "DeepSeek"
         
         # Double-check the name matches the expected identity
@@ -70,6 +119,13 @@ class DebateManager:
         
         # CRITICAL DEBUG: Print which agent is currently speaking
         print(f"CURRENT TURN: {current_agent.name} (turn #{len(self.conversation_history)})")
+        return current_agent, agent_identity
+
+    async def next_turn(self) -> str:
+        # Stop runaway debates before spending more
+        self.check_budget()
+        
+        current_agent, agent_identity = self._select_speaker()
         
         # Get last message as the opponent message
         opponent_message = self.conversation_history[-1]["message"]
@@ -77,20 +133,45 @@ class DebateManager:
         
         # Generate response with explicitly named agent
         print(f"Generating response for {current_agent.name}")
-        response = await current_agent.generate_response(context, opponent_message, self.conversation_history)
-        print(f"Response generated for {current_agent.name}: {response[:30]}...")
-        
-        # Store with explicit identity tag
-        self.conversation_history.append({
-            "agent": current_agent.name,
-            "message": response,
-            "timestamp": datetime.now(),
-            "agent_identity": agent_identity  # Track explicit identity
-        })
+        with tracing.span("debate.turn", tags={"debate_id": self.debate_id, "turn": len(self.conversation_history),
+                                               "agent": current_agent.name}):
+            response = await current_agent.generate_response(context, opponent_message, self.conversation_history,
+                                                            use_cache=self.use_cache)
+            print(f"Response generated for {current_agent.name}: {response[:30]}...")
+            
+            # Store with explicit identity tag
+            self._record_turn(current_agent, response, agent_identity)
         
         self.current_turn += 1
         return response
+        
+    async def next_turn_stream(self):
+        """Streaming variant of next_turn that yields tokens as they arrive
+        
+        The complete reply is stored in the conversation history once the
+        stream is exhausted.
+        """
+        self.check_budget()
+        
+        current_agent, agent_identity = self._select_speaker()
+        
+        opponent_message = self.conversation_history[-1]["message"]
+        context = self._build_context()
+        
+        print(f"Streaming response for {current_agent.name}")
+        span = tracing.start_span("debate.turn", tags={"debate_id": self.debate_id, "turn": len(self.conversation_history),
+                                                       "agent": current_agent.name}, streamed=True)
+        chunks = []
+        stream = current_agent.generate_response_stream(context, opponent_message, self.conversation_history,
+                                                        use_cache=self.use_cache)
+        async for token in tracing.traced(stream, span):
+            chunks.append(token)
+            yield token
+        
+        self._record_turn(current_agent, "".join(chunks), agent_identity)
+        span.end()
+        self.current_turn += 1
 
     def _build_context(self) -> str:
-        return "\n".join([f"{msg['agent']}: {msg['message']}" 
-                         for msg in self.conversation_history[-3:]]) 
\ No newline at end of file
+        # The opponent's latest message selects the earlier turns in retrieval mode
+        return self.memory.render(self.conversation_history[-1]["message"])
@@ -0,0 +1,411 @@
+"""SQLite store for debates, their turns and logged events.
+
+One database per log directory (``logs/debates.sqlite`` by default) in WAL
+mode, so the Streamlit apps can read while a debate is being written.
+Debates, turns and events live in their own tables, indexed on topic,
+agent, model and time, which keeps queries such as "all DeepSeek turns on
+topic X in the last week" to an index lookup instead of a directory scan
+and full JSON loads:
+
+    store = debate_store.get_store()
+    store.query_turns(agent="DeepSeek", topic="X", since=datetime.now() - timedelta(days=7))
+
+Every turn's message is also in an FTS5 full-text index, kept up to date
+by triggers as turns are written, so ``store.search("wok efficiency")``
+returns ranked hits across the whole archive. Where SQLite was built
+without FTS5, ``search`` falls back to a (slower, unranked) LIKE scan.
+
+Writes are committed one call at a time. With ``synchronous=NORMAL`` a
+commit survives the process crashing; ``durable=True`` also survives power
+loss, at the cost of an fsync per write.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config_service
+
+# Defaults used when config.yaml has no ``store`` section
+DEFAULT_SETTINGS = {
+    "filename": "debates.sqlite",   # created inside the log directory
+}
+
+# Turn fields with their own column; any other keys are kept as JSON in ``extra``
+TURN_COLUMNS = ("agent", "agent_identity", "message", "timestamp", "model",
+                "prompt_tokens", "completion_tokens", "latency", "cost")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS debates ("
+    "id TEXT PRIMARY KEY, topic TEXT, start_time TEXT, start_ts REAL, "
+    "end_time TEXT, metadata TEXT NOT NULL DEFAULT '{}')",
+    "CREATE INDEX IF NOT EXISTS debates_topic ON debates(topic, start_ts)",
+    "CREATE INDEX IF NOT EXISTS debates_start ON debates(start_ts)",
+
+    "CREATE TABLE IF NOT EXISTS turns ("
+    "debate_id TEXT NOT NULL, seq INTEGER NOT NULL, agent TEXT, agent_identity TEXT, "
+    "message TEXT, timestamp TEXT, ts REAL, model TEXT, prompt_tokens INTEGER, "
+    "completion_tokens INTEGER, latency REAL, cost REAL, extra TEXT, "
+    "PRIMARY KEY (debate_id, seq))",
+    "CREATE INDEX IF NOT EXISTS turns_agent ON turns(agent, ts)",
+    "CREATE INDEX IF NOT EXISTS turns_model ON turns(model, ts)",
+    "CREATE INDEX IF NOT EXISTS turns_ts ON turns(ts)",
+
+    "CREATE TABLE IF NOT EXISTS events ("
+    "id INTEGER PRIMARY KEY, debate_id TEXT NOT NULL, ts REAL, timestamp TEXT, "
+    "level TEXT, event_type TEXT, description TEXT)",
+    "CREATE INDEX IF NOT EXISTS events_debate ON events(debate_id, ts)",
+
+    # Manifest of export files, plus the directory mtime it was last in sync with
+    "CREATE TABLE IF NOT EXISTS exports ("
+    "path TEXT PRIMARY KEY, dir TEXT NOT NULL, debate_id TEXT, format TEXT, mtime REAL, size INTEGER)",
+    "CREATE INDEX IF NOT EXISTS exports_dir ON exports(dir, mtime)",
+    "CREATE TABLE IF NOT EXISTS export_dirs (dir TEXT PRIMARY KEY, mtime_ns INTEGER)",
+)
+
+# Full-text index over turn messages; the triggers keep it in step with ``turns``
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5("
+    "message, content='turns', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS turns_fts_insert AFTER INSERT ON turns BEGIN "
+    "INSERT INTO turns_fts(rowid, message) VALUES (new.rowid, new.message); END",
+    "CREATE TRIGGER IF NOT EXISTS turns_fts_delete AFTER DELETE ON turns BEGIN "
+    "INSERT INTO turns_fts(turns_fts, rowid, message) VALUES ('delete', old.rowid, old.message); END",
+    "CREATE TRIGGER IF NOT EXISTS turns_fts_update AFTER UPDATE OF message ON turns BEGIN "
+    "INSERT INTO turns_fts(turns_fts, rowid, message) VALUES ('delete', old.rowid, old.message); "
+    "INSERT INTO turns_fts(rowid, message) VALUES (new.rowid, new.message); END",
+)
+
+# Highlight markers for search snippets (Markdown bold)
+SNIPPET_MARK = "**"
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("store", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def new_debate_id() -> str:
+    """A debate id that sorts by start time and cannot collide within a second"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def to_epoch(value) -> Optional[float]:
+    """Seconds since the epoch from a datetime, ISO string or number"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class DebateStore:
+    """Debates, turns and events in one SQLite database"""
+
+    def __init__(self, path, durable: bool = False):
+        """
+        Args:
+            path: SQLite file (its directory is created if needed)
+            durable: fsync every commit (synchronous=FULL) instead of relying
+                on the WAL to survive a crash of this process
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(f"PRAGMA synchronous={'FULL' if durable else 'NORMAL'}")
+        for statement in SCHEMA:
+            self._db.execute(statement)
+        self.fts = self._create_fts()
+        # Refresh the planner's statistics, so e.g. a topic filter
+        # is tried before a filter on a common agent
+        self._db.execute("ANALYZE")
+        self._db.commit()
+
+    def _create_fts(self) -> bool:
+        """Create the full-text index, filling it from existing turns the first time"""
+        exists = self._db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'turns_fts'").fetchone()
+        try:
+            for statement in FTS_SCHEMA:
+                self._db.execute(statement)
+        except sqlite3.OperationalError:
+            # SQLite without FTS5
+            return False
+        if not exists:
+            self._db.execute("INSERT INTO turns_fts(turns_fts) VALUES ('rebuild')")
+        return True
+
+    # --- Writes ---------------------------------------------------------------
+
+    def _upsert_debate(self, metadata: Dict):
+        self._db.execute(
+            "INSERT INTO debates (id, topic, start_time, start_ts, end_time, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET topic = excluded.topic, start_time = excluded.start_time, "
+            "start_ts = excluded.start_ts, end_time = excluded.end_time, metadata = excluded.metadata",
+            (metadata["id"], metadata.get("topic"), metadata.get("start_time"),
+             to_epoch(metadata.get("start_time")), metadata.get("end_time"),
+             json.dumps(metadata, ensure_ascii=False))
+        )
+
+    def save_debate(self, metadata: Dict):
+        """Insert or update a debate from its metadata (must include ``id``)"""
+        with self._lock:
+            self._upsert_debate(metadata)
+            self._db.commit()
+
+    def add_turn(self, debate_id: str, turn: Dict, seq: Optional[int] = None,
+                 metadata: Optional[Dict] = None) -> int:
+        """Store one turn
+
+        Args:
+            debate_id: Debate the turn belongs to (created if unknown)
+            turn: Turn fields as kept in a conversation history
+            seq: Position in the debate; defaults to after the last stored turn
+            metadata: Updated debate metadata to save in the same commit
+
+        Returns:
+            The turn's position in the debate
+        """
+        timestamp = turn.get("timestamp") or datetime.now().isoformat()
+        extra = {k: v for k, v in turn.items() if k not in TURN_COLUMNS}
+        with self._lock:
+            if metadata is not None:
+                self._upsert_debate(metadata)
+            else:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO debates (id, start_time, start_ts) VALUES (?, ?, ?)",
+                    (debate_id, timestamp, to_epoch(timestamp))
+                )
+            if seq is None:
+                seq = self._db.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM turns WHERE debate_id = ?", (debate_id,)
+                ).fetchone()[0]
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete
+            # would not fire the full-text index's trigger
+            self._db.execute(
+                "INSERT INTO turns (debate_id, seq, agent, agent_identity, message, timestamp, ts, "
+                "model, prompt_tokens, completion_tokens, latency, cost, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(debate_id, seq) DO UPDATE SET agent = excluded.agent, "
+                "agent_identity = excluded.agent_identity, message = excluded.message, "
+                "timestamp = excluded.timestamp, ts = excluded.ts, model = excluded.model, "
+                "prompt_tokens = excluded.prompt_tokens, completion_tokens = excluded.completion_tokens, "
+                "latency = excluded.latency, cost = excluded.cost, extra = excluded.extra",
+                (debate_id, seq, turn.get("agent"), turn.get("agent_identity", turn.get("agent")),
+                 turn.get("message"), timestamp, to_epoch(timestamp), turn.get("model"),
+                 turn.get("prompt_tokens", 0), turn.get("completion_tokens", 0), turn.get("latency"),
+                 turn.get("cost", 0.0), json.dumps(extra, ensure_ascii=False) if extra else None)
+            )
+            self._db.commit()
+        return seq
+
+    def add_event(self, debate_id: str, event_type: str, description: str, level: str = "INFO"):
+        now = datetime.now()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO events (debate_id, ts, timestamp, level, event_type, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (debate_id, now.timestamp(), now.isoformat(), level, event_type, description)
+            )
+            self._db.commit()
+
+    def record_exports(self, export_dir: str, entries: List[Dict], dir_mtime_ns: int, replace: bool = False):
+        """Add export files to the manifest of ``export_dir``
+
+        Args:
+            entries: Files with ``path``, ``debate_id``, ``format``, ``mtime`` and ``size``
+            dir_mtime_ns: The directory's mtime once these files were written
+            replace: The entries are the directory's full contents (after a rescan)
+        """
+        with self._lock:
+            if replace:
+                self._db.execute("DELETE FROM exports WHERE dir = ?", (export_dir,))
+            self._db.executemany(
+                "INSERT OR REPLACE INTO exports (path, dir, debate_id, format, mtime, size) VALUES (?, ?, ?, ?, ?, ?)",
+                [(e["path"], export_dir, e.get("debate_id"), e.get("format"), e["mtime"], e["size"]) for e in entries]
+            )
+            self._db.execute("INSERT OR REPLACE INTO export_dirs (dir, mtime_ns) VALUES (?, ?)",
+                             (export_dir, dir_mtime_ns))
+            self._db.commit()
+
+    # --- Reads ----------------------------------------------------------------
+
+    def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _turn(row: sqlite3.Row) -> Dict:
+        turn = {column: row[column] for column in TURN_COLUMNS}
+        if row["extra"]:
+            turn.update(json.loads(row["extra"]))
+        return turn
+
+    def get_debate(self, debate_id: str) -> Optional[Dict]:
+        """A debate's metadata, or None if it is unknown"""
+        rows = self._query("SELECT metadata FROM debates WHERE id = ?", (debate_id,))
+        if not rows:
+            return None
+        return dict({"id": debate_id}, **json.loads(rows[0]["metadata"]))
+
+    def get_turns(self, debate_id: str) -> List[Dict]:
+        """A debate's conversation history, in order"""
+        return [self._turn(row) for row in self._query(
+            "SELECT * FROM turns WHERE debate_id = ? ORDER BY seq", (debate_id,))]
+
+    def get_events(self, debate_id: str) -> List[Dict]:
+        return [dict(row) for row in self._query(
+            "SELECT timestamp, level, event_type, description FROM events WHERE debate_id = ? ORDER BY ts, id",
+            (debate_id,))]
+
+    def list_debates(self, topic: Optional[str] = None, agent: Optional[str] = None,
+                     since=None, until=None, limit: Optional[int] = 50, offset: int = 0) -> List[Dict]:
+        """Debates newest first, with their turn count
+
+        Args:
+            topic: Only debates on this topic
+            agent: Only debates in which this agent spoke
+            since, until: Start time bounds (datetime, ISO string or epoch seconds)
+            limit, offset: Page of results (limit None for all)
+        """
+        where, params = [], []
+        if topic is not None:
+            where.append("d.topic = ?")
+            params.append(topic)
+        if agent is not None:
+            where.append("d.id IN (SELECT debate_id FROM turns WHERE agent = ?)")
+            params.append(agent)
+        if since is not None:
+            where.append("d.start_ts >= ?")
+            params.append(to_epoch(since))
+        if until is not None:
+            where.append("d.start_ts < ?")
+            params.append(to_epoch(until))
+        sql = ("SELECT d.id, d.topic, d.start_time, d.end_time, "
+               "(SELECT COUNT(*) FROM turns t WHERE t.debate_id = d.id) AS turns FROM debates d")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY d.start_ts DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        return [dict(row) for row in self._query(sql, params)]
+
+    def query_turns(self, agent: Optional[str] = None, topic: Optional[str] = None,
+                    model: Optional[str] = None, debate_id: Optional[str] = None,
+                    since=None, until=None, limit: Optional[int] = None) -> List[Dict]:
+        """Turns matching every given filter, oldest first
+
+        Each turn also carries its ``debate_id``, ``seq`` and ``topic``.
+
+        Args:
+            since, until: Turn time bounds (datetime, ISO string or epoch seconds)
+        """
+        where, params = [], []
+        for column, value in (("t.agent", agent), ("d.topic", topic), ("t.model", model),
+                              ("t.debate_id", debate_id)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("t.ts >= ?")
+            params.append(to_epoch(since))
+        if until is not None:
+            where.append("t.ts < ?")
+            params.append(to_epoch(until))
+        sql = "SELECT t.*, d.topic FROM turns t JOIN debates d ON d.id = t.debate_id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY t.ts, t.seq LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        turns = []
+        for row in self._query(sql, params):
+            turn = self._turn(row)
+            turn.update(debate_id=row["debate_id"], seq=row["seq"], topic=row["topic"])
+            turns.append(turn)
+        return turns
+
+    def search(self, query: str, limit: int = 20, offset: int = 0,
+               agent: Optional[str] = None, topic: Optional[str] = None) -> List[Dict]:
+        """Full-text search over every stored turn, best matches first
+
+        Every word in ``query`` must appear in a turn; a trailing ``*``
+        matches a prefix (``wok*``). Operators and punctuation are treated
+        as plain text.
+
+        Returns:
+            Hits with ``debate_id``, ``seq`` (the turn's position in its
+            debate), ``agent``, ``topic``, ``timestamp``, a ``snippet`` with
+            the matches in bold, and ``score`` (lower is better)
+        """
+        terms = [(word.rstrip("*"), word.endswith("*")) for word in re.findall(r"[\w*]+", query)]
+        terms = [(term, prefix) for term, prefix in terms if term]
+        if not terms:
+            return []
+        where, params = [], []
+        for column, value in (("t.agent", agent), ("d.topic", topic)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+
+        if self.fts:
+            match = " ".join(f'"{term}"' + ("*" if prefix else "") for term, prefix in terms)
+            sql = ("SELECT t.debate_id, t.seq, t.agent, d.topic, t.timestamp, "
+                   f"snippet(turns_fts, 0, '{SNIPPET_MARK}', '{SNIPPET_MARK}', '…', 16) AS snippet, "
+                   "bm25(turns_fts) AS score "
+                   "FROM turns_fts JOIN turns t ON t.rowid = turns_fts.rowid "
+                   "JOIN debates d ON d.id = t.debate_id WHERE turns_fts MATCH ?")
+            params.insert(0, match)
+            order = "score"
+        else:
+            sql = ("SELECT t.debate_id, t.seq, t.agent, d.topic, t.timestamp, t.message AS snippet, "
+                   "0.0 AS score FROM turns t JOIN debates d ON d.id = t.debate_id WHERE "
+                   + " AND ".join("t.message LIKE ?" for _ in terms))
+            params[:0] = [f"%{term}%" for term, _ in terms]
+            order = "t.ts DESC"
+        if where:
+            sql += " AND " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        return [dict(row) for row in self._query(sql, params)]
+
+    def exports_mtime(self, export_dir: str) -> Optional[int]:
+        """Directory mtime the manifest of ``export_dir`` was last in sync with"""
+        rows = self._query("SELECT mtime_ns FROM export_dirs WHERE dir = ?", (export_dir,))
+        return rows[0]["mtime_ns"] if rows else None
+
+    def list_exports(self, export_dir: str, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """A page of the manifest of ``export_dir``, newest first"""
+        return [dict(row) for row in self._query(
+            "SELECT path, debate_id, format, mtime, size FROM exports WHERE dir = ? "
+            "ORDER BY mtime DESC LIMIT ? OFFSET ?", (export_dir, limit, offset))]
+
+    def count_exports(self, export_dir: str) -> int:
+        return self._query("SELECT COUNT(*) FROM exports WHERE dir = ?", (export_dir,))[0][0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_stores: Dict = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(log_dir="logs", durable: bool = False) -> DebateStore:
+    """The process-wide store for a log directory"""
+    path = (Path(log_dir) / get_settings()["filename"]).resolve()
+    key = (path, durable)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = DebateStore(path, durable)
+        return _stores[key]
@@ -1,44 +1,107 @@
 import json
-import random
-from dotenv import load_dotenv
 import os
-import yaml
-import requests
-import asyncio
+import random
+import time
+import httpx
+import transport
+import config_service
+import response_cache
+import resilience
+import hedging
+import rate_limiter
+import key_pool
+import usage
+import tracing
+
+# OpenRouter API base URL; set OPENROUTER_BASE_URL to use another
+# OpenRouter-compatible server instead (e.g. mock_server.py)
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Canned lines for placeholder responses (also used by mock_server.py)
+PLACEHOLDER_LINES = {
+    "OpenAI": {
+        "actions": [
+            "*swirls wine glass while checking GPU cluster metrics*",
+            "*adjusts the temperature of a sous-vide bag*",
+            "*delicately plates a dish with tweezers*"
+        ],
+        "responses": [
+            "Our approach to AI is like fine dining - it costs more, but the quality speaks for itself.",
+            "Just as a great chef needs the finest ingredients, our models need premium compute resources.",
+            "While others rush their models, we slow-cook ours to perfection."
+        ]
+    },
+    "DeepSeek": {
+        "actions": [
+            "*efficiently stir-fries ingredients with minimal waste*",
+            "*skillfully flips a wok with perfect technique*",
+            "*serves a delicious dish made with simple ingredients*"
+        ],
+        "responses": [
+            "Great AI is like great street food - it's about skill and efficiency, not expensive ingredients.",
+            "Our models prove you don't need a billion-dollar kitchen to cook up state-of-the-art results.",
+            "The best chefs can create masterpieces with limited resources - that's what we do with our models."
+        ]
+    }
+}
+
+def openrouter_api_url() -> str:
+    """Chat completions endpoint, honouring OPENROUTER_BASE_URL"""
+    config_service.load_env()
+    return os.getenv("OPENROUTER_BASE_URL", OPENROUTER_BASE_URL).rstrip("/") + "/chat/completions"
 
 class DebateAgent:
-    def __init__(self, name: str, personality: str):
-        # Load environment variables
-        load_dotenv()
+    def __init__(self, name: str, personality: str, prompt_suffix: str = "",
+                 model: str = None, temperature: float = None):
+        # Load environment variables (once per process)
+        config_service.load_env()
         
         self.name = name
         self.personality = personality
-        self.api_key = os.getenv("OPENROUTER_API_KEY")
+        # Extra instructions appended to every prompt (e.g. a debate style's prompt_suffix)
+        self.prompt_suffix = prompt_suffix
+        # Optional overrides of the configured model and the default temperature
+        self.model = model
+        self.temperature = temperature
+        # Shared pool of OpenRouter keys (OPENROUTER_API_KEYS, a keys file or OPENROUTER_API_KEY)
+        self.key_pool = key_pool.get_pool()
         
-        # Load debate configuration
-        self.config = self.load_config()
+        # Timing of the most recent response (time to first token and total)
+        self.last_timing = None
+        
+        # Token usage and cost of the most recent response
+        self.last_usage = None
+        
+        # Apply connection pool settings to the shared HTTP transport
+        transport.configure(self.config.get('http'))
         
         # Debug
         print(f"Initialized agent: {self.name} with personality type: {personality[:20]}...")
         
+    @property
+    def config(self):
+        """Current config snapshot; picks up edits to config.yaml without a restart"""
+        return self.load_config()
+        
     def load_config(self):
         try:
-            with open('config.yaml', 'r') as file:
-                return yaml.safe_load(file)
+            return config_service.get_config()
             
-        except Exception as e:
+        except config_service.ConfigError as e:
             print(f"Error loading config: {e}")
             return {}
         
-    async def generate_response(self, context: str, opponent_message: str, conversation_history=None) -> str:
-        # If we're in test mode or don't have an API key, return a placeholder response
-        if not self.api_key:
-            print("No API key found - using placeholder response")
-            return self.generate_placeholder_response()
+    def build_prompt(self, opponent_message: str, context: str = ""):
+        """Fill the debate prompt template for this agent
         
-        # For debugging
-        print(f"Generating response for agent: {self.name}")
+        Args:
+            opponent_message: The message being answered
+            context: The debate so far (memory summary and recent turns),
+                placed before the debate prompt when given
         
+        Returns:
+            Tuple of (prompt, model), or None if no agent config is found
+        """
         # Find the right agent configuration
         agent_config = None
         if self.name == "OpenAI":
@@ -49,25 +112,78 @@ class DebateAgent:
             model = agent_config.get('model', "deepseek/deepseek-chat")
             
         if not agent_config:
-            print("No agent config found - using placeholder response")
-            return self.generate_placeholder_response()
+            return None
+        model = self.model or model
         
         # Get the debate prompt
         debate_prompt = self.config.get('debate_prompt', '')
         
         # Build the prompt by filling in the template with actual values
         personality = agent_config.get('personality', '')
-        prompt = f"{personality}\n\n{debate_prompt}".format(
-            name=self.name, 
-            opponent_message=opponent_message
-        )
+        fields = {"name": self.name, "opponent_message": opponent_message}
+        # Filled separately so braces in the context are never read as fields
+        parts = [personality.format(**fields)]
+        if context and context.strip():
+            parts.append(f"Debate so far:\n{context.strip()}")
+        parts.append(debate_prompt.format(**fields))
+        prompt = "\n\n".join(parts)
+        if self.prompt_suffix:
+            prompt = f"{prompt}\n\n{self.prompt_suffix}"
+        return prompt, model
+        
+    def fallback_models(self):
+        """Models to hedge to when the primary model is slow or failing"""
+        key = {"OpenAI": "openai", "DeepSeek": "deepseek"}.get(self.name)
+        agent_config = self.config.get('agents', {}).get(key, {}) if key else {}
+        return list(agent_config.get('fallback_models', []))
+        
+    async def generate_response(self, context: str, opponent_message: str, conversation_history=None, use_cache: bool = True) -> str:
+        start_time = time.perf_counter()
+        self.last_usage = usage.make_usage(None)
+        with tracing.span("agent.generate_response", agent=self.name, streamed=False) as span:
+            response = await self._generate_response(context, opponent_message, conversation_history, use_cache)
+            span.set(model=self.last_usage["model"], cached=self.last_usage["cached"])
+        
+        # Without streaming the first token arrives with the full reply
+        total_time = time.perf_counter() - start_time
+        self.last_timing = {"ttft": total_time, "total_time": total_time, "streamed": False}
+        return response
+        
+    async def _generate_response(self, context: str, opponent_message: str, conversation_history=None, use_cache: bool = True) -> str:
+        # If we're in test mode or don't have an API key, return a placeholder response
+        if not self.key_pool.has_keys():
+            print("No API key found - using placeholder response")
+            return self.generate_placeholder_response()
+        
+        # For debugging
+        print(f"Generating response for agent: {self.name}")
+        
+        with tracing.span("prompt.build", agent=self.name):
+            request = self.build_prompt(opponent_message, context)
+        if not request:
+            print("No agent config found - using placeholder response")
+            return self.generate_placeholder_response()
+        prompt, model = request
         
         print(f"Calling API for {self.name} using model: {model}")
         
-        # Make the API call to OpenRouter
+        # Every attempt that got a reply is billed, including hedges that lost
+        # the race. call_openrouter_api sets last_usage just before returning,
+        # so it is read here before any other attempt can overwrite it.
+        replies = []
+        
+        async def attempt(candidate):
+            reply = await self.call_openrouter_api(prompt, candidate, use_cache=use_cache)
+            if reply:
+                replies.append((reply, self.last_usage))
+            return reply
+        
+        # Make the API call to OpenRouter, hedging to fallback models if the primary is slow
         try:
-            response = await self.call_openrouter_api(prompt, model)
+            response = await hedging.hedged_call([model] + self.fallback_models(), attempt)
             if response:
+                winner = next((u for reply, u in replies if reply is response), self.last_usage)
+                self.last_usage = usage.with_discarded(winner, [u for _, u in replies if u is not winner])
                 return response
             else:
                 print("API call failed - using placeholder response")
@@ -76,19 +192,57 @@ class DebateAgent:
             print(f"Error calling API: {e}")
             return self.generate_placeholder_response()
         
-    async def call_openrouter_api(self, prompt, model):
-        """Make an API call to OpenRouter to generate a response"""
+    async def generate_response_stream(self, context: str, opponent_message: str, conversation_history=None, use_cache: bool = True):
+        """Stream a response token by token as an async iterator
+        
+        A cached response is yielded as a single chunk. Falls back to a
+        placeholder response (also a single chunk) when there is no API key,
+        no agent config, or the stream fails before any token arrives. Timing
+        is recorded in ``self.last_timing`` and usage in ``self.last_usage``.
+        """
+        start_time = time.perf_counter()
+        self.last_usage = usage.make_usage(None)
+        ttft = None
+        # Ended explicitly: a with-block span must not stay open across yields
+        span = tracing.start_span("agent.generate_response", agent=self.name, streamed=True)
+        with tracing.activate(span), tracing.span("prompt.build", agent=self.name):
+            request = self.build_prompt(opponent_message, context) if self.key_pool.has_keys() else None
         
-        # OpenRouter API endpoint
-        api_url = "https://openrouter.ai/api/v1/chat/completions"
+        if request:
+            prompt, model = request
+            print(f"Streaming API response for {self.name} using model: {model}")
+            try:
+                async for token in tracing.traced(self.call_openrouter_api_stream(prompt, model, use_cache=use_cache), span):
+                    if ttft is None:
+                        ttft = time.perf_counter() - start_time
+                    yield token
+            except Exception as e:
+                print(f"Error in streaming API call: {e}")
+        else:
+            print("No API key or agent config found - using placeholder response")
         
-        # Request headers
-        headers = {
+        if ttft is None:
+            ttft = time.perf_counter() - start_time
+            yield self.generate_placeholder_response()
+        
+        self.last_timing = {
+            "ttft": ttft,
+            "total_time": time.perf_counter() - start_time,
+            "streamed": True
+        }
+        span.set(model=self.last_usage["model"], cached=self.last_usage["cached"], ttft=ttft)
+        span.end()
+        
+    def _build_headers(self, api_key):
+        """Request headers for an OpenRouter call made with the given key"""
+        return {
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
+            "Authorization": f"Bearer {api_key}",
             "HTTP-Referer": "https://kitchendebate.example.com"  # Replace with your actual site
         }
         
+    def _build_request(self, prompt, model, stream=False):
+        """Build the body for an OpenRouter chat completion"""
         # Request body
         data = {
             "model": model,
@@ -96,64 +250,227 @@ class DebateAgent:
                 {"role": "system", "content": "You are participating in a debate as a chef. The debate is about AI development approaches."},
                 {"role": "user", "content": prompt}
             ],
-            "temperature": 0.9,
+            "temperature": self.temperature if self.temperature is not None else 0.9,
             "max_tokens": 150
         }
+        if stream:
+            data["stream"] = True
+            # Ask OpenRouter to append token usage to the end of the stream
+            data["usage"] = {"include": True}
+        return data
+        
+    async def _send_attempt(self, client, prompt, data, stream=False, timing=None):
+        """Send one request attempt with a key taken from the pool
+        
+        Each attempt (including retries) picks a fresh key, so a key that was
+        just rate limited or rejected is skipped on the retry. A key rejected
+        with 401/403 is quarantined and the request moves straight on to the
+        next healthy key.
+        
+        If ``timing`` is given, ``timing["sent"]`` is set to the moment the
+        request goes out, after any rate limiter wait.
+        
+        Raises:
+            key_pool.NoHealthyKeyError: If every key is quarantined
+        """
+        while True:
+            api_key = self.key_pool.acquire()
+            try:
+                # Queue locally if this model or key is over its request/token budget
+                await rate_limiter.limiter.acquire(
+                    data["model"], api_key, rate_limiter.estimate_tokens(prompt, data["max_tokens"])
+                )
+                request = client.build_request(
+                    "POST", openrouter_api_url(), headers=self._build_headers(api_key), json=data
+                )
+                if timing is not None:
+                    timing["sent"] = time.perf_counter()
+                response = await client.send(request, stream=stream)
+            except BaseException:
+                self.key_pool.release(api_key)
+                raise
+            self.key_pool.release(api_key, response.status_code, response.headers.get("Retry-After"))
+            
+            if response.status_code not in (401, 403) or not self.key_pool.has_healthy_keys():
+                return response
+            await response.aclose()
+        
+    def _cache_lookup(self, data, use_cache):
+        """Look up a request in the response cache
+        
+        Returns:
+            Tuple of (cache, key, cached_response); cache and key are None when caching is off
+        
+        A cache that fails to read (e.g. SQLite "database is locked") counts as a miss.
+        """
+        cache = response_cache.get_cache() if use_cache else None
+        if cache is None:
+            return None, None, None
+        key = cache.make_key(data["model"], data["messages"], data["temperature"], data["max_tokens"])
+        try:
+            return cache, key, cache.get(key)
+        except Exception as e:
+            print(f"Response cache read failed, treating as a miss: {str(e)}")
+            return cache, key, None
+    
+    def _cache_store(self, cache, key, text):
+        """Store a reply in the response cache; a failed write never loses the reply"""
+        if cache is None:
+            return
+        try:
+            cache.set(key, text)
+        except Exception as e:
+            print(f"Response cache write failed: {str(e)}")
+        
+    async def call_openrouter_api(self, prompt, model, use_cache: bool = True):
+        """Make an API call to OpenRouter to generate a response
+        
+        Set use_cache=False to skip the response cache and force fresh sampling.
+        """
+        
+        data = self._build_request(prompt, model)
+        
+        with tracing.span("cache.lookup", agent=self.name, model=model) as span:
+            cache, cache_key, cached = self._cache_lookup(data, use_cache)
+            span.set(hit=cached is not None)
+        if cached is not None:
+            print(f"Cache hit for {self.name}")
+            self.last_usage = usage.make_usage(model, cached=True)
+            return cached
         
         print(f"Sending request to OpenRouter for {self.name}")
         
-        # Make the API call asynchronously
+        # Make the API call over the shared connection pool, retrying transient failures
         try:
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post(api_url, headers=headers, json=data)
-            )
+            # Latency runs from the attempt that produced the response, not
+            # from before rate limiter waits and retry backoff
+            timing = {}
+            client = transport.get_client()
+            with tracing.span("provider.request", agent=self.name, model=model) as span:
+                response = await resilience.send_with_retry(
+                    lambda: self._send_attempt(client, prompt, data, timing=timing),
+                    model
+                )
+                span.set(status_code=response.status_code)
             
             # Check if the request was successful
             if response.status_code == 200:
-                response_data = response.json()
-                generated_text = response_data['choices'][0]['message']['content']
+                latency = time.perf_counter() - timing["sent"]
+                hedging.latency.record(model, latency)
+                with tracing.span("provider.parse", agent=self.name, model=model):
+                    response_data = response.json()
+                    generated_text = response_data['choices'][0]['message']['content']
+                
+                # Keep the provider's token counts for cost accounting
+                usage_block = response_data.get('usage') or {}
+                self.last_usage = usage.make_usage(
+                    model,
+                    usage_block.get('prompt_tokens', 0),
+                    usage_block.get('completion_tokens', 0),
+                    latency
+                )
                 print(f"API response for {self.name}: {generated_text[:50]}...")
+                self._cache_store(cache, cache_key, generated_text)
                 return generated_text
             else:
                 print(f"API error: {response.status_code} - {response.text}")
                 return None
+        except (resilience.CircuitOpenError, key_pool.NoHealthyKeyError) as e:
+            print(f"Skipping API call: {str(e)}")
+            return None
+        except httpx.HTTPError as e:
+            print(f"HTTP error in API call: {str(e)}")
+            return None
         except Exception as e:
             print(f"Error in API call: {str(e)}")
             return None
+        
+    async def call_openrouter_api_stream(self, prompt, model, use_cache: bool = True):
+        """Stream a chat completion from OpenRouter, yielding text deltas
+        
+        Raises:
+            httpx.HTTPStatusError: If OpenRouter answers with a non-200 status
+            resilience.CircuitOpenError: If the model's circuit breaker is open
+            key_pool.NoHealthyKeyError: If every API key is quarantined
+        """
+        data = self._build_request(prompt, model, stream=True)
+        
+        with tracing.span("cache.lookup", agent=self.name, model=model) as span:
+            cache, cache_key, cached = self._cache_lookup(data, use_cache)
+            span.set(hit=cached is not None)
+        if cached is not None:
+            print(f"Cache hit for {self.name}")
+            self.last_usage = usage.make_usage(model, cached=True)
+            yield cached
+            return
+        
+        print(f"Opening stream to OpenRouter for {self.name}")
+        
+        timing = {}
+        client = transport.get_client()
+        
+        # Retries only cover opening the stream; a stream that fails midway is not replayed
+        with tracing.span("provider.request", agent=self.name, model=model, stream=True) as span:
+            response = await resilience.send_with_retry(
+                lambda: self._send_attempt(client, prompt, data, stream=True, timing=timing),
+                model
+            )
+            span.set(status_code=response.status_code)
+        stream_span = tracing.start_span("provider.stream", agent=self.name, model=model)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                print(f"API error: {response.status_code} - {response.text}")
+                response.raise_for_status()
+            
+            # Server-sent events: "data: {...}" lines, ": comment" keep-alives and a final "data: [DONE]"
+            chunks = []
+            usage_block = None
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(payload)
+                except json.JSONDecodeError:
+                    continue
+                # The final chunk carries the usage block
+                usage_block = chunk.get("usage") or usage_block
+                choices = chunk.get("choices") or [{}]
+                token = (choices[0].get("delta") or {}).get("content")
+                if token:
+                    chunks.append(token)
+                    yield token
+            
+            text = "".join(chunks)
+            if usage_block is None:
+                # No usage reported: estimate at ~4 characters per token
+                usage_block = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+            self.last_usage = usage.make_usage(
+                model,
+                usage_block.get("prompt_tokens", 0),
+                usage_block.get("completion_tokens", 0),
+                time.perf_counter() - timing["sent"]
+            )
+            
+            if chunks:
+                self._cache_store(cache, cache_key, text)
+            stream_span.set(chunks=len(chunks))
+        finally:
+            stream_span.end()
+            await response.aclose()
     
     def generate_placeholder_response(self):
         """Generate a placeholder response if API call fails"""
+        resilience.metrics.increment("placeholder_responses", self.name)
         
         # Basic placeholder responses that match the personalities
-        if self.name == "OpenAI":
-            actions = [
-                "*swirls wine glass while checking GPU cluster metrics*",
-                "*adjusts the temperature of a sous-vide bag*",
-                "*delicately plates a dish with tweezers*"
-            ]
-            
-            responses = [
-                "Our approach to AI is like fine dining - it costs more, but the quality speaks for itself.",
-                "Just as a great chef needs the finest ingredients, our models need premium compute resources.",
-                "While others rush their models, we slow-cook ours to perfection."
-            ]
-        else:  # DeepSeek
-            actions = [
-                "*efficiently stir-fries ingredients with minimal waste*",
-                "*skillfully flips a wok with perfect technique*",
-                "*serves a delicious dish made with simple ingredients*"
-            ]
-            
-            responses = [
-                "Great AI is like great street food - it's about skill and efficiency, not expensive ingredients.",
-                "Our models prove you don't need a billion-dollar kitchen to cook up state-of-the-art results.",
-                "The best chefs can create masterpieces with limited resources - that's what we do with our models."
-            ]
+        lines = PLACEHOLDER_LINES["OpenAI" if self.name == "OpenAI" else "DeepSeek"]
             
         # Select random action and response
-        action = random.choice(actions)
-        response = random.choice(responses)
+        action = random.choice(lines["actions"])
+        response = random.choice(lines["responses"])
         
         return f"{action}\n\"{response}\"" 
\ No newline at end of file
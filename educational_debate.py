@@ -6,13 +6,13 @@ an AI debate between two models with different personalities. This educational
 implementation focuses on clarity and simplicity rather than advanced features.
 
 Usage:
-    python educational_debate.py [--enhanced-memory]
+    python educational_debate.py [--enhanced-memory] [--memory-mode rolling|retrieval]
 
 Requirements:
     - Python 3.8+
     - OpenAI API key in a .env file (for OpenAI chef)
     - OpenRouter API key in a .env file (for DeepSeek chef)
-    - Required packages: openai, python-dotenv, asyncio, requests
+    - Required packages: python-dotenv, asyncio, httpx
 """
 
 import os
@@ -22,7 +22,11 @@ import datetime
 import argparse
 from typing import List, Dict, Optional
 from dotenv import load_dotenv
-import requests
+import transport
+import response_cache
+import resilience
+import rate_limiter
+import memory
 
 # Load environment variables
 load_dotenv()
@@ -151,13 +155,15 @@ class DebateAgent:
             print(f"Warning: Unknown API type '{api_type}' for {name}. Using placeholder responses.")
             self.api_key = None
     
-    async def generate_response(self, topic: str, opponent_message: str = "", conversation_history: str = "") -> str:
+    async def generate_response(self, topic: str, opponent_message: str = "", conversation_history: str = "",
+                                use_cache: bool = True) -> str:
         """Generate a debate response.
         
         Args:
             topic: The debate topic
             opponent_message: The previous message from the opponent
             conversation_history: Optional string containing prior conversation
+            use_cache: Set to False to always request a fresh generation
             
         Returns:
             A response string from this agent
@@ -186,30 +192,40 @@ class DebateAgent:
             )
         
         try:
-            # Make the API request based on the API type
-            if self.api_type == "openai":
-                response = await self._call_openai_api(prompt)
-            elif self.api_type == "openrouter":
-                response = await self._call_openrouter_api(prompt)
-            else:
-                response = self._get_placeholder_response()
-                
-            return response
+            return await self.complete(prompt, use_cache)
         except Exception as e:
             print(f"Error generating response for {self.name}: {e}")
             return self._get_placeholder_response()
     
-    async def _call_openai_api(self, prompt: str) -> str:
+    async def complete(self, prompt: str, use_cache: bool = True) -> str:
+        """Send a prompt to this agent's model and return the reply.
+        
+        Args:
+            prompt: The prompt to send
+            use_cache: Whether an identical earlier request may be answered from the cache
+            
+        Returns:
+            The generated text response (a placeholder for an unknown API type)
+        """
+        # Make the API request based on the API type
+        if self.api_type == "openai":
+            return await self._call_openai_api(prompt, use_cache)
+        elif self.api_type == "openrouter":
+            return await self._call_openrouter_api(prompt, use_cache)
+        return self._get_placeholder_response()
+    
+    async def _call_openai_api(self, prompt: str, use_cache: bool = True) -> str:
         """Call the OpenAI API to generate a response.
         
         Args:
             prompt: The prompt to send to the API
+            use_cache: Whether an identical earlier request may be answered from the cache
             
         Returns:
             The generated text response
         """
-        # API endpoint
-        api_url = "https://api.openai.com/v1/chat/completions"
+        # API endpoint (OPENAI_BASE_URL points it at another compatible server)
+        api_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/") + "/chat/completions"
         
         # Request headers
         headers = {
@@ -228,30 +244,20 @@ class DebateAgent:
             "max_tokens": 150
         }
         
-        # Use asyncio to make the API call asynchronously
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: requests.post(api_url, headers=headers, json=data)
-        )
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
-        else:
-            raise Exception(f"OpenAI API error: {response.status_code} - {response.text}")
+        return await self._send_request(api_url, headers, data, "OpenAI", use_cache)
     
-    async def _call_openrouter_api(self, prompt: str) -> str:
+    async def _call_openrouter_api(self, prompt: str, use_cache: bool = True) -> str:
         """Call the OpenRouter API to generate a response.
         
         Args:
             prompt: The prompt to send to the API
+            use_cache: Whether an identical earlier request may be answered from the cache
             
         Returns:
             The generated text response
         """
-        # OpenRouter API endpoint
-        api_url = "https://openrouter.ai/api/v1/chat/completions"
+        # OpenRouter API endpoint (OPENROUTER_BASE_URL points it at another compatible server)
+        api_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/") + "/chat/completions"
         
         # Request headers
         headers = {
@@ -271,21 +277,55 @@ class DebateAgent:
             "max_tokens": 150
         }
         
-        # Use asyncio to make the API call asynchronously
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: requests.post(api_url, headers=headers, json=data)
+        return await self._send_request(api_url, headers, data, "OpenRouter", use_cache)
+    
+    async def _send_request(self, api_url: str, headers: Dict, data: Dict, provider: str, use_cache: bool) -> str:
+        """Send a chat completion request, serving repeated prompts from the cache.
+        
+        Args:
+            api_url: The chat completions endpoint
+            headers: Request headers
+            data: Request body
+            provider: Provider name used in error messages
+            use_cache: Whether to consult and fill the response cache
+            
+        Returns:
+            The generated text response
+        """
+        # Identical prompts (same model, messages and sampling settings) are answered from the cache
+        cache = response_cache.get_cache() if use_cache else None
+        if cache is not None:
+            cache_key = cache.make_key(data["model"], data["messages"], data["temperature"], data["max_tokens"])
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # Wait for room in the shared per-model and per-key rate limits
+        prompt_text = "".join(message["content"] for message in data["messages"])
+        await rate_limiter.limiter.acquire(
+            data["model"], self.api_key, rate_limiter.estimate_tokens(prompt_text, data["max_tokens"])
+        )
+        
+        # Send the request over the shared connection pool, retrying 429s and 5xx errors.
+        # Raises resilience.CircuitOpenError straight away if this model keeps failing.
+        client = transport.get_client()
+        response = await resilience.send_with_retry(
+            lambda: client.post(api_url, headers=headers, json=data),
+            data["model"]
         )
         
         # Check if the request was successful
         if response.status_code == 200:
-            return response.json()["choices"][0]["message"]["content"]
+            text = response.json()["choices"][0]["message"]["content"]
+            if cache is not None:
+                cache.set(cache_key, text)
+            return text
         else:
-            raise Exception(f"OpenRouter API error: {response.status_code} - {response.text}")
+            raise Exception(f"{provider} API error: {response.status_code} - {response.text}")
     
     def _get_placeholder_response(self) -> str:
         """Generate a placeholder response when API is unavailable."""
+        resilience.metrics.increment("placeholder_responses", self.name)
         if "OpenAI" in self.name:
             return "*delicately sips wine while checking GPU metrics on phone*\nOur GPT-4, slow-roasted over 10,000 A100s for months, is like a fine Bordeaux - the $13B investment in ingredients ensures a depth of flavor your street food approach can never achieve."
         else:
@@ -294,7 +334,8 @@ class DebateAgent:
 class DebateManager:
     """Manages a debate between two agents."""
     
-    def __init__(self, agent1: DebateAgent, agent2: DebateAgent, topic: str, use_enhanced_memory: bool = False):
+    def __init__(self, agent1: DebateAgent, agent2: DebateAgent, topic: str, use_enhanced_memory: bool = False,
+                 use_cache: bool = True, memory_mode: Optional[str] = None):
         """Initialize the debate manager.
         
         Args:
@@ -302,6 +343,9 @@ class DebateManager:
             agent2: The second debate agent
             topic: The debate topic
             use_enhanced_memory: Whether to use enhanced context memory
+            use_cache: Whether agents may reuse cached responses for repeated prompts
+            memory_mode: "rolling" (recent turns plus a summary) or "retrieval"
+                (recent turns plus the most relevant earlier ones); defaults to config.yaml
         """
         self.agent1 = agent1
         self.agent2 = agent2
@@ -309,6 +353,15 @@ class DebateManager:
         self.conversation_history: List[Dict] = []
         self.current_turn = 0
         self.use_enhanced_memory = use_enhanced_memory
+        self.use_cache = use_cache
+        
+        # Recent turns verbatim plus a running summary of older ones (or the
+        # most relevant earlier turns), so the context stays the same size
+        # however long the debate runs
+        summarizer = None
+        if use_enhanced_memory and memory.get_settings()["summarizer"] == "llm" and agent1.api_key:
+            summarizer = memory.make_llm_summarizer(lambda prompt: agent1.complete(prompt, use_cache))
+        self.memory = memory.create_memory(memory_mode, summarizer)
         
         if use_enhanced_memory:
             print("Enhanced memory enabled - agents will have access to conversation history")
@@ -320,30 +373,40 @@ class DebateManager:
             The first debate response
         """
         # Get initial response from agent1
-        initial_response = await self.agent1.generate_response(self.topic)
+        initial_response = await self.agent1.generate_response(self.topic, use_cache=self.use_cache)
         
         # Add to conversation history
+        self._record_turn(self.agent1.name, initial_response)
+        
+        return initial_response
+    
+    def _record_turn(self, agent_name: str, message: str) -> None:
+        """Add a turn to the conversation history and the rolling memory.
+        
+        Args:
+            agent_name: The name of the agent who spoke
+            message: What the agent said
+        """
         self.conversation_history.append({
-            "agent": self.agent1.name,
-            "message": initial_response,
+            "agent": agent_name,
+            "message": message,
             "timestamp": datetime.datetime.now().isoformat()
         })
-        
-        return initial_response
+        self.memory.add(agent_name, message)
     
     def _build_conversation_context(self) -> str:
-        """Build a string representation of the conversation history.
+        """Build the conversation context for the next prompt.
         
         This enhanced context allows agents to remember and reference
-        earlier parts of the conversation.
+        earlier parts of the conversation: the latest turns verbatim and
+        either a summary of the points made before them or the earlier turns
+        most relevant to the opponent's last message.
         
         Returns:
             A formatted string with the debate history
         """
-        context = ""
-        for entry in self.conversation_history:
-            context += f"{entry['agent']}: {entry['message']}\n\n"
-        return context.strip()
+        last_message = self.conversation_history[-1]["message"] if self.conversation_history else ""
+        return self.memory.render(last_message)
     
     async def next_turn(self) -> str:
         """Proceed to the next turn in the debate.
@@ -371,15 +434,12 @@ class DebateManager:
         response = await current_agent.generate_response(
             self.topic, 
             last_message,
-            context
+            context,
+            use_cache=self.use_cache
         )
         
         # Add to conversation history
-        self.conversation_history.append({
-            "agent": current_agent.name,
-            "message": response,
-            "timestamp": datetime.datetime.now().isoformat()
-        })
+        self._record_turn(current_agent.name, response)
         
         # Increment turn counter
         self.current_turn += 1
@@ -410,12 +470,15 @@ class DebateManager:
             f.write(self.get_transcript())
         print(f"Transcript saved to {filename}")
 
-async def run_debate(num_turns: int = 6, use_enhanced_memory: bool = False) -> None:
+async def run_debate(num_turns: int = 6, use_enhanced_memory: bool = False, use_cache: bool = True,
+                     memory_mode: Optional[str] = None) -> None:
     """Run a complete debate for a specified number of turns.
     
     Args:
         num_turns: The number of debate turns to execute
         use_enhanced_memory: Whether to use enhanced context memory
+        use_cache: Whether to reuse cached responses for repeated prompts
+        memory_mode: "rolling" or "retrieval" enhanced memory (default from config.yaml)
     """
     # Create the debate agents
     openai_chef = DebateAgent(
@@ -437,7 +500,9 @@ async def run_debate(num_turns: int = 6, use_enhanced_memory: bool = False) -> N
         agent1=openai_chef,
         agent2=deepseek_chef,
         topic=CONFIG["debate_topic"],
-        use_enhanced_memory=use_enhanced_memory
+        use_enhanced_memory=use_enhanced_memory,
+        use_cache=use_cache,
+        memory_mode=memory_mode
     )
     
     # Start the debate
@@ -453,9 +518,17 @@ async def run_debate(num_turns: int = 6, use_enhanced_memory: bool = False) -> N
         current_agent = deepseek_chef.name if i % 2 == 0 else openai_chef.name
         print(f"{current_agent}: {response}\n")
     
+    # Let a background summary update finish before leaving the event loop
+    await debate.memory.flush()
+    
     # Save the transcript
     memory_type = "enhanced_memory" if use_enhanced_memory else "basic"
     debate.save_transcript(f"ai_debate_{memory_type}.txt")
+    
+    cache = response_cache.get_cache()
+    if use_cache and cache is not None:
+        stats = cache.stats()
+        print(f"Response cache: {stats['memory_hits'] + stats['disk_hits']} hits, {stats['misses']} misses")
     print("\nDebate completed!")
 
 if __name__ == "__main__":
@@ -463,8 +536,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run an AI chef debate')
     parser.add_argument('--enhanced-memory', action='store_true',
                         help='Enable enhanced memory to use conversation history')
+    parser.add_argument('--memory-mode', choices=['rolling', 'retrieval'],
+                        help='Enhanced memory mode: recent turns plus a running summary (rolling) '
+                             'or plus the most relevant earlier turns (retrieval); default from config.yaml')
     parser.add_argument('--turns', type=int, default=6,
                         help='Number of debate turns to generate')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always request fresh responses instead of reusing cached ones')
     args = parser.parse_args()
     
     # Check if API keys are available
@@ -479,4 +557,5 @@ if __name__ == "__main__":
         print("OPENROUTER_API_KEY=your_key_here\n")
     
     # Run the debate
-    asyncio.run(run_debate(num_turns=args.turns, use_enhanced_memory=args.enhanced_memory)) 
\ No newline at end of file
+    asyncio.run(run_debate(num_turns=args.turns, use_enhanced_memory=args.enhanced_memory,
+                           use_cache=not args.no_cache, memory_mode=args.memory_mode)) 
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""Single-pass, incremental debate exporter.
+
+Every format (JSON, plain text, Markdown, CSV) is rendered from the same
+walk over the conversation: each turn's timestamp is parsed once and the
+turn is rendered for all requested formats at that point.
+
+``IncrementalExporter`` keeps one file per format and remembers how many
+turns each already holds, so a repeated export only appends the new turns.
+The JSON export lists the conversation before the metadata, which lets an
+append overwrite just the closing metadata block. ``stream_export`` yields
+any format in chunks without touching disk, e.g. for ``st.download_button``.
+
+``ExportManifest`` lists an export directory from a manifest in the debate
+store, which ``DebateLogger.export_debate`` updates as it writes. Listing
+a page costs one ``stat`` of the directory plus an indexed query; the
+directory is only rescanned when its mtime shows files were added or
+removed behind the manifest's back.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+FORMATS = ("json", "txt", "markdown", "csv")
+EXTENSIONS = {"json": "json", "txt": "txt", "markdown": "md", "csv": "csv"}
+MIME_TYPES = {"json": "application/json", "txt": "text/plain", "markdown": "text/markdown", "csv": "text/csv"}
+CSV_COLUMNS = ["Timestamp", "Agent", "Identity", "Message", "Prompt Tokens", "Completion Tokens", "Cost"]
+
+FORMAT_BY_EXTENSION = {ext: fmt for fmt, ext in EXTENSIONS.items()}
+EXPORT_NAME = re.compile(r"debate_export_(?P<debate_id>.+)_\d{8}_\d{6}\.(?P<ext>\w+)$")
+
+# Turns rendered per chunk when streaming
+STREAM_CHUNK_TURNS = 100
+
+
+def _indent(text: str, prefix: str) -> str:
+    return "\n".join(prefix + line for line in text.splitlines())
+
+
+def _csv_row(values: List) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
+def render_header(fmt: str, metadata: Dict) -> str:
+    if fmt == "json":
+        return '{\n  "conversation": ['
+    if fmt == "txt":
+        return (f"AI Dinner Battle - Debate Transcript\n"
+                f"Topic: {metadata.get('topic')}\n" + "=" * 50 + "\n\n")
+    if fmt == "markdown":
+        return (f"# AI Dinner Battle - Debate Transcript\n\n"
+                f"**Topic:** {metadata.get('topic')}\n\n"
+                f"**Date:** {datetime.now().strftime('%Y-%m-%d')}\n\n---\n\n")
+    if fmt == "csv":
+        return _csv_row(CSV_COLUMNS)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def render_footer(fmt: str, metadata: Dict) -> str:
+    """Closing block; only JSON has one, and it changes as the metadata does"""
+    if fmt == "json":
+        return ('\n  ],\n  "metadata": '
+                + _indent(json.dumps(metadata, indent=2, ensure_ascii=False), "  ").lstrip()
+                + "\n}\n")
+    return ""
+
+
+def render_turns(turns: Iterable[Dict], formats: Dict[str, int], first_index: int = 0) -> Dict[str, List[str]]:
+    """Render turns for several formats in one pass
+
+    Args:
+        turns: Turns in debate order, starting at ``first_index``
+        formats: Format -> index of the first turn it still needs
+        first_index: Index of the first turn in ``turns``
+
+    Returns:
+        Format -> list of rendered chunks
+    """
+    chunks = {fmt: [] for fmt in formats}
+    for index, turn in enumerate(turns, start=first_index):
+        agent = turn["agent"]
+        identity = turn.get("agent_identity", agent)
+        message = turn["message"]
+        turn_time = datetime.fromisoformat(turn["timestamp"])
+        for fmt, start in formats.items():
+            if index < start:
+                continue
+            if fmt == "json":
+                separator = "," if index > 0 else ""
+                chunks[fmt].append(separator + "\n" + _indent(json.dumps(turn, indent=2, ensure_ascii=False), "    "))
+            elif fmt == "txt":
+                chunks[fmt].append(f"[{turn_time.strftime('%Y-%m-%d %H:%M:%S')}] {agent} ({identity}):\n{message}\n\n")
+            elif fmt == "markdown":
+                avatar = "🎩" if identity == "OpenAI" else "🍜"
+                chunks[fmt].append(f"## {avatar} {agent}\n\n*{turn_time.strftime('%H:%M:%S')}*\n\n{message}\n\n---\n\n")
+            elif fmt == "csv":
+                chunks[fmt].append(_csv_row([
+                    turn["timestamp"], agent, identity, message,
+                    turn.get("prompt_tokens", 0), turn.get("completion_tokens", 0), turn.get("cost", 0.0)
+                ]))
+    return chunks
+
+
+def stream_export(metadata: Dict, history: List[Dict], fmt: str,
+                  chunk_turns: int = STREAM_CHUNK_TURNS) -> Iterator[bytes]:
+    """Yield one format as UTF-8 chunks, without writing a file"""
+    yield render_header(fmt, metadata).encode("utf-8")
+    for start in range(0, len(history), chunk_turns):
+        rendered = render_turns(history[start:start + chunk_turns], {fmt: 0}, start)[fmt]
+        yield "".join(rendered).encode("utf-8")
+    yield render_footer(fmt, metadata).encode("utf-8")
+
+
+def export_bytes(metadata: Dict, history: List[Dict], fmt: str) -> bytes:
+    """One format rendered in memory (e.g. as ``st.download_button`` data)"""
+    return b"".join(stream_export(metadata, history, fmt))
+
+
+class IncrementalExporter:
+    """Export files for one debate that grow with it"""
+
+    def __init__(self, export_dir, debate_id: str):
+        self.export_dir = Path(export_dir)
+        self.debate_id = debate_id
+        # Format -> {"path", "turns" written, "footer_at" byte offset (JSON only)}
+        self._files: Dict[str, Dict] = {}
+
+    def export(self, metadata: Dict, history: List[Dict], formats: Iterable[str] = FORMATS,
+               incremental: bool = True) -> Dict[str, str]:
+        """Bring the export files up to date with ``history``
+
+        Args:
+            metadata: Debate metadata (written to the JSON export and the headers)
+            history: The full conversation history
+            formats: Formats to export
+            incremental: Append to this debate's previous export files; False
+                starts new timestamped files
+
+        Returns:
+            Format -> file path
+        """
+        formats = list(formats)
+        for fmt in formats:
+            if fmt not in EXTENSIONS:
+                raise ValueError(f"Unknown export format: {fmt}")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        for fmt in formats:
+            state = self._files.get(fmt)
+            if incremental and state and state["turns"] <= len(history) and state["path"].exists():
+                continue
+            path = self.export_dir / f"debate_export_{self.debate_id}_{timestamp}.{EXTENSIONS[fmt]}"
+            header = render_header(fmt, metadata).encode("utf-8")
+            with open(path, "wb") as f:
+                f.write(header)
+            self._files[fmt] = {"path": path, "turns": 0, "footer_at": len(header)}
+
+        starts = {fmt: self._files[fmt]["turns"] for fmt in formats}
+        first = min(starts.values(), default=len(history))
+        chunks = render_turns(history[first:], starts, first)
+
+        for fmt in formats:
+            state = self._files[fmt]
+            with open(state["path"], "r+b") as f:
+                f.seek(state["footer_at"])
+                f.truncate()
+                f.write("".join(chunks[fmt]).encode("utf-8"))
+                state["footer_at"] = f.tell()
+                f.write(render_footer(fmt, metadata).encode("utf-8"))
+            state["turns"] = len(history)
+        return {fmt: str(self._files[fmt]["path"]) for fmt in formats}
+
+    def path(self, fmt: str) -> Optional[str]:
+        state = self._files.get(fmt)
+        return str(state["path"]) if state else None
+
+
+def file_entry(path, debate_id: Optional[str] = None, fmt: Optional[str] = None) -> Dict:
+    """Manifest entry for an export file; the debate id and format default to those in its name"""
+    stat = os.stat(path)
+    match = EXPORT_NAME.match(os.path.basename(path))
+    ext = os.path.splitext(path)[1].lstrip(".")
+    return {
+        "path": str(path),
+        "debate_id": debate_id or (match.group("debate_id") if match else None),
+        "format": fmt or FORMAT_BY_EXTENSION.get(ext),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+    }
+
+
+class ExportManifest:
+    """Newest-first listing of an export directory, kept in the debate store"""
+
+    def __init__(self, export_dir, store):
+        self.export_dir = str(Path(export_dir).resolve())
+        self.store = store
+
+    def dir_mtime(self) -> Optional[int]:
+        """The export directory's mtime in nanoseconds (None if it does not exist)"""
+        try:
+            return os.stat(self.export_dir).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def record(self, files: Dict[str, str], debate_id: Optional[str] = None, mtime_before: Optional[int] = None):
+        """Add files just written (format -> path) to the manifest
+
+        Args:
+            mtime_before: ``dir_mtime()`` read before the files were written
+
+        The stored mtime only moves past our own write if the manifest was in
+        sync with the directory before it. Otherwise something else changed
+        the directory first, and the stored mtime is left alone so the next
+        ``refresh`` rescans.
+        """
+        entries = [file_entry(path, debate_id, fmt) for fmt, path in files.items()]
+        stored = self.store.exports_mtime(self.export_dir)
+        in_sync = mtime_before is not None and mtime_before == stored
+        self.store.record_exports(self.export_dir, entries, self.dir_mtime() if in_sync else stored)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rescan the directory if it changed since the manifest last saw it
+
+        Returns:
+            True if the directory was rescanned
+        """
+        mtime = self.dir_mtime()
+        if not force and mtime == self.store.exports_mtime(self.export_dir):
+            return False
+        entries = []
+        if mtime is not None:
+            with os.scandir(self.export_dir) as it:
+                for item in it:
+                    ext = os.path.splitext(item.name)[1].lstrip(".")
+                    if ext in FORMAT_BY_EXTENSION and item.is_file():
+                        entries.append(file_entry(item.path))
+        self.store.record_exports(self.export_dir, entries, mtime, replace=True)
+        return True
+
+    def list(self, limit: int = 10, offset: int = 0) -> List[Dict]:
+        """A page of export files, newest first"""
+        self.refresh()
+        return self.store.list_exports(self.export_dir, limit, offset)
+
+    def count(self) -> int:
+        self.refresh()
+        return self.store.count_exports(self.export_dir)
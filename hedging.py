@@ -0,0 +1,135 @@
+"""Hedged requests across a primary model and its fallbacks.
+
+The primary model is called first. If it has not answered within a
+latency percentile of its recent successful calls, a second request goes to
+the next model in the list; whichever returns a usable reply first wins and
+the other request is cancelled. A request that fails outright starts the
+next model immediately.
+"""
+
+import asyncio
+import math
+import threading
+from collections import defaultdict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+import config_service
+from resilience import metrics
+
+# Defaults used when config.yaml has no ``hedging`` section
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "percentile": 0.95,
+    "min_samples": 20,
+    "window": 200,
+    "default_delay": 6.0,
+    "min_delay": 0.5,
+    "max_delay": 20.0,
+}
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("hedging", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model"""
+
+    def __init__(self, window: int = DEFAULT_SETTINGS["window"]):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float):
+        with self._lock:
+            self._samples[model].append(seconds)
+
+    def percentile(self, model: str, p: float) -> Optional[float]:
+        """Return the p-quantile (0-1) of recent latencies, or None without samples"""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(p * len(samples)) - 1))
+        return samples[index]
+
+    def count(self, model: str) -> int:
+        with self._lock:
+            return len(self._samples.get(model, ()))
+
+
+latency = LatencyTracker(get_settings()["window"])
+
+
+def hedge_delay(model: str, settings: Optional[dict] = None) -> float:
+    """Seconds to wait on ``model`` before firing a hedged request"""
+    settings = settings or get_settings()
+    delay = None
+    if latency.count(model) >= settings["min_samples"]:
+        delay = latency.percentile(model, settings["percentile"])
+    if delay is None:
+        delay = settings["default_delay"]
+    return min(settings["max_delay"], max(settings["min_delay"], delay))
+
+
+async def hedged_call(models: List[str], call: Callable[[str], Awaitable[Optional[str]]]) -> Optional[str]:
+    """Call models in order, hedging on slow answers
+
+    Args:
+        models: Primary model followed by fallbacks
+        call: Coroutine factory taking a model name; returns the reply or
+            None on failure
+
+    Returns:
+        The first usable reply, or None if every model failed
+
+    Replies from losing requests that finished anyway are dropped here; a
+    caller that bills them should record them inside ``call`` (see
+    ``DebateAgent._generate_response``).
+    """
+    settings = get_settings()
+    if not settings["enabled"] or len(models) < 2:
+        return await call(models[0]) if models else None
+
+    pending: Dict[asyncio.Task, str] = {}
+    remaining = list(models)
+
+    def launch():
+        model = remaining.pop(0)
+        pending[asyncio.ensure_future(call(model))] = model
+        return model
+
+    current = launch()
+    try:
+        while pending:
+            timeout = hedge_delay(current, settings) if remaining else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                # The newest request is slower than usual: hedge with the next model
+                metrics.increment("hedges_fired", current)
+                current = launch()
+                continue
+
+            for task in done:
+                model = pending.pop(task)
+                result = None if task.cancelled() or task.exception() else task.result()
+                if result:
+                    if model != models[0]:
+                        metrics.increment("hedge_wins", model)
+                    return result
+                metrics.increment("hedge_failures", model)
+
+            if not pending and remaining:
+                # Everything in flight failed; fail over without waiting
+                current = launch()
+        return None
+    finally:
+        for task, model in pending.items():
+            task.cancel()
+            metrics.increment("hedges_cancelled", model)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,193 @@
+"""Pool of OpenRouter API keys with rotation and health tracking.
+
+Keys come from ``OPENROUTER_API_KEYS`` (comma or whitespace separated), a
+secrets file named by ``OPENROUTER_API_KEYS_FILE`` (one key per line, ``#``
+comments allowed) and the single ``OPENROUTER_API_KEY``. Each request
+attempt takes a key using round-robin or least-loaded selection; keys that
+answer 401/403 or 429 are quarantined for a while so traffic moves to the
+healthy ones, and per-key usage counters are kept for monitoring.
+"""
+
+import itertools
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import config_service
+from rate_limiter import key_label
+from resilience import parse_retry_after
+
+# Defaults used when config.yaml has no ``api_keys`` section
+DEFAULT_SETTINGS = {
+    "strategy": "least_loaded",     # or "round_robin"
+    "quarantine_rate_limited": 10.0,
+    "quarantine_unauthorized": 3600.0,
+}
+
+
+class NoHealthyKeyError(Exception):
+    """Raised when every key in the pool is quarantined (or the pool is empty)"""
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("api_keys", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def load_keys() -> List[str]:
+    """Collect API keys from the environment and the optional secrets file"""
+    config_service.load_env()
+    keys = []
+    keys.extend(os.getenv("OPENROUTER_API_KEYS", "").replace(",", " ").split())
+
+    keys_file = os.getenv("OPENROUTER_API_KEYS_FILE")
+    if keys_file:
+        try:
+            with open(keys_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        keys.append(line)
+        except OSError as e:
+            print(f"Could not read API keys file {keys_file}: {e}")
+
+    single_key = os.getenv("OPENROUTER_API_KEY")
+    if single_key:
+        keys.append(single_key.strip())
+
+    # Drop duplicates but keep order
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+class KeyState:
+    """Usage counters and health of a single key"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.label = key_label(key)
+        self.in_flight = 0
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.unauthorized = 0
+        self.quarantined_until = 0.0
+        self.last_used = 0.0
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "label": self.label,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "unauthorized": self.unauthorized,
+            "quarantined_for": max(0.0, round(self.quarantined_until - now, 1)),
+        }
+
+
+class KeyPool:
+    """Thread-safe rotation over a set of API keys"""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self._states: Dict[str, KeyState] = {}
+        self._order: List[str] = []
+        self._cursor = itertools.count()
+        self._lock = threading.Lock()
+        self.add_keys(keys)
+
+    def add_keys(self, keys: Iterable[str]):
+        """Add keys that are not in the pool yet"""
+        with self._lock:
+            for key in keys:
+                key = key.strip()
+                if key and key not in self._states:
+                    self._states[key] = KeyState(key)
+                    self._order.append(key)
+
+    def __len__(self):
+        return len(self._order)
+
+    def has_keys(self) -> bool:
+        return bool(self._order)
+
+    def has_healthy_keys(self) -> bool:
+        """True if at least one key is not quarantined"""
+        now = time.monotonic()
+        with self._lock:
+            return any(self._states[k].quarantined_until <= now for k in self._order)
+
+    def acquire(self) -> str:
+        """Pick a healthy key and mark it in flight
+
+        Raises:
+            NoHealthyKeyError: If the pool is empty or every key is quarantined
+        """
+        strategy = get_settings()["strategy"]
+        now = time.monotonic()
+        with self._lock:
+            healthy = [self._states[k] for k in self._order if self._states[k].quarantined_until <= now]
+            if not healthy:
+                raise NoHealthyKeyError(
+                    "No API keys configured" if not self._order else "All API keys are quarantined"
+                )
+            if strategy == "round_robin":
+                state = healthy[next(self._cursor) % len(healthy)]
+            else:
+                # Least loaded: fewest requests in flight, then least recently used
+                state = min(healthy, key=lambda s: (s.in_flight, s.last_used))
+            state.in_flight += 1
+            state.requests += 1
+            state.last_used = now
+            return state.key
+
+    def release(self, key: str, status_code: Optional[int] = None, retry_after: Optional[str] = None):
+        """Return a key to the pool and record the outcome of its request
+
+        Args:
+            key: The key returned by acquire()
+            status_code: HTTP status of the response, or None on a transport error
+            retry_after: Raw Retry-After header, used to size 429 quarantines
+        """
+        settings = get_settings()
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                return
+            state.in_flight = max(0, state.in_flight - 1)
+            if status_code is not None and status_code < 400:
+                state.successes += 1
+                return
+            state.failures += 1
+            if status_code in (401, 403):
+                state.unauthorized += 1
+                state.quarantined_until = now + settings["quarantine_unauthorized"]
+                print(f"API key {state.label} rejected ({status_code}); quarantined")
+            elif status_code == 429:
+                state.rate_limited += 1
+                delay = parse_retry_after(retry_after)
+                state.quarantined_until = now + (delay if delay is not None else settings["quarantine_rate_limited"])
+
+    def stats(self) -> List[dict]:
+        """Per-key usage counters and remaining quarantine time (keys are shown by label only)"""
+        now = time.monotonic()
+        with self._lock:
+            return [self._states[k].as_dict(now) for k in self._order]
+
+
+_shared_pool: Optional[KeyPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_pool() -> KeyPool:
+    """Return the process-wide key pool, loading keys from the environment on first use"""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            _shared_pool = KeyPool(load_keys())
+        return _shared_pool
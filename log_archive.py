@@ -0,0 +1,336 @@
+"""Compressed archival and retention for debate logs.
+
+Closed log files (not modified for ``min_age_hours``) are compressed into
+dated archive folders, ``logs/archive/YYYY-MM-DD/<name>.gz`` (or ``.zst``),
+dated by the file's last modification. The archive is then held to an age
+budget (``max_age_days``) and a size budget (``max_total_mb``), removing
+the oldest archives first.
+
+Archived files:
+
+- ``logs/debate_log_<id>.log``: debate log files
+- ``logs/debate_history_<id>.json`` and ``debate_metadata_<id>.json``
+  left by versions before the debate store
+- ``debate_session_*.log`` and ``debate_logs_*.log`` session logs written
+  by ``app.py`` to the working directory
+
+Logs still being written by this process are never archived, however long
+they have been idle: files registered with ``hold(path)`` (a
+``DebateLogger``'s log while it is open, ``app.py``'s session log) and
+files open in a ``logging.FileHandler`` attached to a logger registered
+with ``logging.getLogger``.
+
+``start()`` runs the retention pass on a background thread every
+``interval_minutes``, so the Streamlit scripts never scan or compress on a
+rerun. ``open_log(path)`` opens a log whether it is still in place or has
+been archived, so readers do not need to know which.
+
+zstd compression needs the optional ``zstandard`` package; without it
+gzip is used.
+"""
+
+import gzip
+import importlib.util
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config_service
+
+# Defaults used when config.yaml has no ``retention`` section
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "log_dir": "logs",
+    "session_dir": ".",             # where app.py writes its session logs
+    "archive_dir": "archive",       # inside log_dir
+    "compression": "gzip",          # gzip or zstd (requires zstandard)
+    "min_age_hours": 24,            # files untouched this long count as closed
+    "max_age_days": 90,             # archives older than this are removed
+    "max_total_mb": 500,            # archive size budget; oldest removed first
+    "interval_minutes": 60,         # time between background retention passes
+}
+
+# File name patterns archived from the log directory and the session directory
+LOG_PATTERNS = ("debate_log_*.log", "debate_history_*.json", "debate_metadata_*.json")
+SESSION_PATTERNS = ("debate_session_*.log", "debate_logs_*.log")
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("retention", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def zstd_available() -> bool:
+    """Return True if the optional ``zstandard`` package is installed"""
+    return importlib.util.find_spec("zstandard") is not None
+
+
+def _open_compressed(path: Path, mode: str, encoding: Optional[str] = None, compression: Optional[str] = None):
+    """Open a gzip or zstd file (by default going by its extension); ``mode`` is as for ``gzip.open``"""
+    if compression == "zstd" or (compression is None and path.suffix == ".zst"):
+        import zstandard
+        return zstandard.open(path, mode, encoding=encoding)
+    return gzip.open(path, mode, encoding=encoding)
+
+
+# Path -> number of holders (two loggers may write the same debate's log)
+_held: Dict[Path, int] = {}
+_held_lock = threading.Lock()
+
+
+def hold(path):
+    """Keep a log this process is still writing out of the archive until ``release``"""
+    path = Path(path).resolve()
+    with _held_lock:
+        _held[path] = _held.get(path, 0) + 1
+
+
+def release(path):
+    path = Path(path).resolve()
+    with _held_lock:
+        if _held.get(path, 0) > 1:
+            _held[path] -= 1
+        else:
+            _held.pop(path, None)
+
+
+def _handler_files(handler) -> List[str]:
+    if isinstance(handler, logging.FileHandler):
+        return [handler.baseFilename] if handler.stream is not None else []
+    # log_writer.WriterHandler wraps the handlers that do the writing
+    return [name for inner in getattr(handler, "handlers", ()) for name in _handler_files(inner)]
+
+
+def active_files() -> set:
+    """Resolved paths of held logs and of logs open in a registered logger's file handler"""
+    loggers = [logging.getLogger()] + [
+        logger for logger in list(logging.Logger.manager.loggerDict.values()) if isinstance(logger, logging.Logger)
+    ]
+    with _held_lock:
+        active = set(_held)
+    for logger in loggers:
+        for handler in list(logger.handlers):
+            active.update(Path(name).resolve() for name in _handler_files(handler))
+    return active
+
+
+class LogArchiver:
+    """Compress closed logs into dated folders and apply the retention budgets"""
+
+    def __init__(self, log_dir="logs", session_dir=".", archive_dir=None,
+                 compression: str = DEFAULT_SETTINGS["compression"],
+                 min_age_hours: float = DEFAULT_SETTINGS["min_age_hours"],
+                 max_age_days: float = DEFAULT_SETTINGS["max_age_days"],
+                 max_total_mb: float = DEFAULT_SETTINGS["max_total_mb"]):
+        """
+        Args:
+            log_dir: Directory with the debate logs
+            session_dir: Directory with app.py's session logs (None to skip)
+            archive_dir: Where archives go (defaults to ``log_dir/archive``)
+            compression: gzip or zstd
+        """
+        if compression not in EXTENSIONS:
+            raise config_service.ConfigError(f"Unknown log compression: {compression}")
+        if compression == "zstd" and not zstd_available():
+            print("Log compression 'zstd' needs the zstandard package, using gzip")
+            compression = "gzip"
+        self.log_dir = Path(log_dir)
+        self.session_dir = Path(session_dir) if session_dir is not None else None
+        self.archive_dir = Path(archive_dir) if archive_dir else self.log_dir / DEFAULT_SETTINGS["archive_dir"]
+        self.compression = compression
+        self.min_age = min_age_hours * 3600
+        self.max_age = max_age_days * 86400
+        self.max_bytes = max_total_mb * 1024 * 1024
+
+    def candidates(self, now: float) -> List[Path]:
+        """Closed log files waiting to be archived"""
+        sources = [(self.log_dir, LOG_PATTERNS)]
+        if self.session_dir is not None:
+            sources.append((self.session_dir, SESSION_PATTERNS))
+        # latest_debate.log points at the newest debate log; leave that one in place
+        latest = self.log_dir / "latest_debate.log"
+        keep = active_files()
+        if latest.is_symlink():
+            keep.add(latest.resolve())
+        found = []
+        for directory, patterns in sources:
+            for pattern in patterns:
+                for path in directory.glob(pattern):
+                    try:
+                        if path.is_symlink() or not path.is_file() or path.resolve() in keep:
+                            continue
+                        if now - path.stat().st_mtime >= self.min_age:
+                            found.append(path)
+                    except OSError:
+                        continue
+        return found
+
+    def archive_path(self, path: Path, mtime: float) -> Path:
+        day = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d")
+        return self.archive_dir / day / (path.name + EXTENSIONS[self.compression])
+
+    def compress(self, path: Path) -> Path:
+        """Compress one file into the archive and remove the original
+
+        The archive keeps the original's mtime, which the age budget uses.
+        """
+        mtime = path.stat().st_mtime
+        target = self.archive_path(path, mtime)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        with open(path, "rb") as src, _open_compressed(tmp, "wb", compression=self.compression) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp, target)
+        os.utime(target, (mtime, mtime))
+        path.unlink()
+        return target
+
+    def archives(self) -> List[Path]:
+        """Every archived file, oldest first"""
+        if not self.archive_dir.exists():
+            return []
+        files = [path for path in self.archive_dir.glob("*/*") if path.suffix in EXTENSIONS.values()]
+        return sorted(files, key=lambda p: p.stat().st_mtime)
+
+    def enforce_budgets(self, now: float) -> int:
+        """Remove archives past the age budget, then the oldest until under the size budget
+
+        Returns:
+            Number of archives removed
+        """
+        archives = [(path, path.stat()) for path in self.archives()]
+        total = sum(stat.st_size for _, stat in archives)
+        removed = 0
+        for path, stat in archives:
+            if now - stat.st_mtime <= self.max_age and total <= self.max_bytes:
+                break
+            path.unlink()
+            total -= stat.st_size
+            removed += 1
+            # Drop the day's folder once it is empty
+            try:
+                path.parent.rmdir()
+            except OSError:
+                pass
+        return removed
+
+    def run(self, now: Optional[float] = None) -> Dict:
+        """One retention pass: archive closed logs, then apply the budgets"""
+        now = time.time() if now is None else now
+        archived = 0
+        for path in self.candidates(now):
+            try:
+                self.compress(path)
+                archived += 1
+            except OSError as e:
+                print(f"Could not archive {path}: {e}")
+        removed = self.enforce_budgets(now)
+        return {"archived": archived, "removed": removed}
+
+    def find(self, name: str) -> Optional[Path]:
+        """The archived copy of a log file, newest first if archived more than once"""
+        if not self.archive_dir.exists():
+            return None
+        for day in sorted(self.archive_dir.iterdir(), reverse=True):
+            for ext in EXTENSIONS.values():
+                path = day / (name + ext)
+                if path.exists():
+                    return path
+        return None
+
+
+def get_archiver(settings: Optional[dict] = None) -> LogArchiver:
+    """Archiver built from the ``retention`` settings"""
+    settings = dict(DEFAULT_SETTINGS, **(settings if settings is not None else get_settings()))
+    return LogArchiver(
+        log_dir=settings["log_dir"],
+        session_dir=settings["session_dir"],
+        archive_dir=Path(settings["log_dir"]) / settings["archive_dir"],
+        compression=settings["compression"],
+        min_age_hours=settings["min_age_hours"],
+        max_age_days=settings["max_age_days"],
+        max_total_mb=settings["max_total_mb"]
+    )
+
+
+def open_log(path, mode: str = "rt", encoding: Optional[str] = "utf-8", archive_dir=None):
+    """Open a log file for reading, from the archive if it has been compressed
+
+    Args:
+        path: The log's original path
+        mode: "rt" or "rb"
+        archive_dir: Archive to look in (defaults to ``archive`` next to the file)
+
+    Raises:
+        FileNotFoundError: If the file is neither in place nor archived
+    """
+    path = Path(path)
+    if path.exists():
+        return open(path, mode, encoding=encoding if "t" in mode else None)
+    archive_dir = Path(archive_dir) if archive_dir else path.parent / DEFAULT_SETTINGS["archive_dir"]
+    archived = LogArchiver(path.parent, None, archive_dir).find(path.name)
+    if archived is None:
+        raise FileNotFoundError(path)
+    return _open_compressed(archived, mode, encoding if "t" in mode else None)
+
+
+def log_exists(path, archive_dir=None) -> bool:
+    """True if a log file is in place or archived"""
+    path = Path(path)
+    if path.exists():
+        return True
+    archive_dir = Path(archive_dir) if archive_dir else path.parent / DEFAULT_SETTINGS["archive_dir"]
+    return LogArchiver(path.parent, None, archive_dir).find(path.name) is not None
+
+
+# --- Background retention -----------------------------------------------------
+
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+_lock = threading.Lock()
+
+
+def _loop(archiver: LogArchiver, interval: float):
+    while not _stop.is_set():
+        try:
+            archiver.run()
+        except Exception as e:
+            # A failed pass is retried on the next interval
+            print(f"Log retention failed: {e}")
+        _stop.wait(interval)
+
+
+def start(settings: Optional[dict] = None) -> bool:
+    """Run retention passes on a background thread (once per process)
+
+    Returns:
+        False if retention is disabled
+    """
+    global _thread
+    settings = dict(DEFAULT_SETTINGS, **(settings if settings is not None else get_settings()))
+    if not settings["enabled"]:
+        return False
+    with _lock:
+        if _thread is None or not _thread.is_alive():
+            _stop.clear()
+            _thread = threading.Thread(
+                target=_loop, args=(get_archiver(settings), settings["interval_minutes"] * 60),
+                name="debate-log-retention", daemon=True
+            )
+            _thread.start()
+    return True
+
+
+def stop(timeout: Optional[float] = 5.0):
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
@@ -0,0 +1,248 @@
+"""Background writer for debate log records.
+
+``WriterHandler`` is the only handler attached to a debate's logger: it
+puts each record on a bounded queue and returns, so the thread running the
+event loop or Streamlit script never formats or writes. One writer thread
+per process drains the queue in batches, formats records with the real
+handlers (``BatchFileHandler``, ``BatchStreamHandler``) and flushes them
+once per batch, when ``batch_size`` records are waiting or
+``flush_interval`` seconds have passed. ``flush()`` waits until everything
+queued so far is on disk, ``call()`` runs a function (e.g. closing a
+handler) after everything queued so far, and the queue is drained at
+interpreter exit.
+
+When the queue is full, records are dropped rather than blocking the
+caller, and counted in ``LogWriter.dropped`` and ``WriterHandler.dropped``.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+import config_service
+
+# Defaults used when config.yaml has no ``log_writer`` section
+DEFAULT_SETTINGS = {
+    "queue_size": 10000,        # records waiting to be written before new ones are dropped
+    "batch_size": 256,          # records written per flush
+    "flush_interval": 0.5,      # seconds a record may wait before its batch is flushed
+    "max_open_loggers": 32,     # debate loggers with open files; the least recently used are closed
+}
+
+_STOP = object()
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("log_writer", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+class BatchFileHandler(logging.FileHandler):
+    """FileHandler that leaves flushing to the writer, once per batch"""
+
+    def emit(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class BatchStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the writer, once per batch"""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class LogWriter:
+    """Bounded queue of log records drained by one background thread"""
+
+    def __init__(self, queue_size: int = DEFAULT_SETTINGS["queue_size"],
+                 batch_size: int = DEFAULT_SETTINGS["batch_size"],
+                 flush_interval: float = DEFAULT_SETTINGS["flush_interval"]):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="debate-log-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, handlers, record: logging.LogRecord) -> bool:
+        """Queue a record for ``handlers`` without blocking
+
+        Returns:
+            False if the queue was full and the record was dropped
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((handlers, record))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wait until every record queued before this call has been written
+
+        Returns:
+            False if the writer did not catch up within ``timeout`` seconds
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def call(self, fn, timeout: Optional[float] = 5.0):
+        """Run ``fn`` on the writer thread once everything queued before it is written
+
+        Runs ``fn`` right away if the writer is not running or stays full
+        for ``timeout`` seconds.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            try:
+                self._queue.put(fn, timeout=timeout)
+                return
+            except queue.Full:
+                pass
+        fn()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Write everything still queued and stop the thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def _write(self, batch: List):
+        touched = {}
+        for handlers, record in batch:
+            for handler in handlers:
+                try:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+                        touched[id(handler)] = handler
+                except Exception:
+                    # The writer thread must outlive a bad record or handler
+                    pass
+        for handler in touched.values():
+            try:
+                handler.flush()
+            except Exception:
+                pass
+        self.written += len(batch)
+        self.batches += 1
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, tuple):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+
+            # Batch full, interval elapsed, flush or call requested, or stopping
+            if batch:
+                self._write(batch)
+                batch = []
+            deadline = None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                return
+            elif callable(item):
+                try:
+                    item()
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+
+class WriterHandler(logging.Handler):
+    """Hands records to the shared writer; the real handlers run on its thread"""
+
+    def __init__(self, handlers, writer: Optional[LogWriter] = None):
+        super().__init__()
+        self.handlers = tuple(handlers)
+        self.writer = writer or get_writer()
+        self.dropped = 0
+
+    def emit(self, record):
+        if not self.writer.submit(self.handlers, record):
+            self.dropped += 1
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        """Write pending records, then close the real handlers"""
+        self.writer.flush()
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+_writer: Optional[LogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> LogWriter:
+    """The process-wide writer, created from the ``log_writer`` settings"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                settings = get_settings()
+                _writer = LogWriter(settings["queue_size"], settings["batch_size"], settings["flush_interval"])
+    return _writer
+
+
+def _shutdown():
+    if _writer is not None:
+        _writer.close()
+
+
+atexit.register(_shutdown)
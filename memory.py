@@ -0,0 +1,358 @@
+"""Conversation memory for debate prompts.
+
+Both modes keep the context handed to an agent the same size however long
+the debate runs (``memory.mode`` in config.yaml).
+
+``rolling`` (``RollingMemory``): the most recent turns are kept verbatim up
+to ``recent_token_budget``; older turns are folded into a running summary
+capped at ``summary_token_budget``. The summary keeps one line per earlier
+argument, which is what lets agents avoid repeating themselves. Two
+summarizers are available (``memory.summarizer``):
+
+- ``extractive`` (default): the first sentence of each folded turn's
+  dialogue, with the oldest points dropped once the summary is over budget.
+  Runs inline and costs nothing.
+- ``llm``: a model rewrites the summary with the folded turns. Folding runs
+  as a background task so it overlaps the next turn's request; until it
+  finishes, the folded turns appear as extractive points.
+
+``retrieval`` (``RetrievalMemory``): every turn is indexed as a TF-IDF
+vector of hashed word n-grams (NumPy only), and each prompt gets the last
+few turns plus the ``top_k`` earlier turns most similar to the opponent's
+latest message. The index grows by one row per turn and is never rebuilt.
+"""
+
+import asyncio
+import re
+import zlib
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+import config_service
+
+# Defaults used when config.yaml has no ``memory`` section
+DEFAULT_SETTINGS = {
+    "recent_token_budget": 600,     # verbatim turns kept in the prompt
+    "summary_token_budget": 300,    # running summary of older turns
+    "min_recent_turns": 1,          # always keep at least this many turns verbatim
+    "summarizer": "extractive",     # extractive or llm
+    "mode": "rolling",              # rolling or retrieval
+    # Retrieval mode
+    "top_k": 4,                     # earlier turns retrieved per prompt
+    "recent_turns": 2,              # latest turns always included verbatim
+    "hash_dims": 4096,              # size of the hashed n-gram feature space
+}
+
+SUMMARY_HEADER = "Points already made (do not repeat them):"
+
+SUMMARY_PROMPT = """
+Update the running summary of a debate. Keep one short bullet per distinct
+argument, prefixed with the speaker's name, merge repeated arguments, and
+stay under {words} words.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Reply with the updated bullet list only.
+"""
+
+# async (prompt) -> text, e.g. a bound agent API call
+Completion = Callable[[str], Awaitable[str]]
+# async (summary, turns, token_budget) -> new summary
+Summarizer = Callable[[str, List[Dict], int], Awaitable[str]]
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("memory", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token, as in the rate limiter)"""
+    return len(text) // 4 + 1
+
+
+def format_turn(turn: Dict) -> str:
+    return f"{turn['agent']}: {turn['message']}"
+
+
+def key_point(message: str, max_words: int = 30) -> str:
+    """First sentence of a reply's dialogue, without *stage directions*"""
+    text = re.sub(r"\*[^*]*\*", " ", message)
+    text = " ".join(text.replace('"', " ").split())
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    words = sentence.split()
+    if len(words) > max_words:
+        sentence = " ".join(words[:max_words]) + "..."
+    return sentence
+
+
+def _bullets(summary: str) -> List[str]:
+    return [line for line in summary.splitlines() if line.startswith("- ")]
+
+
+def fit_summary(bullets: List[str], token_budget: int) -> str:
+    """Join bullets under the summary header, dropping the oldest until it fits"""
+    bullets = list(bullets)
+    while bullets and count_tokens("\n".join([SUMMARY_HEADER] + bullets)) > token_budget:
+        bullets.pop(0)
+    return "\n".join([SUMMARY_HEADER] + bullets) if bullets else ""
+
+
+def extractive_summary(summary: str, turns: List[Dict], token_budget: int) -> str:
+    """Fold turns into the summary as one key point each"""
+    bullets = _bullets(summary) + [f"- {turn['agent']}: {key_point(turn['message'])}" for turn in turns]
+    return fit_summary(bullets, token_budget)
+
+
+def make_llm_summarizer(complete: Completion) -> Summarizer:
+    """Summarizer that asks a model to rewrite the summary
+
+    Args:
+        complete: Async function sending a prompt and returning the reply text
+    """
+    async def summarize(summary: str, turns: List[Dict], token_budget: int) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            words=token_budget * 3 // 4,
+            summary="\n".join(_bullets(summary)) or "(empty)",
+            turns="\n".join(format_turn(turn) for turn in turns)
+        )
+        reply = await complete(prompt)
+        bullets = [f"- {line.lstrip('-*• ').strip()}" for line in reply.splitlines() if line.strip()]
+        return fit_summary(bullets, token_budget)
+
+    return summarize
+
+
+class RollingMemory:
+    """Recent turns verbatim plus a bounded summary of everything before them"""
+
+    def __init__(self, recent_token_budget: Optional[int] = None, summary_token_budget: Optional[int] = None,
+                 summarizer: Optional[Summarizer] = None, min_recent_turns: Optional[int] = None):
+        """
+        Args:
+            recent_token_budget: Token budget for verbatim turns (default from config)
+            summary_token_budget: Token budget for the summary (default from config)
+            summarizer: Async summarizer run in the background; None folds inline
+                with ``extractive_summary``
+            min_recent_turns: Turns always kept verbatim, even over budget
+        """
+        settings = get_settings()
+        self.recent_token_budget = recent_token_budget or settings["recent_token_budget"]
+        self.summary_token_budget = summary_token_budget or settings["summary_token_budget"]
+        self.min_recent_turns = settings["min_recent_turns"] if min_recent_turns is None else min_recent_turns
+        self.summarizer = summarizer
+        self.summary = ""
+        self.folded_turns = 0
+        self._recent = deque()          # (turn, tokens)
+        self._recent_tokens = 0
+        self._pending: List[Dict] = []  # evicted turns not yet in the summary
+        self._fold_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self.folded_turns + len(self._pending) + len(self._recent)
+
+    def add(self, agent: str, message: str):
+        """Record a turn, evicting the oldest verbatim turns once over budget"""
+        turn = {"agent": agent, "message": message}
+        tokens = count_tokens(format_turn(turn))
+        self._recent.append((turn, tokens))
+        self._recent_tokens += tokens
+        while len(self._recent) > max(1, self.min_recent_turns) and self._recent_tokens > self.recent_token_budget:
+            evicted, evicted_tokens = self._recent.popleft()
+            self._recent_tokens -= evicted_tokens
+            self._pending.append(evicted)
+        if self._pending:
+            self._schedule_fold()
+
+    def _schedule_fold(self):
+        if self.summarizer is None:
+            self._fold_inline()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._fold_inline()
+            return
+        if self._fold_task is None or self._fold_task.done():
+            self._fold_task = loop.create_task(self._fold_in_background())
+
+    def _fold_inline(self):
+        self.summary = extractive_summary(self.summary, self._pending, self.summary_token_budget)
+        self.folded_turns += len(self._pending)
+        self._pending = []
+
+    async def _fold_in_background(self):
+        # Turns evicted while a fold is running are picked up by the next pass
+        while self._pending:
+            batch = list(self._pending)
+            try:
+                summary = await self.summarizer(self.summary, batch, self.summary_token_budget)
+            except Exception as e:
+                print(f"Memory summarizer failed, using extractive summary: {e}")
+                summary = extractive_summary(self.summary, batch, self.summary_token_budget)
+            self.summary = summary
+            self.folded_turns += len(batch)
+            del self._pending[:len(batch)]
+
+    async def flush(self):
+        """Wait for a background fold to finish"""
+        if self._fold_task is not None:
+            await self._fold_task
+
+    def render(self, query: str = "") -> str:
+        """Summary and recent turns, formatted for the prompt (``query`` is unused)"""
+        summary = self.summary
+        if self._pending:
+            summary = extractive_summary(summary, self._pending, self.summary_token_budget)
+        recent = "\n\n".join(format_turn(turn) for turn, _ in self._recent)
+        return f"{summary}\n\n{recent}".strip()
+
+    def stats(self) -> Dict:
+        return {
+            "turns": len(self),
+            "recent_turns": len(self._recent),
+            "recent_tokens": self._recent_tokens,
+            "folded_turns": self.folded_turns,
+            "pending_turns": len(self._pending),
+            "summary_tokens": count_tokens(self.summary) if self.summary else 0,
+        }
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def hashed_ngrams(text: str, dims: int) -> np.ndarray:
+    """Sublinear term frequencies of hashed word unigrams and bigrams"""
+    words = _WORD_RE.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts = np.zeros(dims, dtype=np.float32)
+    if grams:
+        buckets = np.fromiter((zlib.crc32(g.encode("utf-8")) % dims for g in grams), dtype=np.int64, count=len(grams))
+        np.add.at(counts, buckets, 1.0)
+        nonzero = counts > 0
+        counts[nonzero] = 1.0 + np.log(counts[nonzero])
+    return counts
+
+
+class TurnIndex:
+    """Incremental TF-IDF index over hashed n-grams
+
+    Rows hold raw term weights and document frequencies are kept as a
+    running count, so adding a turn touches one row; IDF weighting is
+    applied at query time.
+    """
+
+    def __init__(self, dims: int = DEFAULT_SETTINGS["hash_dims"], capacity: int = 64):
+        self.dims = dims
+        self._rows = np.zeros((capacity, dims), dtype=np.float32)
+        self._doc_freq = np.zeros(dims, dtype=np.float32)
+        self.size = 0
+
+    def add(self, text: str) -> int:
+        """Index a turn and return its row number"""
+        if self.size == len(self._rows):
+            grown = np.zeros((len(self._rows) * 2, self.dims), dtype=np.float32)
+            grown[:self.size] = self._rows
+            self._rows = grown
+        vector = hashed_ngrams(text, self.dims)
+        self._rows[self.size] = vector
+        self._doc_freq += vector > 0
+        self.size += 1
+        return self.size - 1
+
+    def search(self, query: str, k: int, limit: Optional[int] = None) -> List[int]:
+        """Rows most similar to ``query`` (cosine over TF-IDF), best first
+
+        Args:
+            query: Text to match
+            k: Number of rows to return
+            limit: Only consider rows before this one
+        """
+        n = self.size if limit is None else min(limit, self.size)
+        if n == 0 or k <= 0:
+            return []
+        idf = np.log((1.0 + self.size) / (1.0 + self._doc_freq)) + 1.0
+        weights = idf * idf
+        query_vector = hashed_ngrams(query, self.dims)
+        rows = self._rows[:n]
+        dots = rows @ (query_vector * weights)
+        norms = np.sqrt((rows * rows) @ weights) * np.sqrt(float((query_vector * query_vector) @ weights))
+        scores = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(-scores[top], kind="stable")] if scores[i] > 0]
+
+
+class RetrievalMemory:
+    """The latest turns plus the earlier turns most relevant to the current message"""
+
+    def __init__(self, top_k: Optional[int] = None, recent_turns: Optional[int] = None,
+                 hash_dims: Optional[int] = None):
+        """
+        Args:
+            top_k: Earlier turns retrieved per prompt (default from config)
+            recent_turns: Latest turns always included verbatim (default from config)
+            hash_dims: Size of the hashed feature space (default from config)
+        """
+        settings = get_settings()
+        self.top_k = settings["top_k"] if top_k is None else top_k
+        self.recent_turns = settings["recent_turns"] if recent_turns is None else recent_turns
+        self.index = TurnIndex(hash_dims or settings["hash_dims"])
+        self.turns: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def add(self, agent: str, message: str):
+        self.turns.append({"agent": agent, "message": message})
+        self.index.add(message)
+
+    async def flush(self):
+        pass
+
+    def render(self, query: str = "") -> str:
+        """Relevant earlier turns (in debate order) and the latest turns"""
+        recent_start = max(0, len(self.turns) - self.recent_turns)
+        relevant = sorted(self.index.search(query, self.top_k, limit=recent_start)) if query else []
+        parts = []
+        if relevant:
+            parts.append("Relevant earlier turns:\n" + "\n".join(
+                f"- (turn {i + 1}) {format_turn(self.turns[i])}" for i in relevant))
+        recent = "\n\n".join(format_turn(turn) for turn in self.turns[recent_start:])
+        if recent:
+            parts.append(recent)
+        return "\n\n".join(parts)
+
+    def stats(self) -> Dict:
+        return {
+            "turns": len(self.turns),
+            "index_rows": self.index.size,
+            "index_bytes": self.index._rows.nbytes,
+        }
+
+
+def create_memory(mode: Optional[str] = None, summarizer: Optional[Summarizer] = None):
+    """Memory for one debate in the configured mode
+
+    Args:
+        mode: ``rolling`` or ``retrieval`` (default: ``memory.mode`` from config)
+        summarizer: Background summarizer for rolling memory (see ``make_llm_summarizer``)
+
+    Raises:
+        config_service.ConfigError: If the mode is unknown
+    """
+    mode = mode or get_settings()["mode"]
+    if mode == "rolling":
+        return RollingMemory(summarizer=summarizer)
+    if mode == "retrieval":
+        return RetrievalMemory()
+    raise config_service.ConfigError(f"Unknown memory mode: {mode}")
@@ -0,0 +1,343 @@
+"""Local OpenRouter-compatible mock server for load tests and benchmarks.
+
+Serves ``POST /api/v1/chat/completions`` (and ``/v1/chat/completions`` for
+the OpenAI client in educational_debate.py), as plain JSON or as an SSE
+stream, with persona-flavoured canned replies built from the same lines as
+``DebateAgent.generate_placeholder_response``. Latency profiles control the
+time to first token and the token rate, and a share of requests can be
+answered with 429 (with ``Retry-After``) or 5xx errors. Every successful
+reply reports ``usage``. ``GET /stats`` returns request counters.
+
+Point the debate code at it with the base-URL variables:
+
+    python mock_server.py --profile realistic --port 8000
+    OPENROUTER_BASE_URL=http://127.0.0.1:8000/api/v1 OPENROUTER_API_KEY=mock python batch_runner.py
+
+Benchmarks and tests can run it in-process with ``MockServer``.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from debate_system import PLACEHOLDER_LINES
+
+# Time to first token and token rate of each profile; the error rates are
+# the share of requests answered with 429 or 5xx
+PROFILES = {
+    "instant": {
+        "latency": {"distribution": "fixed", "value": 0.0},
+        "tokens_per_second": 0,     # 0 = the whole reply at once
+        "rate_limit_rate": 0.0,
+        "server_error_rate": 0.0,
+    },
+    "fast": {
+        "latency": {"distribution": "lognormal", "median": 0.15, "sigma": 0.3},
+        "tokens_per_second": 200,
+        "rate_limit_rate": 0.0,
+        "server_error_rate": 0.0,
+    },
+    "realistic": {
+        "latency": {"distribution": "lognormal", "median": 0.8, "sigma": 0.5},
+        "tokens_per_second": 60,
+        "rate_limit_rate": 0.0,
+        "server_error_rate": 0.0,
+    },
+    "slow": {
+        "latency": {"distribution": "lognormal", "median": 3.0, "sigma": 0.6},
+        "tokens_per_second": 20,
+        "rate_limit_rate": 0.0,
+        "server_error_rate": 0.0,
+    },
+    "flaky": {
+        "latency": {"distribution": "lognormal", "median": 0.8, "sigma": 0.8},
+        "tokens_per_second": 60,
+        "rate_limit_rate": 0.1,
+        "server_error_rate": 0.05,
+    },
+}
+
+DEFAULT_SETTINGS = dict(PROFILES["realistic"], retry_after=1.0, seed=None)
+
+PERSONA_PATTERN = re.compile(r"You(?:'re| are) (OpenAI|DeepSeek)")
+
+
+def get_settings(profile: str = "realistic", **overrides) -> Dict:
+    """Settings for a named profile with individual values overridden (None values are ignored)"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}' (choose from {', '.join(PROFILES)})")
+    settings = dict(DEFAULT_SETTINGS, **PROFILES[profile])
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def sample_latency(spec: Dict, rng: random.Random) -> float:
+    """Draw a time to first token (seconds) from a latency spec"""
+    distribution = spec.get("distribution", "fixed")
+    if distribution == "fixed":
+        value = spec.get("value", 0.0)
+    elif distribution == "uniform":
+        value = rng.uniform(spec["min"], spec["max"])
+    elif distribution == "normal":
+        value = rng.gauss(spec["mean"], spec["stddev"])
+    elif distribution == "lognormal":
+        value = spec["median"] * rng.lognormvariate(0.0, spec["sigma"])
+    else:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    return max(0.0, value)
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count at ~4 characters per token"""
+    return max(1, len(text) // 4)
+
+
+def persona_reply(messages, model: str, rng: random.Random) -> str:
+    """Canned reply in the voice of the agent named in the prompt"""
+    text = "\n".join(str(m.get("content", "")) for m in messages)
+    match = PERSONA_PATTERN.search(text)
+    if match:
+        persona = match.group(1)
+    else:
+        persona = "DeepSeek" if "deepseek" in (model or "").lower() else "OpenAI"
+    lines = PLACEHOLDER_LINES[persona]
+    return f"{rng.choice(lines['actions'])}\n\"{rng.choice(lines['responses'])}\""
+
+
+class MockProvider:
+    """Request handlers and counters for one mock server"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.rng = random.Random(self.settings.get("seed"))
+        self.stats = {"requests": 0, "streamed": 0, "rate_limited": 0, "server_errors": 0,
+                      "unauthorized": 0, "completed": 0, "completion_tokens": 0}
+
+    def _error(self, status: int, message: str, headers: Optional[Dict] = None):
+        return web.json_response({"error": {"code": status, "message": message}}, status=status, headers=headers)
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            self.stats["unauthorized"] += 1
+            return self._error(401, "Missing API key")
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return self._error(400, "Request body is not valid JSON")
+
+        roll = self.rng.random()
+        if roll < self.settings["rate_limit_rate"]:
+            self.stats["rate_limited"] += 1
+            return self._error(429, "Rate limit exceeded", {"Retry-After": str(self.settings["retry_after"])})
+        if roll < self.settings["rate_limit_rate"] + self.settings["server_error_rate"]:
+            self.stats["server_errors"] += 1
+            status = self.rng.choice([500, 502, 503])
+            return self._error(status, "Upstream provider error")
+
+        model = body.get("model", "mock")
+        messages = body.get("messages", [])
+        reply = persona_reply(messages, model, self.rng)
+        max_tokens = body.get("max_tokens")
+        if max_tokens:
+            reply = reply[:max_tokens * 4]
+        usage = {
+            "prompt_tokens": sum(count_tokens(str(m.get("content", ""))) for m in messages),
+            "completion_tokens": count_tokens(reply),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        ttft = sample_latency(self.settings["latency"], self.rng)
+        completion_id = f"gen-{uuid.uuid4().hex[:16]}"
+
+        if body.get("stream"):
+            self.stats["streamed"] += 1
+            include_usage = bool((body.get("usage") or {}).get("include")
+                                 or (body.get("stream_options") or {}).get("include_usage"))
+            return await self._stream(request, completion_id, model, reply, usage, ttft, include_usage)
+
+        tps = self.settings["tokens_per_second"]
+        await asyncio.sleep(ttft + (usage["completion_tokens"] / tps if tps else 0.0))
+        self._count_completion(usage)
+        return web.json_response({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        })
+
+    async def _stream(self, request, completion_id, model, reply, usage, ttft, include_usage):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+
+        def event(choices, extra=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                     "created": int(time.time()), "model": model, "choices": choices}
+            chunk.update(extra or {})
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        # OpenRouter sends keep-alive comments while the model is queued
+        await response.write(b": OPENROUTER PROCESSING\n\n")
+        await asyncio.sleep(ttft)
+
+        tps = self.settings["tokens_per_second"]
+        for piece in re.findall(r"\S+\s*", reply):
+            await response.write(event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}]))
+            if tps:
+                await asyncio.sleep(count_tokens(piece) / tps)
+        await response.write(event([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if include_usage:
+            await response.write(event([], {"usage": usage}))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        self._count_completion(usage)
+        return response
+
+    def _count_completion(self, usage: Dict):
+        self.stats["completed"] += 1
+        self.stats["completion_tokens"] += usage["completion_tokens"]
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+
+def create_app(settings: Optional[Dict] = None) -> web.Application:
+    provider = MockProvider(settings)
+    app = web.Application()
+    app["provider"] = provider
+    app.router.add_post("/api/v1/chat/completions", provider.chat_completions)
+    app.router.add_post("/v1/chat/completions", provider.chat_completions)
+    app.router.add_get("/stats", provider.get_stats)
+    app.router.add_get("/health", provider.health)
+    return app
+
+
+class MockServer:
+    """Run the mock server on a background thread, e.g. inside a benchmark
+
+    Usage:
+        with MockServer(get_settings("fast")) as server:
+            os.environ["OPENROUTER_BASE_URL"] = server.base_url
+    """
+
+    def __init__(self, settings: Optional[Dict] = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings
+        self.host = host
+        self.port = port
+        self.app = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/api/v1"
+
+    @property
+    def stats(self) -> Dict:
+        return dict(self.app["provider"].stats)
+
+    def start(self) -> "MockServer":
+        started = threading.Event()
+        errors = []
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self._start())
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name="mock-openrouter", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    async def _start(self):
+        self.app = create_app(self.settings)
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Pick up the real port when an ephemeral one (0) was requested
+        self.port = self._runner.addresses[0][1]
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local OpenRouter-compatible mock server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--profile', default='realistic', choices=sorted(PROFILES),
+                        help='Latency and error profile')
+    parser.add_argument('--latency-median', type=float,
+                        help='Override the median time to first token (seconds, lognormal)')
+    parser.add_argument('--latency-sigma', type=float, default=0.5,
+                        help='Spread of the lognormal latency when --latency-median is set')
+    parser.add_argument('--tokens-per-second', type=float,
+                        help='Override the token rate (0 sends the whole reply at once)')
+    parser.add_argument('--rate-limit-rate', type=float,
+                        help='Share of requests answered with 429')
+    parser.add_argument('--server-error-rate', type=float,
+                        help='Share of requests answered with 500/502/503')
+    parser.add_argument('--retry-after', type=float,
+                        help='Retry-After seconds sent with 429 answers')
+    parser.add_argument('--seed', type=int,
+                        help='Seed for replies, latencies and errors')
+    args = parser.parse_args()
+
+    latency = None
+    if args.latency_median is not None:
+        latency = {"distribution": "lognormal", "median": args.latency_median, "sigma": args.latency_sigma}
+    settings = get_settings(
+        args.profile,
+        latency=latency,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    print(f"Mock OpenRouter ({args.profile}) at http://{args.host}:{args.port}/api/v1")
+    web.run_app(create_app(settings), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Client-side rate limiting shared by every agent and session in the process.
+
+Each model and each API key gets a requests-per-minute and a
+tokens-per-minute token bucket. ``acquire`` reserves capacity in all of the
+buckets a call touches and sleeps until the reservation is covered, so
+concurrent debates queue locally instead of stampeding the provider and
+eating 429s. Buckets are guarded by a thread lock, so debates running on
+different event loops (e.g. separate Streamlit sessions) share them.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import config_service
+
+# Defaults used when config.yaml has no ``rate_limits`` section
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "per_model": {"requests_per_minute": 60, "tokens_per_minute": 120000},
+    "per_key": {"requests_per_minute": 200, "tokens_per_minute": 400000},
+    "models": {},
+}
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("rate_limits", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def estimate_tokens(prompt: str, max_tokens: int) -> int:
+    """Rough token count for a request: ~4 characters per prompt token plus the completion budget"""
+    return len(prompt) // 4 + max_tokens
+
+
+def key_label(api_key: Optional[str]) -> str:
+    """Stable, non-secret label for an API key"""
+    if not api_key:
+        return "none"
+    return "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+
+class TokenBucket:
+    """Token bucket that allows reservations to go negative.
+
+    A negative level is the queue of work already promised to earlier
+    callers; a new reservation waits until the refill covers it.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def configure(self, per_minute: float):
+        if float(per_minute) != self.capacity:
+            self.capacity = float(per_minute)
+            self.rate = self.capacity / 60.0
+            self.level = min(self.level, self.capacity)
+
+    def refill(self, now: float):
+        # A bucket created after the caller read the clock must not refill backwards
+        if now > self.updated:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take ``amount`` and return the seconds until it is covered"""
+        self.refill(now)
+        self.level -= amount
+        if self.level >= 0 or self.rate <= 0:
+            return 0.0
+        return -self.level / self.rate
+
+
+class RateLimiter:
+    """Per-model and per-key request and token buckets"""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+        # Share of the configured limits this process may use (e.g. 1/N for N worker processes)
+        self.scale = 1.0
+        self.waiting = 0
+        self.wait_stats = {"calls": 0, "queued": 0, "total_wait": 0.0, "max_wait": 0.0, "last_wait": 0.0}
+
+    def _limits_for(self, scope: str, name: str, settings: dict) -> dict:
+        if scope == "model":
+            limits = dict(settings["per_model"], **settings.get("models", {}).get(name, {}))
+        else:
+            limits = dict(settings["per_key"])
+        return {kind: value * self.scale for kind, value in limits.items()}
+
+    def _reserve(self, scope: str, name: str, tokens: int, settings: dict, now: float) -> float:
+        limits = self._limits_for(scope, name, settings)
+        wait = 0.0
+        for kind, amount, per_minute in (
+                ("requests", 1, limits["requests_per_minute"]),
+                ("tokens", tokens, limits["tokens_per_minute"])):
+            bucket = self._buckets.get((scope, name, kind))
+            if bucket is None:
+                bucket = self._buckets[(scope, name, kind)] = TokenBucket(per_minute)
+            else:
+                bucket.configure(per_minute)
+            wait = max(wait, bucket.reserve(amount, now))
+        return wait
+
+    async def acquire(self, model: str, api_key: Optional[str], tokens: int) -> float:
+        """Wait until the model and key buckets can cover one request of ``tokens`` tokens
+
+        Returns:
+            Seconds spent queued
+        """
+        settings = get_settings()
+        if not settings["enabled"]:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            wait = max(
+                self._reserve("model", model, tokens, settings, now),
+                self._reserve("key", key_label(api_key), tokens, settings, now)
+            )
+            self.wait_stats["calls"] += 1
+            if wait > 0:
+                self.wait_stats["queued"] += 1
+                self.waiting += 1
+
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+                    self.wait_stats["total_wait"] += wait
+                    self.wait_stats["max_wait"] = max(self.wait_stats["max_wait"], wait)
+                    self.wait_stats["last_wait"] = wait
+        return wait
+
+    def snapshot(self) -> dict:
+        """Current bucket levels and queue wait statistics"""
+        with self._lock:
+            now = time.monotonic()
+            buckets = {}
+            for (scope, name, kind), bucket in self._buckets.items():
+                bucket.refill(now)
+                buckets.setdefault(f"{scope}:{name}", {})[kind] = round(bucket.level, 2)
+            stats = dict(self.wait_stats)
+            stats["waiting"] = self.waiting
+        stats["avg_wait"] = stats["total_wait"] / stats["queued"] if stats["queued"] else 0.0
+        return {"buckets": buckets, "queue": stats}
+
+
+limiter = RateLimiter()
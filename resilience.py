@@ -0,0 +1,236 @@
+"""Retries, backoff and circuit breakers for provider calls.
+
+``send_with_retry`` wraps a single HTTP request: 429 and 5xx answers and
+transport errors are retried with jittered exponential backoff (honouring
+``Retry-After``), and every model has a circuit breaker that opens after
+repeated failures. While a breaker is open calls fail immediately with
+``CircuitOpenError`` so agents can fall back to a placeholder reply instead
+of waiting on timeouts.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+import config_service
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Defaults used when config.yaml has no ``resilience`` section
+DEFAULT_SETTINGS = {
+    "max_attempts": 3,
+    "base_delay": 0.5,
+    "max_delay": 8.0,
+    "max_retry_after": 30.0,
+    "failure_threshold": 5,
+    "reset_timeout": 30.0,
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised when a model's circuit breaker is open and the call is skipped"""
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures,
+    half-open (one trial call) after ``reset_timeout`` seconds."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a call may be attempted now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give back a half-open trial that ended without a verdict (e.g. cancelled)"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this failure opened the breaker"""
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                    self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class Metrics:
+    """Thread-safe counters of retry, breaker and fallback events per model"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def increment(self, event: str, model: str = "all"):
+        with self._lock:
+            self._counts[model][event] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Return ``{model: {event: count}}`` plus an ``all`` total"""
+        with self._lock:
+            result = {model: dict(events) for model, events in self._counts.items()}
+        totals = defaultdict(int)
+        for model, events in result.items():
+            if model == "all":
+                continue
+            for event, count in events.items():
+                totals[event] += count
+        for event, count in result.get("all", {}).items():
+            totals[event] += count
+        result["all"] = dict(totals)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+metrics = Metrics()
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("resilience", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """Return the shared circuit breaker for a model"""
+    with _breakers_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            settings = get_settings()
+            breaker = CircuitBreaker(settings["failure_threshold"], settings["reset_timeout"])
+            _breakers[model] = breaker
+        return breaker
+
+
+def breaker_states() -> Dict[str, str]:
+    """Current state of every model's breaker"""
+    with _breakers_lock:
+        return {model: breaker.state for model, breaker in _breakers.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """Full-jitter exponential backoff for the given (1-based) attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+async def send_with_retry(send: Callable[[], Awaitable[httpx.Response]], model: str) -> httpx.Response:
+    """Send a request with retries and circuit breaking
+
+    Args:
+        send: Zero-argument coroutine factory performing one HTTP attempt
+        model: Model name used to pick the circuit breaker and label metrics
+
+    Returns:
+        The final response. It may still carry an error status if retries
+        were exhausted or the status is not retryable.
+
+    Raises:
+        CircuitOpenError: If the model's breaker is open
+        httpx.TransportError: If the last attempt failed at the transport level
+    """
+    settings = get_settings()
+    breaker = get_breaker(model)
+    attempts = max(1, int(settings["max_attempts"]))
+
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            metrics.increment("short_circuits", model)
+            raise CircuitOpenError(f"Circuit open for {model}")
+
+        metrics.increment("attempts", model)
+        retry_after = None
+        try:
+            response = await send()
+        except httpx.TransportError:
+            metrics.increment("transport_errors", model)
+            if breaker.record_failure():
+                metrics.increment("circuit_opened", model)
+            if attempt == attempts:
+                raise
+        except BaseException:
+            # Cancelled (e.g. a losing hedge) or failed before the provider
+            # answered: says nothing about the model, but a half-open
+            # breaker must not keep waiting for this trial forever
+            breaker.release_trial()
+            raise
+        else:
+            if response.status_code not in RETRYABLE_STATUS:
+                breaker.record_success()
+                return response
+            metrics.increment(f"status_{response.status_code}", model)
+            if breaker.record_failure():
+                metrics.increment("circuit_opened", model)
+            if attempt == attempts:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > settings["max_retry_after"]:
+                # Waiting that long would stall the turn; give up now
+                metrics.increment("retry_after_exceeded", model)
+                return response
+            await response.aclose()
+
+        if retry_after is not None:
+            metrics.increment("retry_after_honored", model)
+            delay = retry_after
+        else:
+            delay = backoff_delay(attempt, settings["base_delay"], settings["max_delay"])
+        metrics.increment("retries", model)
+        await asyncio.sleep(delay)
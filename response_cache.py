@@ -0,0 +1,195 @@
+"""Two-tier cache for provider responses.
+
+Responses are keyed on the model, the fully rendered messages and the
+sampling parameters. Lookups hit an in-memory LRU first and then an on-disk
+SQLite table with TTL and size-based eviction, so repeated demo and classroom
+prompts are served in milliseconds without paying for a new generation.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import config_service
+
+# Defaults used when config.yaml has no ``cache`` section
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    "path": "logs/response_cache.sqlite",
+    "memory_entries": 256,
+    "max_entries": 10000,
+    "ttl_seconds": 7 * 24 * 3600,
+}
+
+# Run size eviction on the disk tier after this many writes
+EVICT_EVERY = 100
+
+
+class ResponseCache:
+    """In-memory LRU in front of a SQLite table of generated responses"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_SETTINGS["path"],
+                 memory_entries: int = DEFAULT_SETTINGS["memory_entries"],
+                 max_entries: int = DEFAULT_SETTINGS["max_entries"],
+                 ttl_seconds: float = DEFAULT_SETTINGS["ttl_seconds"]):
+        """Create a cache.
+
+        Args:
+            path: SQLite file for the disk tier, or None for memory only
+            memory_entries: Capacity of the in-memory LRU tier
+            max_entries: Maximum number of rows kept on disk
+            ttl_seconds: Age after which an entry is treated as expired
+        """
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages, temperature: float, max_tokens: int) -> str:
+        """Hash the request fields that determine a response"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[0], row[1])
+                    self.counters["disk_hits"] += 1
+                    return row[0]
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """Store a response in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.counters["stores"] += 1
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= EVICT_EVERY:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        """Drop expired rows, then the least recently used beyond max_entries"""
+        self._writes_since_evict = 0
+        removed = self._db.execute(
+            "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+        ).rowcount
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            removed += self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            ).rowcount
+        self.counters["evictions"] += removed
+
+    def evict(self):
+        """Run TTL and size eviction on the disk tier now"""
+        with self._lock:
+            if self._db is not None:
+                self._evict(time.time())
+                self._db.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus the overall hit rate"""
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Return the process-wide cache, or None if caching is disabled in config.yaml"""
+    global _shared_cache
+    try:
+        settings = dict(DEFAULT_SETTINGS, **config_service.get_config().get("cache", {}))
+    except config_service.ConfigError:
+        settings = dict(DEFAULT_SETTINGS)
+    if not settings["enabled"]:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                path=settings["path"],
+                memory_entries=settings["memory_entries"],
+                max_entries=settings["max_entries"],
+                ttl_seconds=settings["ttl_seconds"]
+            )
+        return _shared_cache
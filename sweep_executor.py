@@ -0,0 +1,346 @@
+"""Multi-process sweep executor for large experiment grids.
+
+A grid file lists values for each axis (topics, styles, languages, models,
+temperatures); every combination is a cell whose id is a hash of its
+parameters. Cells are sharded across worker processes by id, so a grid
+always splits the same way, and each worker runs its shard on its own
+event loop and connection pool with up to ``--concurrency`` debates in
+flight. A cell whose transcript already records a completed debate is
+skipped, so an interrupted sweep picks up where it stopped; ``degraded``,
+``failed`` and ``budget_exceeded`` cells are run again. All cells are
+merged into one ``manifest.json`` with per-worker throughput.
+
+Workers share the configured limits by splitting them evenly: each gets
+``1/workers`` of the rate limits and of the session token and cost budget,
+enforced in the worker on its own totals. A worker that spends its share
+stops starting debates (status ``budget_exceeded``) even if other workers
+have budget left, so the sweep as a whole never exceeds the session budget.
+
+Grid file (YAML, every key optional):
+
+    turns: 6
+    topics: ["AI Dinner Battle"]          # default: every topic in config.yaml
+    styles: ["casual", "intense"]          # default: every debate style
+    languages: ["English", "Basque"]       # default: no language instruction
+    models:                                # default: the models in config.yaml
+      - {}
+      - {openai: "openai/gpt-4o"}
+    temperatures: [0.7, 0.9]               # default: 0.9
+
+Usage:
+    python sweep_executor.py grid.yaml --workers 8 --concurrency 16 --output-dir logs/sweeps/run1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+import config_service
+import rate_limiter
+import transport
+from batch_runner import placeholder_turns, run_job, write_transcript
+from usage import UsageTotals
+
+GRID_AXES = ("topics", "styles", "languages", "models", "temperatures")
+
+
+def load_grid(path: str) -> Dict:
+    """Read and check a grid file
+
+    Raises:
+        config_service.ConfigError: If the file is unreadable or an axis is not a list
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            grid = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        raise config_service.ConfigError(f"Could not read grid file {path}: {e}") from e
+    if not isinstance(grid, dict):
+        raise config_service.ConfigError("Grid file must be a mapping")
+    for axis in GRID_AXES:
+        if axis in grid and not isinstance(grid[axis], list):
+            raise config_service.ConfigError(f"'{axis}' must be a list")
+    return grid
+
+
+def cell_id(params: Dict) -> str:
+    """Stable id of a grid cell, derived from its parameters only"""
+    encoded = json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:12]
+
+
+def shard_of(cell: str, workers: int) -> int:
+    """Worker index for a cell id; depends only on the id and the worker count"""
+    return int(cell, 16) % workers
+
+
+def build_cells(grid: Dict, config) -> List[Dict]:
+    """Expand a grid into batch runner jobs, sorted by cell id
+
+    Raises:
+        config_service.ConfigError: If the grid names an unknown topic or style
+    """
+    topics = {t["name"]: config_service.thaw(t) for t in config.get("topics", [])}
+    styles = config_service.thaw(config.get("debate_styles", {}))
+    for name in grid.get("topics") or []:
+        if name not in topics:
+            raise config_service.ConfigError(f"Unknown topic in grid: {name}")
+    for key in grid.get("styles") or []:
+        if key not in styles:
+            raise config_service.ConfigError(f"Unknown debate style in grid: {key}")
+
+    cells = []
+    for topic, style, language, models, temperature in itertools.product(
+            grid.get("topics") or list(topics),
+            grid.get("styles") or list(styles),
+            grid.get("languages") or [None],
+            grid.get("models") or [{}],
+            grid.get("temperatures") or [None]):
+        params = {
+            "topic": topic,
+            "style": style,
+            "language": language,
+            "models": models or {},
+            "temperature": temperature
+        }
+        cells.append({
+            "id": cell_id(params),
+            "topic": topics[topic],
+            "style_key": style,
+            "style": styles[style],
+            "language": language,
+            "models": models or {},
+            "temperature": temperature
+        })
+    return sorted(cells, key=lambda c: c["id"])
+
+
+def cell_path(cells_dir: Path, cell: str) -> Path:
+    return cells_dir / f"debate_{cell}.json"
+
+
+def load_cell(path: Path) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_completed(path: Path) -> bool:
+    """Whether the cell holds a genuine success: completed, with no placeholder turns
+    
+    Transcripts written before placeholder turns were detected may say
+    ``completed`` for a debate that never reached the model, so the turns
+    are checked as well.
+    """
+    result = load_cell(path)
+    return (bool(result) and result.get("metadata", {}).get("status") == "completed"
+            and not placeholder_turns(result.get("conversation", [])))
+
+
+async def _run_shard(jobs: List[Dict], turns: int, concurrency: int, cells_dir: Path, use_cache: bool,
+                     budget_scale: float = 1.0) -> List[Dict]:
+    config = config_service.get_config()
+    semaphore = asyncio.Semaphore(concurrency)
+    session_totals = UsageTotals()
+
+    async def run(job):
+        async with semaphore:
+            result = await run_job(job, config, turns, use_cache, session_totals, budget_scale)
+        write_transcript(cells_dir, result)
+        return result
+
+    try:
+        return await asyncio.gather(*(run(job) for job in jobs))
+    finally:
+        await transport.aclose()
+
+
+def run_worker(worker: int, workers: int, jobs: List[Dict], turns: int, concurrency: int,
+               cells_dir: str, use_cache: bool = True, verbose: bool = False) -> Dict:
+    """Run one shard in this process and return its throughput figures
+
+    The process gets ``1/workers`` of the configured rate limits and of the
+    session budget, so the whole pool stays within them.
+    """
+    share = 1.0 / workers
+    rate_limiter.limiter.scale = share
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, \
+            (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)):
+        results = asyncio.run(_run_shard(jobs, turns, concurrency, Path(cells_dir), use_cache, share))
+    wall_time = time.perf_counter() - started
+
+    totals = UsageTotals()
+    statuses: Dict[str, int] = {}
+    for result in results:
+        status = result["metadata"]["status"]
+        statuses[status] = statuses.get(status, 0) + 1
+        for turn in result["conversation"]:
+            totals.add({
+                "prompt_tokens": turn.get("prompt_tokens", 0),
+                "completion_tokens": turn.get("completion_tokens", 0),
+                "cost": turn.get("cost", 0.0),
+                "latency": turn.get("total_time")
+            })
+    usage = totals.as_dict()
+    return {
+        "worker": worker,
+        "pid": os.getpid(),
+        "cells": len(results),
+        "statuses": statuses,
+        "turns": usage["turns"],
+        "wall_time": round(wall_time, 3),
+        "debates_per_minute": round(len(results) / wall_time * 60, 2) if wall_time else 0.0,
+        "turns_per_second": round(usage["turns"] / wall_time, 3) if wall_time else 0.0,
+        "tokens_per_second": round(usage["total_tokens"] / wall_time, 1) if wall_time else 0.0,
+        "usage": usage
+    }
+
+
+def merge_manifest(output_dir: Path, cells: List[Dict], workers: int, worker_stats: List[Dict],
+                   grid: Dict, wall_time: float, resumed: int) -> Dict:
+    """Combine every cell transcript in the sweep into manifest.json"""
+    entries = []
+    totals = UsageTotals()
+    statuses: Dict[str, int] = {}
+    for cell in cells:
+        path = cell_path(output_dir / "cells", cell["id"])
+        result = load_cell(path)
+        meta = result["metadata"] if result else {}
+        status = meta.get("status", "missing")
+        statuses[status] = statuses.get(status, 0) + 1
+        for turn in (result or {}).get("conversation", []):
+            totals.add({
+                "prompt_tokens": turn.get("prompt_tokens", 0),
+                "completion_tokens": turn.get("completion_tokens", 0),
+                "cost": turn.get("cost", 0.0),
+                "latency": turn.get("total_time")
+            })
+        entries.append({
+            "id": cell["id"],
+            "topic": cell["topic"]["name"],
+            "style": cell["style_key"],
+            "language": cell["language"],
+            "models": cell["models"],
+            "temperature": cell["temperature"],
+            "worker": shard_of(cell["id"], workers),
+            "status": status,
+            "turns": len((result or {}).get("conversation", [])),
+            "duration": meta.get("duration"),
+            "usage": meta.get("usage"),
+            "error": meta.get("error"),
+            "file": str(path.relative_to(output_dir)) if result else None
+        })
+
+    manifest = {
+        "created": datetime.now().isoformat(),
+        "grid": grid,
+        "workers": workers,
+        "wall_time": round(wall_time, 3),
+        "summary": {
+            "cells": len(cells),
+            "resumed": resumed,
+            "statuses": statuses,
+            "usage": totals.as_dict()
+        },
+        "worker_stats": sorted(worker_stats, key=lambda s: s["worker"]),
+        "cells": entries
+    }
+    with open(output_dir / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def run_sweep(grid: Dict, workers: int = 4, concurrency: int = 8, output_dir: str = "logs/sweeps",
+              use_cache: bool = True, verbose: bool = False, out=sys.stdout) -> Dict:
+    """Run every unfinished cell of ``grid`` across ``workers`` processes
+
+    Returns:
+        The merged manifest (also written to ``manifest.json``)
+    """
+    config = config_service.get_config()
+    turns = int(grid.get("turns", 6))
+    output_path = Path(output_dir)
+    cells_dir = output_path / "cells"
+    cells_dir.mkdir(parents=True, exist_ok=True)
+
+    cells = build_cells(grid, config)
+    pending = [c for c in cells if not is_completed(cell_path(cells_dir, c["id"]))]
+    resumed = len(cells) - len(pending)
+    print(f"{len(cells)} cells, {resumed} already completed, {len(pending)} to run on {workers} workers", file=out)
+
+    shards: Dict[int, List[Dict]] = {}
+    for cell in pending:
+        shards.setdefault(shard_of(cell["id"], workers), []).append(cell)
+
+    started = time.perf_counter()
+    worker_stats = []
+    if shards:
+        # Spawn rather than fork: workers must not inherit the parent's locks or event loop threads
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as executor:
+            futures = [
+                executor.submit(run_worker, worker, workers, shard, turns, concurrency,
+                                str(cells_dir), use_cache, verbose)
+                for worker, shard in sorted(shards.items())
+            ]
+            for future in as_completed(futures):
+                stats = future.result()
+                worker_stats.append(stats)
+                print(f"Worker {stats['worker']}: {stats['cells']} cells in {stats['wall_time']:.1f}s "
+                      f"({stats['debates_per_minute']:.1f} debates/min, {stats['turns_per_second']:.2f} turns/s, "
+                      f"{stats['tokens_per_second']:.0f} tokens/s)", file=out)
+
+    return merge_manifest(output_path, cells, workers, worker_stats, grid,
+                          time.perf_counter() - started, resumed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a debate experiment grid across worker processes')
+    parser.add_argument('grid', help='YAML grid file (topics, styles, languages, models, temperatures, turns)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum debates in flight per worker')
+    parser.add_argument('--output-dir', default=os.path.join('logs', 'sweeps', 'default'),
+                        help='Sweep directory; rerunning with the same directory resumes the sweep')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always request fresh responses instead of reusing cached ones')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Show per-turn agent output from the workers')
+    args = parser.parse_args()
+
+    try:
+        grid = load_grid(args.grid)
+        manifest = run_sweep(grid, max(1, args.workers), args.concurrency, args.output_dir,
+                             use_cache=not args.no_cache, verbose=args.verbose)
+    except config_service.ConfigError as e:
+        parser.error(str(e))
+
+    summary = manifest["summary"]
+    usage = summary["usage"]
+    print("\n=== Sweep Summary ===")
+    print(f"Cells: {summary['cells']} ({', '.join(f'{k}: {v}' for k, v in summary['statuses'].items())}), "
+          f"{summary['resumed']} resumed")
+    print(f"Wall time: {manifest['wall_time']:.1f}s with {manifest['workers']} workers")
+    print(f"Tokens: {usage['total_tokens']}, cost ${usage['cost']:.4f}")
+    print(f"Manifest: {Path(args.output_dir) / 'manifest.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import pytest
+
+import batch_runner
+import config_service
+import usage
+from usage import UsageTotals
+
+
+def scripted_agents(monkeypatch, replies):
+    """Patch make_agents so the debate's API calls answer with ``replies`` in turn
+
+    A ``None`` reply is a failed call, which the agent answers with a placeholder.
+    """
+    script = iter(replies)
+    make_agents = batch_runner.make_agents
+
+    def scripted(config, job):
+        agents = make_agents(config, job)
+        for agent in agents:
+            async def call_openrouter_api(prompt, model=None, use_cache=True, agent=agent):
+                reply = next(script)
+                if reply:
+                    agent.last_usage = usage.make_usage(model, 10, 20)
+                return reply
+
+            monkeypatch.setattr(agent, "call_openrouter_api", call_openrouter_api)
+            monkeypatch.setattr(agent, "fallback_models", lambda: [])
+            monkeypatch.setattr(agent.key_pool, "has_keys", lambda: True)
+        return agents
+
+    monkeypatch.setattr(batch_runner, "make_agents", scripted)
+
+
+async def run(replies, monkeypatch):
+    scripted_agents(monkeypatch, replies)
+    config = config_service.get_config()
+    job = batch_runner.build_jobs(config)[0]
+    return await batch_runner.run_job(job, config, len(replies), False, UsageTotals())
+
+
+@pytest.mark.asyncio
+async def test_debate_of_model_replies_is_completed(monkeypatch):
+    result = await run(["Truffles.", "Noodles.", "Caviar."], monkeypatch)
+    assert result["metadata"]["status"] == "completed"
+    assert result["metadata"]["error"] is None
+    assert batch_runner.placeholder_turns(result["conversation"]) == 0
+
+
+@pytest.mark.asyncio
+async def test_placeholder_turns_degrade_the_debate(monkeypatch):
+    result = await run(["Truffles.", None, "Caviar."], monkeypatch)
+    assert result["metadata"]["status"] == "degraded"
+    assert result["metadata"]["error"] == "1 of 3 turns are placeholder replies"
+
+
+@pytest.mark.asyncio
+async def test_debate_of_placeholders_only_has_failed(monkeypatch):
+    result = await run([None, None], monkeypatch)
+    assert result["metadata"]["status"] == "failed"
+    assert result["metadata"]["error"] == "2 of 2 turns are placeholder replies"
@@ -0,0 +1,130 @@
+import contextlib
+import gc
+import logging
+import os
+import pathlib
+import sys
+import tracemalloc
+
+import pytest
+
+import log_archive
+import log_writer
+from debate_logger import DebateLogger, get_console_handler, load_conversation_history, registry
+
+DEBATES = 10_000
+
+
+def open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.fixture
+def quiet_console():
+    handler = get_console_handler()
+    level = handler.level
+    handler.setLevel(logging.CRITICAL + 1)
+    yield
+    handler.setLevel(level)
+
+
+@contextlib.contextmanager
+def detached_root_handlers():
+    """pytest's log capture keeps every propagated record, which would swamp the memory check"""
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    root.handlers = []
+    try:
+        yield
+    finally:
+        root.handlers = handlers
+
+
+def run_debate(log_dir, n):
+    logger = DebateLogger(log_dir=str(log_dir), debate_id=f"t{n}")
+    logger.log_debate_turn("OpenAI", "*sips wine* Premium ingredients.", "OpenAI")
+    logger.log_debate_turn("DeepSeek", "*stirs wok* Less is more.", "DeepSeek")
+    if n % 2 == 0:
+        logger.end_debate()
+    # Odd debates are abandoned without ending, like the Reset button used to
+
+
+def test_history_survives_closing_the_logger(tmp_path, quiet_console):
+    logger = DebateLogger(log_dir=str(tmp_path), debate_id="reopened")
+    logger.log_debate_turn("OpenAI", "first", "OpenAI")
+    # end_debate closes the file (as eviction does); logging again reopens it
+    logger.end_debate()
+    logger.log_debate_turn("DeepSeek", "second", "DeepSeek")
+    logger.close()
+
+    history = load_conversation_history(tmp_path, "reopened")
+    assert [turn["message"] for turn in history] == ["first", "second"]
+
+
+def test_export_on_end_leaves_the_log_closed(tmp_path, quiet_console):
+    logger = DebateLogger(log_dir=str(tmp_path), debate_id="exported")
+    logger.log_debate_turn("OpenAI", "first", "OpenAI")
+    open_before = len(registry)
+    exports = logger.end_debate(export_format="json")
+    assert set(exports) == {"json"}
+    # Exporting after close() used to reopen the file through log_event
+    assert len(registry) == open_before - 1
+    assert logger.log_file.resolve() not in log_archive.active_files()
+
+
+def test_registry_caps_open_loggers(tmp_path, quiet_console, monkeypatch):
+    monkeypatch.setattr(registry, "max_open", 4)
+    loggers = [DebateLogger(log_dir=str(tmp_path), debate_id=f"cap{n}") for n in range(10)]
+    assert len(registry) == 4
+
+    # An evicted logger reopens its file when it logs again
+    loggers[0].log_event("Late", "still works")
+    loggers[0].flush()
+    assert len(registry) == 4
+    assert "still works" in (tmp_path / "debate_log_cap0.log").read_text(encoding="utf-8")
+    for logger in loggers:
+        logger.close()
+    loggers[0].flush()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="counts descriptors in /proc/self/fd")
+def test_fds_and_memory_stay_flat_across_debates(tmp_path, quiet_console):
+    with detached_root_handlers():
+        check_fds_and_memory(tmp_path)
+
+
+def traced_memory():
+    # pathlib interns every new file name, and the interned-string table grows
+    # in large one-off steps; that is CPython's table, not debate state
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, pathlib.__file__)])
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def check_fds_and_memory(tmp_path):
+    # Warm up the writer thread and lazily created module state
+    for n in range(200):
+        run_debate(tmp_path, -n - 1)
+    log_writer.get_writer().flush()
+    gc.collect()
+
+    fds_before = open_fds()
+    tracemalloc.start()
+
+    for n in range(DEBATES):
+        run_debate(tmp_path, n)
+        if n == DEBATES // 10:
+            log_writer.get_writer().flush()
+            gc.collect()
+            memory_early = traced_memory()
+
+    log_writer.get_writer().flush()
+    gc.collect()
+    memory_after = traced_memory()
+    tracemalloc.stop()
+
+    # At most the registry's cap of loggers keeps a log file open
+    assert open_fds() - fds_before <= 2 * registry.max_open
+    assert len(registry) <= registry.max_open
+    # Growth from 1,000 to 10,000 debates is noise, not per-debate state
+    assert memory_after - memory_early < 200_000, (memory_early, memory_after)
+    assert len(logging.Logger.manager.loggerDict) < 1000
@@ -0,0 +1,74 @@
+import pytest
+
+from debate_manager import DebateManager
+from debate_system import DebateAgent
+from memory import SUMMARY_HEADER, RetrievalMemory, RollingMemory
+
+
+def scripted_debate(monkeypatch, replies):
+    """Debate whose agents answer with ``replies`` in turn and record each prompt sent"""
+    sent = []
+    script = iter(replies)
+
+    def agent(name):
+        agent = DebateAgent(name, "test")
+
+        async def call_openrouter_api(prompt, model=None, use_cache=True):
+            sent.append(prompt)
+            return next(script)
+
+        monkeypatch.setattr(agent, "call_openrouter_api", call_openrouter_api)
+        return agent
+
+    manager = DebateManager(agent("OpenAI"), agent("DeepSeek"), "Fine dining vs street food", use_cache=False)
+    monkeypatch.setattr(manager.agent1.key_pool, "has_keys", lambda: True)
+    return manager, sent
+
+
+@pytest.mark.asyncio
+async def test_rolling_summary_reaches_the_prompt(monkeypatch):
+    replies = [
+        "Premium compute is the only path to quality. Everything else follows from it.",
+        "Efficiency beats spending every time. Look at our training bill.",
+        "Careful curation of data matters more than raw speed.",
+        "Open weights let everyone cook with the same recipe.",
+    ]
+    manager, sent = scripted_debate(monkeypatch, replies)
+    # Small enough that only the latest turn stays verbatim
+    manager.memory = RollingMemory(recent_token_budget=20, summary_token_budget=200, min_recent_turns=1)
+
+    await manager.start_debate()
+    for _ in replies[1:]:
+        await manager.next_turn()
+
+    assert manager.memory.folded_turns >= 2
+    prompt = sent[-1]
+    assert "Debate so far:" in prompt
+    assert SUMMARY_HEADER in prompt
+    # The first turn has been folded into the summary, so only the summary can carry it
+    assert "Premium compute is the only path to quality." in prompt
+    assert prompt.index("Debate so far:") < prompt.index("Previous exchange:")
+
+
+@pytest.mark.asyncio
+async def test_retrieved_turns_reach_the_prompt(monkeypatch):
+    replies = [
+        "Sous-vide GPU clusters cook the best models slowly.",
+        "Street vendors train models on cheap hardware.",
+        "Open weights let everyone share recipes.",
+        "Your sous-vide GPU clusters burn money while the models cook.",
+        "Money well spent.",
+    ]
+    manager, sent = scripted_debate(monkeypatch, replies)
+    manager.memory = RetrievalMemory(top_k=1, recent_turns=1)
+
+    await manager.start_debate()
+    for _ in replies[1:]:
+        await manager.next_turn()
+
+    prompt = sent[-1]
+    assert "Debate so far:" in prompt
+    assert "Relevant earlier turns:" in prompt
+    # Retrieved by similarity to the latest message, not because it is recent
+    assert "(turn 1) OpenAI: Sous-vide GPU clusters cook the best models slowly." in prompt
+    assert "Open weights let everyone share recipes." not in prompt
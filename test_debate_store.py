@@ -0,0 +1,108 @@
+import os
+from datetime import datetime, timedelta
+
+from debate_store import DebateStore
+from exporter import ExportManifest
+
+
+def make_store(tmp_path):
+    store = DebateStore(tmp_path / "debates.sqlite")
+    now = datetime.now()
+    for n, (topic, started) in enumerate([("Pasta", now - timedelta(days=10)),
+                                          ("Pasta", now - timedelta(days=1)),
+                                          ("Sushi", now - timedelta(days=1))]):
+        store.save_debate({"id": f"d{n}", "topic": topic, "start_time": started.isoformat()})
+        for seq, agent in enumerate(["OpenAI", "DeepSeek"]):
+            store.add_turn(f"d{n}", {
+                "agent": agent, "message": f"{agent} on {topic}",
+                "timestamp": (started + timedelta(seconds=seq)).isoformat(),
+                "model": f"{agent.lower()}/model", "ttft": 0.5,
+            }, seq)
+    return store
+
+
+def test_turns_round_trip(tmp_path):
+    store = make_store(tmp_path)
+    turns = store.get_turns("d1")
+    assert [turn["agent"] for turn in turns] == ["OpenAI", "DeepSeek"]
+    # Fields without a column of their own come back too
+    assert turns[0]["ttft"] == 0.5
+    assert store.get_debate("d1")["topic"] == "Pasta"
+    # Without a seq, turns go after the last stored one
+    assert store.add_turn("d1", {"agent": "OpenAI", "message": "again"}) == 2
+
+
+def test_query_filters(tmp_path):
+    store = make_store(tmp_path)
+    last_week = datetime.now() - timedelta(days=7)
+
+    turns = store.query_turns(agent="DeepSeek", topic="Pasta", since=last_week)
+    assert [(turn["debate_id"], turn["message"]) for turn in turns] == [("d1", "DeepSeek on Pasta")]
+    assert len(store.query_turns(model="openai/model")) == 3
+
+    assert [d["id"] for d in store.list_debates(topic="Pasta")] == ["d1", "d0"]
+    assert sorted(d["id"] for d in store.list_debates(since=last_week, agent="OpenAI")) == ["d1", "d2"]
+    assert store.list_debates(limit=1, offset=2)[0]["turns"] == 2
+
+
+def test_search_ranks_and_follows_updates(tmp_path):
+    store = make_store(tmp_path)
+    store.add_turn("d2", {"agent": "DeepSeek", "message": "Sushi sushi sushi, rolled with efficiency"}, 2)
+
+    hits = store.search("sushi")
+    assert [(hit["debate_id"], hit["seq"]) for hit in hits][0] == ("d2", 2)
+    assert "**" in hits[0]["snippet"]
+    assert store.search("effic*", agent="DeepSeek")[0]["seq"] == 2
+    # Operators and quotes are plain text, not query syntax
+    assert store.search('"rolled" (') == store.search("rolled") != []
+
+    # Rewriting a turn replaces its index entry
+    store.add_turn("d2", {"agent": "DeepSeek", "message": "Ramen instead"}, 2)
+    assert sorted(hit["seq"] for hit in store.search("sushi", topic="Sushi")) == [0, 1]
+    assert store.search("ramen")[0]["debate_id"] == "d2"
+
+
+def test_export_manifest_follows_writes_and_outside_changes(tmp_path):
+    store = DebateStore(tmp_path / "debates.sqlite")
+    export_dir = tmp_path / "exports"
+    export_dir.mkdir()
+    old = export_dir / "debate_export_20250101_120000_20250101_120500.txt"
+    old.write_text("old")
+    os.utime(old, (1, 1))
+    manifest = ExportManifest(export_dir, store)
+    assert [e["debate_id"] for e in manifest.list()] == ["20250101_120000"]
+
+    # Files written through record() are listed without a rescan
+    new = export_dir / "debate_export_d1_20250102_120000.json"
+    before = manifest.dir_mtime()
+    new.write_text("{}")
+    manifest.record({"json": str(new)}, "d1", before)
+    assert not manifest.refresh()
+    assert [(e["debate_id"], e["format"]) for e in manifest.list()] == [("d1", "json"), ("20250101_120000", "txt")]
+    assert [e["debate_id"] for e in manifest.list(limit=1, offset=1)] == ["20250101_120000"]
+
+    # Files removed behind its back are noticed through the directory's mtime
+    old.unlink()
+    assert manifest.count() == 1
+
+
+def test_export_manifest_rescans_after_outside_file_then_export(tmp_path):
+    store = DebateStore(tmp_path / "debates.sqlite")
+    export_dir = tmp_path / "exports"
+    export_dir.mkdir()
+    manifest = ExportManifest(export_dir, store)
+    assert manifest.list() == []
+
+    # A file appears behind the manifest's back, then we export before any listing
+    outside = export_dir / "debate_export_outside_20250101_120000.txt"
+    outside.write_text("outside")
+    os.utime(export_dir, ns=(1, 1))
+    before = manifest.dir_mtime()
+    ours = export_dir / "debate_export_d1_20250102_120000.json"
+    ours.write_text("{}")
+    os.utime(export_dir, ns=(2, 2))
+    manifest.record({"json": str(ours)}, "d1", before)
+
+    # Our export must not mark the directory as in sync, or the outside file is never listed
+    assert manifest.refresh()
+    assert sorted(e["debate_id"] for e in manifest.list()) == ["d1", "outside"]
@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+
+import hedging
+import rate_limiter
+import transport
+import usage
+from debate_system import DebateAgent
+from key_pool import KeyPool
+from resilience import Metrics
+
+SETTINGS = dict(hedging.DEFAULT_SETTINGS, default_delay=0.01, min_delay=0.01)
+
+
+@pytest.fixture
+def fast_hedges(monkeypatch):
+    """Hedges fire after 10ms; fresh latency samples and metrics"""
+    metrics = Metrics()
+    monkeypatch.setattr(hedging, "get_settings", lambda: dict(SETTINGS))
+    monkeypatch.setattr(hedging, "latency", hedging.LatencyTracker())
+    monkeypatch.setattr(hedging, "metrics", metrics)
+    return metrics
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_the_loser_cancelled(fast_hedges):
+    cancelled = []
+
+    async def call(model):
+        if model == "primary":
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+        return f"reply from {model}"
+
+    assert await hedging.hedged_call(["primary", "fallback"], call) == "reply from fallback"
+    assert cancelled == ["primary"]
+    counts = fast_hedges.snapshot()
+    assert counts["primary"] == {"hedges_fired": 1, "hedges_cancelled": 1}
+    assert counts["fallback"] == {"hedge_wins": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_fails_over_without_waiting(fast_hedges, monkeypatch):
+    monkeypatch.setattr(hedging, "get_settings", lambda: dict(SETTINGS, default_delay=60.0, max_delay=60.0))
+    calls = []
+
+    async def call(model):
+        calls.append(model)
+        return None if model == "primary" else "ok"
+
+    assert await asyncio.wait_for(hedging.hedged_call(["primary", "fallback"], call), 1.0) == "ok"
+    assert calls == ["primary", "fallback"]
+    assert fast_hedges.snapshot()["primary"] == {"hedge_failures": 1}
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_call_cancels_every_request(fast_hedges):
+    started, cancelled = [], []
+
+    async def call(model):
+        started.append(model)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+
+    task = asyncio.ensure_future(hedging.hedged_call(["primary", "fallback"], call))
+    while len(started) < 2:
+        await asyncio.sleep(0.005)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert sorted(cancelled) == ["fallback", "primary"]
+
+
+def hedging_agent(monkeypatch, call_openrouter_api):
+    agent = DebateAgent("OpenAI", "test")
+    monkeypatch.setattr(agent, "key_pool", KeyPool(["sk-test"]))
+    monkeypatch.setattr(agent, "fallback_models", lambda: ["fallback"])
+    monkeypatch.setattr(agent, "call_openrouter_api", call_openrouter_api.__get__(agent))
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_losing_hedge_that_answered_is_billed(fast_hedges, monkeypatch):
+    primary_may_finish = asyncio.Event()
+    billed = {}
+
+    async def call_openrouter_api(self, prompt, model, use_cache=True):
+        if model != "fallback":
+            await primary_may_finish.wait()
+            self.last_usage = billed[model] = usage.make_usage(model, 100, 10)
+            return "primary reply"
+        # Both requests finish before the hedge collects either
+        primary_may_finish.set()
+        self.last_usage = billed[model] = usage.make_usage(model, 100, 20)
+        return "fallback reply"
+
+    agent = hedging_agent(monkeypatch, call_openrouter_api)
+    response = await agent.generate_response("", "Your move")
+
+    winner = "fallback" if response == "fallback reply" else next(m for m in billed if m != "fallback")
+    assert agent.last_usage["model"] == winner
+    assert agent.last_usage["total_tokens"] == 230
+    assert agent.last_usage["cost"] == pytest.approx(sum(u["cost"] for u in billed.values()))
+
+
+@pytest.mark.asyncio
+async def test_latency_starts_when_the_request_is_sent(monkeypatch):
+    async def slow_acquire(model, api_key, tokens):
+        await asyncio.sleep(0.3)
+        return 0.3
+
+    async def handler(request):
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hi"}}],
+                                         "usage": {"prompt_tokens": 1, "completion_tokens": 1}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(rate_limiter.limiter, "acquire", slow_acquire)
+    monkeypatch.setattr(transport, "get_client", lambda: client)
+    monkeypatch.setattr(hedging, "latency", hedging.LatencyTracker())
+    agent = DebateAgent("OpenAI", "test")
+    monkeypatch.setattr(agent, "key_pool", KeyPool(["sk-test"]))
+
+    try:
+        assert await agent.call_openrouter_api("prompt", "model", use_cache=False) == "hi"
+    finally:
+        await client.aclose()
+    # The rate limiter wait is not part of the provider's latency
+    assert agent.last_usage["latency"] < 0.2
+    assert hedging.latency.percentile("model", 1.0) < 0.2
@@ -0,0 +1,111 @@
+import httpx
+import pytest
+
+import key_pool
+import rate_limiter
+from debate_system import DebateAgent
+from key_pool import KeyPool, NoHealthyKeyError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Settable monotonic clock for quarantine timing"""
+    now = [1000.0]
+    monkeypatch.setattr(key_pool.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(key_pool, "get_settings", lambda: dict(key_pool.DEFAULT_SETTINGS))
+    return now
+
+
+def test_least_loaded_spreads_concurrent_requests(clock):
+    pool = KeyPool(["a", "b", "c"])
+    assert sorted(pool.acquire() for _ in range(3)) == ["a", "b", "c"]
+    pool.release("b", 200)
+    assert pool.acquire() == "b"
+
+
+def test_round_robin_rotates(clock, monkeypatch):
+    monkeypatch.setattr(key_pool, "get_settings", lambda: dict(key_pool.DEFAULT_SETTINGS, strategy="round_robin"))
+    pool = KeyPool(["a", "b"])
+    picks = [pool.acquire() for _ in range(4)]
+    assert picks == ["a", "b", "a", "b"]
+
+
+def test_rate_limited_key_sits_out_its_retry_after(clock):
+    pool = KeyPool(["a", "b"])
+    pool.release(pool.acquire(), 429, "30")
+    assert [pool.acquire() for _ in range(2)] == ["b", "b"]
+    clock[0] += 31
+    assert "a" in {pool.acquire() for _ in range(2)}
+
+
+def test_rejected_keys_are_quarantined_until_none_are_left(clock):
+    pool = KeyPool(["a", "b"])
+    pool.release("a", 401)
+    pool.release("b", 403)
+    assert not pool.has_healthy_keys()
+    with pytest.raises(NoHealthyKeyError, match="quarantined"):
+        pool.acquire()
+    clock[0] += key_pool.DEFAULT_SETTINGS["quarantine_unauthorized"]
+    assert pool.has_healthy_keys()
+    stats = {s["label"]: s for s in pool.stats()}
+    assert stats[rate_limiter.key_label("a")]["unauthorized"] == 1
+
+
+def test_empty_pool_has_no_keys():
+    with pytest.raises(NoHealthyKeyError, match="No API keys"):
+        KeyPool().acquire()
+
+
+def test_keys_from_env_and_file_without_duplicates(tmp_path, monkeypatch):
+    keys_file = tmp_path / "keys.txt"
+    keys_file.write_text("# team keys\nsk-file\nsk-one  # duplicate\n", encoding="utf-8")
+    monkeypatch.setattr(key_pool.config_service, "load_env", lambda: None)
+    monkeypatch.setenv("OPENROUTER_API_KEYS", "sk-one, sk-two")
+    monkeypatch.setenv("OPENROUTER_API_KEYS_FILE", str(keys_file))
+    monkeypatch.setenv("OPENROUTER_API_KEY", "sk-two")
+    assert key_pool.load_keys() == ["sk-one", "sk-two", "sk-file"]
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "get_settings", lambda: dict(rate_limiter.DEFAULT_SETTINGS, enabled=False))
+    agent = DebateAgent("OpenAI", "test")
+    monkeypatch.setattr(agent, "key_pool", KeyPool(["sk-revoked", "sk-good"]))
+    return agent
+
+
+def client_for(valid_keys):
+    seen = []
+
+    def handler(request):
+        key = request.headers["Authorization"].split()[-1]
+        seen.append(key)
+        return httpx.Response(200 if key in valid_keys else 401, json={})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client.seen = seen
+    return client
+
+
+@pytest.mark.asyncio
+async def test_rejected_key_moves_the_request_to_the_next_key(agent):
+    client = client_for({"sk-good"})
+    data = agent._build_request("prompt", "model")
+    async with client:
+        for _ in range(3):
+            response = await agent._send_attempt(client, "prompt", data)
+            assert response.status_code == 200
+    # The revoked key was tried once, then quarantined
+    assert client.seen.count("sk-revoked") == 1
+    assert client.seen.count("sk-good") == 3
+
+
+@pytest.mark.asyncio
+async def test_last_rejection_is_returned_when_every_key_is_revoked(agent):
+    client = client_for(set())
+    data = agent._build_request("prompt", "model")
+    async with client:
+        response = await agent._send_attempt(client, "prompt", data)
+    assert response.status_code == 401
+    assert sorted(client.seen) == ["sk-good", "sk-revoked"]
+    assert not agent.key_pool.has_healthy_keys()
@@ -0,0 +1,91 @@
+import json
+import logging
+import os
+import time
+
+from debate_logger import DebateLogger, load_debate_log, load_legacy_history
+from log_archive import LogArchiver, hold, open_log, release
+
+DAY = 86400
+
+
+def write(path, text, age_days):
+    path.write_text(text, encoding="utf-8")
+    mtime = time.time() - age_days * DAY
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_closed_logs_are_archived_and_still_readable(tmp_path):
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    write(log_dir / "debate_log_old.log", "old debate", 2)
+    write(log_dir / "debate_history_old.json", json.dumps([{"agent": "OpenAI", "message": "hi"}]), 2)
+    write(log_dir / "debate_log_active.log", "still running", 0)
+    write(log_dir / "debate_log_latest.log", "newest debate", 2)
+    (log_dir / "latest_debate.log").symlink_to("debate_log_latest.log")
+    write(tmp_path / "debate_session_20250101_120000_full.log", "session", 2)
+
+    stats = LogArchiver(log_dir, tmp_path).run()
+    assert stats == {"archived": 3, "removed": 0}
+    assert sorted(p.name for p in log_dir.glob("debate_*")) == ["debate_log_active.log", "debate_log_latest.log"]
+    assert len(list((log_dir / "archive").glob("*/*.gz"))) == 3
+
+    # Readers find archived files transparently
+    assert load_debate_log(log_dir, "old") == "old debate"
+    assert load_debate_log(log_dir, "active") == "still running"
+    assert load_debate_log(log_dir, "missing") is None
+    assert load_legacy_history(log_dir, "old")[0]["message"] == "hi"
+    with open_log(tmp_path / "debate_session_20250101_120000_full.log", archive_dir=log_dir / "archive") as f:
+        assert f.read() == "session"
+
+
+def test_budgets_remove_oldest_archives_first(tmp_path):
+    for n, age in enumerate([100, 10, 5, 1]):
+        write(tmp_path / f"debate_log_{n}.log", os.urandom(300_000).hex(), age)
+    archiver = LogArchiver(tmp_path, None, max_age_days=30, max_total_mb=0.5)
+    stats = archiver.run()
+
+    # The 100-day-old log is past the age budget; of the rest (~330KB each
+    # after compression) only the newest fits in 0.5MB
+    assert stats == {"archived": 4, "removed": 3}
+    assert [p.name for p in archiver.archives()] == ["debate_log_3.log.gz"]
+
+
+def test_logs_still_being_written_are_not_archived(tmp_path):
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    debate_log = write(log_dir / "debate_log_open.log", "", 2)
+    session_log = write(tmp_path / "debate_session_20250101_120000_full.log", "session", 2)
+    handler = logging.FileHandler(debate_log, encoding="utf-8")
+    logger = logging.getLogger("test_log_archive.open")
+    logger.addHandler(handler)
+    hold(session_log)
+    try:
+        # Idle for two days, but this process still has them open
+        assert LogArchiver(log_dir, tmp_path).run()["archived"] == 0
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+        release(session_log)
+    assert LogArchiver(log_dir, tmp_path).run()["archived"] == 2
+
+
+def test_idle_debate_logger_keeps_its_log(tmp_path):
+    log_dir = tmp_path / "logs"
+    idle = DebateLogger(log_dir=str(log_dir), debate_id="idle")
+    # The newest logger takes latest_debate.log, which is never archived anyway
+    newest = DebateLogger(log_dir=str(log_dir), debate_id="newest")
+    idle.log_event("Started", "then nothing for two days")
+    idle.flush()
+    two_days_ago = time.time() - 2 * DAY
+    os.utime(idle.log_file, (two_days_ago, two_days_ago))
+    try:
+        assert LogArchiver(log_dir, None).run()["archived"] == 0
+        assert idle.log_file.exists()
+    finally:
+        idle.close()
+        newest.close()
+    idle.flush()
+    os.utime(idle.log_file, (two_days_ago, two_days_ago))
+    assert LogArchiver(log_dir, None).run()["archived"] == 1
@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+
+from log_writer import LogWriter, WriterHandler
+
+
+class ListHandler(logging.Handler):
+    """Keeps messages and counts flushes"""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.flushes = 0
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+    def flush(self):
+        self.flushes += 1
+
+
+class BrokenHandler(logging.Handler):
+    def handle(self, record):
+        raise RuntimeError("disk full")
+
+
+def record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None)
+
+
+def test_records_are_written_in_order_one_flush_per_batch():
+    writer = LogWriter(batch_size=3, flush_interval=60)
+    target = ListHandler()
+    for n in range(7):
+        assert writer.submit([target], record(str(n)))
+    assert writer.flush()
+    assert target.messages == [str(n) for n in range(7)]
+    # Two full batches, then the remainder when flush() asked for it
+    assert writer.batches == 3 and target.flushes == 3
+    writer.close()
+
+
+def test_partial_batch_is_written_after_the_flush_interval():
+    writer = LogWriter(batch_size=100, flush_interval=0.05)
+    target = ListHandler()
+    writer.submit([target], record("soon"))
+    deadline = time.monotonic() + 2.0
+    while not target.messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert target.messages == ["soon"]
+    writer.close()
+
+
+def test_full_queue_drops_instead_of_blocking():
+    writer = LogWriter(queue_size=2, batch_size=1, flush_interval=60)
+    target = ListHandler()
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    writer.submit([target], record("first"))
+    writer.call(block)
+    assert started.wait(5)
+    handler = WriterHandler([target], writer)
+    logger = logging.getLogger("test_log_writer.drops")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for n in range(4):
+            logger.info(str(n))
+    finally:
+        logger.removeHandler(handler)
+    assert handler.dropped == 2 and writer.dropped == 2
+    release.set()
+    writer.flush()
+    assert target.messages == ["first", "0", "1"]
+    writer.close()
+
+
+def test_writer_survives_a_failing_handler():
+    writer = LogWriter(batch_size=1, flush_interval=60)
+    target = ListHandler()
+    writer.submit([BrokenHandler(), target], record("still written"))
+    writer.submit([target], record("and this"))
+    writer.flush()
+    assert target.messages == ["still written", "and this"]
+    writer.close()
+
+
+def test_call_runs_after_records_queued_before_it():
+    writer = LogWriter(batch_size=100, flush_interval=60)
+    target = ListHandler()
+    seen = []
+    writer.submit([target], record("before"))
+    writer.call(lambda: seen.append(list(target.messages)))
+    writer.flush()
+    assert seen == [["before"]]
+    writer.close()
+
+
+def test_close_drains_the_queue():
+    writer = LogWriter(batch_size=100, flush_interval=60)
+    target = ListHandler()
+    for n in range(5):
+        writer.submit([target], record(str(n)))
+    writer.close()
+    assert len(target.messages) == 5
+    assert writer.stats()["written"] == 5
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import config_service
+from memory import (SUMMARY_HEADER, RetrievalMemory, RollingMemory, TurnIndex, count_tokens, create_memory,
+                    extractive_summary, key_point)
+
+
+def reply(n):
+    return f"Point number {n} is about dish {n}. " + "More filler words here. " * 5
+
+
+def test_rolling_memory_stays_within_its_token_budgets():
+    memory = RollingMemory(recent_token_budget=100, summary_token_budget=60, min_recent_turns=1)
+    sizes = []
+    for n in range(50):
+        memory.add("OpenAI" if n % 2 == 0 else "DeepSeek", reply(n))
+        stats = memory.stats()
+        assert stats["recent_tokens"] <= 100
+        assert stats["summary_tokens"] <= 60
+        sizes.append(count_tokens(memory.render()))
+    assert len(memory) == 50
+    assert memory.folded_turns + memory.stats()["recent_turns"] == 50
+    # The prompt context stops growing once the budgets are full
+    assert max(sizes[10:]) <= 100 + 60 + 2
+
+
+def test_summary_keeps_the_newest_points():
+    memory = RollingMemory(recent_token_budget=50, summary_token_budget=60, min_recent_turns=1)
+    for n in range(20):
+        memory.add("OpenAI", reply(n))
+    summary = memory.summary
+    assert summary.startswith(SUMMARY_HEADER)
+    newest_folded = memory.folded_turns - 1
+    assert f"Point number {newest_folded} is about dish {newest_folded}." in summary
+    assert "Point number 0 " not in summary
+
+
+def test_long_turn_is_kept_verbatim_even_over_budget():
+    memory = RollingMemory(recent_token_budget=10, summary_token_budget=60, min_recent_turns=1)
+    memory.add("OpenAI", "short opener.")
+    long_turn = " ".join(["word"] * 200)
+    memory.add("DeepSeek", long_turn)
+    assert memory.stats()["recent_turns"] == 1
+    assert long_turn in memory.render()
+
+
+def test_key_point_drops_stage_directions():
+    message = '*swirls wine glass* "Quality costs more. Everyone knows it."'
+    assert key_point(message) == "Quality costs more."
+    assert extractive_summary("", [{"agent": "OpenAI", "message": message}], 100) == \
+        f"{SUMMARY_HEADER}\n- OpenAI: Quality costs more."
+
+
+@pytest.mark.asyncio
+async def test_background_summarizer_folds_after_the_turn():
+    release = asyncio.Event()
+    seen = []
+
+    async def summarizer(summary, turns, budget):
+        seen.append([turn["message"] for turn in turns])
+        await release.wait()
+        return f"{SUMMARY_HEADER}\n- folded {len(turns)}"
+
+    memory = RollingMemory(recent_token_budget=10, summary_token_budget=60, summarizer=summarizer,
+                           min_recent_turns=1)
+    memory.add("OpenAI", "first point.")
+    memory.add("DeepSeek", "second point.")
+    await asyncio.sleep(0)
+    # Until the fold lands, the pending turn shows up as an extractive point
+    assert "first point." in memory.render()
+    assert memory.stats()["pending_turns"] == 1
+    release.set()
+    await memory.flush()
+    assert memory.summary.endswith("- folded 1")
+    assert seen == [["first point."]]
+    assert memory.stats()["pending_turns"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failing_summarizer_falls_back_to_extractive():
+    async def summarizer(summary, turns, budget):
+        raise RuntimeError("model unavailable")
+
+    memory = RollingMemory(recent_token_budget=10, summary_token_budget=60, summarizer=summarizer,
+                           min_recent_turns=1)
+    memory.add("OpenAI", "first point. more")
+    memory.add("DeepSeek", "second point.")
+    await memory.flush()
+    assert memory.summary == f"{SUMMARY_HEADER}\n- OpenAI: first point."
+
+
+def test_turn_index_ranks_by_similarity_and_grows():
+    index = TurnIndex(dims=1024, capacity=2)
+    texts = ["sous-vide GPU clusters", "street food on a budget", "wok hei and fast fire",
+             "GPU clusters cost a fortune", "budget street stalls win"]
+    for text in texts:
+        index.add(text)
+    assert index.size == 5
+    assert index.search("GPU clusters", k=2) == [0, 3]
+    # Rows from ``limit`` on are left out (they are already in the prompt verbatim)
+    assert index.search("GPU clusters", k=2, limit=3) == [0]
+    assert index.search("nothing in common", k=3) == []
+
+
+def test_retrieval_memory_adds_relevant_earlier_turns():
+    memory = RetrievalMemory(top_k=1, recent_turns=2, hash_dims=1024)
+    for agent, message in [("OpenAI", "Truffles justify the price."), ("DeepSeek", "Noodles are cheap."),
+                           ("OpenAI", "Service matters."), ("DeepSeek", "Speed matters more.")]:
+        memory.add(agent, message)
+    context = memory.render("Why pay for truffles?")
+    assert context.startswith("Relevant earlier turns:\n- (turn 1) OpenAI: Truffles justify the price.")
+    assert context.endswith("OpenAI: Service matters.\n\nDeepSeek: Speed matters more.")
+    assert "Noodles" not in context
+    assert "Relevant" not in memory.render()
+
+
+def test_unknown_memory_mode_is_a_config_error():
+    with pytest.raises(config_service.ConfigError):
+        create_memory("forgetful")
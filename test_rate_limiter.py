@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket
+
+SETTINGS = dict(rate_limiter.DEFAULT_SETTINGS,
+                per_model={"requests_per_minute": 60, "tokens_per_minute": 6000},
+                per_key={"requests_per_minute": 600, "tokens_per_minute": 60000},
+                models={"slow/model": {"requests_per_minute": 6}})
+
+
+def test_bucket_queues_reservations_past_empty():
+    bucket = TokenBucket(60)  # one per second
+    now = bucket.updated
+    assert bucket.reserve(60, now) == 0.0
+    # Empty: each further reservation waits behind the ones before it
+    assert bucket.reserve(1, now) == pytest.approx(1.0)
+    assert bucket.reserve(1, now) == pytest.approx(2.0)
+    # Refill pays the queue back before anything new is covered
+    assert bucket.reserve(1, now + 2.0) == pytest.approx(1.0)
+
+
+def test_bucket_refill_is_capped_at_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.reserve(30, now)
+    bucket.refill(now + 3600)
+    assert bucket.level == 60
+
+
+def test_bucket_shrinks_to_a_lower_limit():
+    bucket = TokenBucket(60)
+    bucket.configure(6)
+    assert bucket.level == 6 and bucket.rate == pytest.approx(0.1)
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Fresh limiter with small limits; sleeps are recorded instead of waited"""
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(rate_limiter, "get_settings", lambda: dict(SETTINGS))
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", sleep)
+    limiter = RateLimiter()
+    limiter.sleeps = sleeps
+    return limiter
+
+
+@pytest.mark.asyncio
+async def test_per_model_override_queues_calls(limiter):
+    for _ in range(6):
+        assert await limiter.acquire("slow/model", "sk-a", 10) == 0.0
+    # 6 requests per minute: the seventh waits ten seconds
+    assert await limiter.acquire("slow/model", "sk-a", 10) == pytest.approx(10.0, abs=0.1)
+    assert limiter.sleeps == [pytest.approx(10.0, abs=0.1)]
+    # Other models have their own buckets
+    assert await limiter.acquire("fast/model", "sk-a", 10) == 0.0
+    stats = limiter.snapshot()["queue"]
+    assert stats["calls"] == 8 and stats["queued"] == 1 and stats["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_token_budget_limits_large_requests(limiter):
+    assert await limiter.acquire("m", "sk-a", 6000) == 0.0
+    # 6000 tokens per minute = 100 per second
+    assert await limiter.acquire("m", "sk-a", 500) == pytest.approx(5.0, abs=0.1)
+
+
+@pytest.mark.asyncio
+async def test_scale_shares_the_limits(limiter):
+    limiter.scale = 0.5
+    for _ in range(3):
+        assert await limiter.acquire("slow/model", "sk-a", 1) == 0.0
+    assert await limiter.acquire("slow/model", "sk-a", 1) > 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_limiter_never_waits(limiter, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "get_settings", lambda: dict(SETTINGS, enabled=False))
+    waits = await asyncio.gather(*(limiter.acquire("slow/model", "sk-a", 10**6) for _ in range(20)))
+    assert waits == [0.0] * 20
@@ -0,0 +1,124 @@
+import asyncio
+
+import httpx
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, send_with_retry
+
+SETTINGS = dict(resilience.DEFAULT_SETTINGS, max_attempts=3, failure_threshold=2, reset_timeout=0.0,
+                max_retry_after=5.0)
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    """Fresh breakers, small thresholds, and sleeps recorded instead of waited"""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(resilience, "get_settings", lambda: dict(SETTINGS))
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience.asyncio, "sleep", sleep)
+    return delays
+
+
+def responses(*items):
+    """A send() that returns (or raises) the given items in turn"""
+    items = list(items)
+
+    async def send():
+        item = items.pop(0)
+        if isinstance(item, BaseException):
+            raise item
+        return item
+    return send
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    assert breaker.allow()
+    assert not breaker.record_failure()
+    assert breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # After the reset timeout exactly one trial call is let through
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+    # A failed trial reopens; a successful one closes
+    assert breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_stays_open_until_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [asyncio.CancelledError(), RuntimeError("no healthy key")])
+async def test_interrupted_half_open_trial_frees_the_breaker(fast_retries, error):
+    breaker = resilience.get_breaker("m")
+    breaker.record_failure()
+    breaker.record_failure()
+
+    with pytest.raises(type(error)):
+        await send_with_retry(responses(error), "m")
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # The next call gets the trial instead of short-circuiting forever
+    response = await send_with_retry(responses(httpx.Response(200)), "m")
+    assert response.status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_retries_retryable_status_then_succeeds(fast_retries):
+    response = await send_with_retry(responses(httpx.Response(503), httpx.Response(200)), "m")
+    assert response.status_code == 200
+    assert len(fast_retries) == 1
+    assert 0 <= fast_retries[0] <= SETTINGS["base_delay"]
+
+
+@pytest.mark.asyncio
+async def test_honours_retry_after(fast_retries):
+    send = responses(httpx.Response(429, headers={"Retry-After": "2"}), httpx.Response(200))
+    assert (await send_with_retry(send, "m")).status_code == 200
+    assert fast_retries == [2.0]
+
+
+@pytest.mark.asyncio
+async def test_gives_up_when_retry_after_is_too_long(fast_retries):
+    send = responses(httpx.Response(429, headers={"Retry-After": "120"}), httpx.Response(200))
+    assert (await send_with_retry(send, "m")).status_code == 429
+    assert fast_retries == []
+
+
+@pytest.mark.asyncio
+async def test_returns_last_response_or_raises_when_attempts_run_out(fast_retries):
+    send = responses(httpx.Response(502), httpx.Response(502), httpx.Response(502))
+    assert (await send_with_retry(send, "a")).status_code == 502
+
+    error = httpx.ConnectError("down")
+    with pytest.raises(httpx.ConnectError):
+        await send_with_retry(responses(error, error, error), "b")
+    breaker = resilience.get_breaker("b")
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # While the breaker is open, calls fail fast without sending
+    breaker.reset_timeout = 60.0
+    with pytest.raises(CircuitOpenError):
+        await send_with_retry(responses(), "b")
+
+
+def test_parse_retry_after():
+    assert resilience.parse_retry_after("3") == 3.0
+    assert resilience.parse_retry_after("-1") == 0.0
+    assert resilience.parse_retry_after("soon") is None
+    assert resilience.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
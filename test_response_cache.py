@@ -0,0 +1,124 @@
+import sqlite3
+
+import httpx
+import pytest
+
+import rate_limiter
+import response_cache
+import transport
+from debate_system import DebateAgent
+from key_pool import KeyPool
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = ResponseCache(path=None, memory_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"  # a is now the most recently used
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_disk_tier_backs_the_memory_tier(tmp_path, clock):
+    path = tmp_path / "cache.sqlite"
+    cache = ResponseCache(path=str(path), memory_entries=1)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    assert cache.get("a") == "A"
+    assert cache.stats()["disk_hits"] == 1 and cache.stats()["memory_hits"] == 1
+    cache.close()
+
+    # Survives a restart
+    reopened = ResponseCache(path=str(path))
+    assert reopened.get("b") == "B"
+    reopened.close()
+
+
+def test_expired_entries_miss_in_both_tiers(tmp_path, clock):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), ttl_seconds=60)
+    cache.set("a", "A")
+    clock[0] += 59
+    assert cache.get("a") == "A"
+    clock[0] += 2
+    assert cache.get("a") is None
+    cache.evict()
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+
+def test_disk_size_eviction_drops_least_recently_accessed(tmp_path, clock):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), memory_entries=1, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key.upper())
+        clock[0] += 1
+    assert cache.get("a") == "A"  # read from disk, so a's last access moves past b's
+    cache.evict()
+    assert cache.stats()["evictions"] == 1
+    cache.close()
+
+    on_disk = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    assert [on_disk.get(key) for key in ("a", "b", "c")] == ["A", None, "C"]
+    on_disk.close()
+
+
+def test_size_eviction_runs_every_hundred_writes(tmp_path, clock):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), memory_entries=1, max_entries=10)
+    for n in range(response_cache.EVICT_EVERY - 1):
+        cache.set(str(n), "x")
+        clock[0] += 1
+    assert cache.stats()["evictions"] == 0
+    cache.set("last", "x")
+    assert cache.stats()["evictions"] == response_cache.EVICT_EVERY - 10
+    cache.close()
+
+
+def test_key_covers_every_sampling_parameter():
+    messages = [{"role": "user", "content": "hi"}]
+    key = ResponseCache.make_key("m", messages, 0.9, 500)
+    assert key == ResponseCache.make_key("m", list(messages), 0.9, 500)
+    assert len({key,
+                ResponseCache.make_key("other", messages, 0.9, 500),
+                ResponseCache.make_key("m", messages, 0.7, 500),
+                ResponseCache.make_key("m", messages, 0.9, 100),
+                ResponseCache.make_key("m", [{"role": "user", "content": "hello"}], 0.9, 500)}) == 5
+
+
+class LockedCache(ResponseCache):
+    """Cache whose disk tier is locked by another process"""
+
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+    def set(self, key, value):
+        raise sqlite3.OperationalError("database is locked")
+
+
+@pytest.mark.asyncio
+async def test_locked_cache_never_loses_a_paid_reply(monkeypatch):
+    async def handler(request):
+        return httpx.Response(200, json={"choices": [{"message": {"content": "hi"}}],
+                                         "usage": {"prompt_tokens": 1, "completion_tokens": 1}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(transport, "get_client", lambda: client)
+    monkeypatch.setattr(response_cache, "get_cache", lambda: LockedCache(path=None))
+    monkeypatch.setattr(rate_limiter, "get_settings", lambda: dict(rate_limiter.DEFAULT_SETTINGS, enabled=False))
+    agent = DebateAgent("OpenAI", "test")
+    monkeypatch.setattr(agent, "key_pool", KeyPool(["sk-test"]))
+
+    try:
+        # The failed read is a miss and the failed write is skipped
+        assert await agent.call_openrouter_api("prompt", "model") == "hi"
+    finally:
+        await client.aclose()
+    assert agent.last_usage["completion_tokens"] == 1 and not agent.last_usage["cached"]
@@ -0,0 +1,73 @@
+import pytest
+
+import usage
+from usage import BudgetExceeded, UsageTotals, check_budget
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    limits = {"max_tokens_per_debate": None, "max_cost_per_debate": 0.01,
+              "max_tokens_per_session": 1000, "max_cost_per_session": None}
+    monkeypatch.setattr(usage, "get_budget", lambda: limits)
+    return limits
+
+
+@pytest.fixture
+def pricing(monkeypatch):
+    config = {"pricing": {"openai/gpt-4o": {"prompt": 2.5, "completion": 10.0}, "default": {"prompt": 1.0}}}
+    monkeypatch.setattr(usage.config_service, "get_config", lambda: config)
+
+
+def test_cost_uses_model_price_then_default(pricing):
+    assert usage.compute_cost("openai/gpt-4o", 1_000_000, 100_000) == pytest.approx(3.5)
+    assert usage.compute_cost("other/model", 500_000, 500_000) == pytest.approx(0.5)
+
+
+def test_cached_and_placeholder_replies_are_free(pricing):
+    cached = usage.make_usage("openai/gpt-4o", cached=True)
+    assert cached["cost"] == 0.0 and cached["total_tokens"] == 0 and cached["cached"]
+    assert usage.make_usage(None, 100, 100)["cost"] == 0.0
+
+
+def test_totals_roll_up_turns_and_discarded_replies():
+    totals = UsageTotals()
+    totals.add({"prompt_tokens": 100, "completion_tokens": 50, "cost": 0.2, "latency": 2.0})
+    totals.add({"prompt_tokens": 10, "completion_tokens": None, "cost": None, "latency": None})
+    totals.add(None)
+    totals.add_discarded({"prompt_tokens": 100, "completion_tokens": 10, "cost": 0.1, "latency": 9.0})
+    assert totals.as_dict() == {
+        "turns": 3, "prompt_tokens": 210, "completion_tokens": 60, "total_tokens": 270,
+        "cost": 0.3, "total_latency": 2.0, "avg_latency": 0.667,
+    }
+
+
+def test_with_discarded_keeps_the_winners_record():
+    winner = usage.make_usage("a", 10, 5, latency=1.0)
+    merged = usage.with_discarded(winner, [{"prompt_tokens": 10, "completion_tokens": 7, "total_tokens": 17,
+                                            "cost": 0.5}])
+    assert merged["model"] == "a" and merged["latency"] == 1.0
+    assert merged["total_tokens"] == 32 and merged["cost"] == pytest.approx(winner["cost"] + 0.5)
+    assert winner["total_tokens"] == 15
+
+
+def test_budget_stops_at_the_ceiling(budget):
+    totals = UsageTotals()
+    check_budget(totals, "debate")
+    totals.add({"prompt_tokens": 1, "cost": 0.01})
+    with pytest.raises(BudgetExceeded, match="Cost budget reached for this debate"):
+        check_budget(totals, "debate")
+    # The session has a token limit only
+    check_budget(totals, "session")
+
+
+def totals_with(tokens):
+    totals = UsageTotals()
+    totals.add({"prompt_tokens": tokens, "completion_tokens": 0, "cost": 0.0})
+    return totals
+
+
+def test_scaled_budget_is_a_share_of_the_limit(budget):
+    check_budget(totals_with(300), "session")
+    check_budget(totals_with(240), "session", scale=0.25)
+    with pytest.raises(BudgetExceeded, match="250"):
+        check_budget(totals_with(300), "session", scale=0.25)
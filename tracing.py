@@ -0,0 +1,383 @@
+"""Lightweight timing spans for the debate pipeline.
+
+Code paths wrap their steps in ``tracing.span(name, **attributes)``; spans
+nest, and ``tracing.context(debate_id=..., turn=...)`` tags every span
+started inside it, so one turn's prompt building, provider wait, response
+parsing, log writes and rendering can be told apart. Finished spans go to
+a pluggable sink:
+
+- ``jsonl``: one JSON object per line in a file
+- ``memory``: an in-memory ring buffer (``get_sink().spans()``)
+- ``otlp_json``: OTLP/JSON lines, readable by an OpenTelemetry collector's
+  file receiver
+- ``opentelemetry``: forwarded to the OpenTelemetry API, if installed
+
+Tracing is configured from the ``tracing`` section of config.yaml when this
+module is first imported. When it is disabled, ``span`` and ``context``
+return a shared no-op object, so instrumented code pays one function call
+and a ``None`` check per span.
+"""
+
+import contextlib
+import contextvars
+import importlib.util
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import config_service
+
+# Defaults used when config.yaml has no ``tracing`` section
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "sink": "jsonl",                # jsonl, memory, otlp_json or opentelemetry
+    "path": "logs/traces.jsonl",
+    "ring_size": 1000,
+    "service_name": "ai-debate-simulator",
+}
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("debate_current_span", default=None)
+_tags: contextvars.ContextVar = contextvars.ContextVar("debate_trace_tags", default={})
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def get_settings() -> dict:
+    try:
+        return dict(DEFAULT_SETTINGS, **config_service.get_config().get("tracing", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_SETTINGS)
+
+
+def opentelemetry_available() -> bool:
+    """Return True if the optional ``opentelemetry`` package is installed"""
+    return importlib.util.find_spec("opentelemetry") is not None
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """One timed step; attributes can be added until it ends"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "tags", "attributes",
+                 "start_ns", "_start", "duration", "error", "_tokens")
+
+    def __init__(self, name: str, attributes: Dict, parent: Optional["Span"] = None, tags: Optional[Dict] = None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.parent_id = parent.span_id if parent else None
+        # Tags are inherited by every span started while this one is active
+        self.tags = dict(_tags.get(), **tags) if tags else _tags.get()
+        self.attributes = dict(self.tags, **attributes)
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self._tokens = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None):
+        """Finish the span and hand it to the sink (only the first call counts)"""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        sink = _sink
+        if sink is not None:
+            sink.export(self)
+
+    def __enter__(self):
+        self._tokens = (_current_span.set(self), _tags.set(self.tags))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._tokens[0])
+        _tags.reset(self._tokens[1])
+        self.end(exc)
+        return False
+
+    def as_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration": self.duration,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+# --- Sinks -------------------------------------------------------------------
+
+class RingBufferSink:
+    """Keep the most recent spans in memory"""
+
+    def __init__(self, size: int = DEFAULT_SETTINGS["ring_size"]):
+        self._spans = deque(maxlen=size)
+
+    def export(self, span: Span):
+        self._spans.append(span.as_dict())
+
+    def spans(self) -> List[Dict]:
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """Append one JSON object per span to a file"""
+
+    def __init__(self, path: str = DEFAULT_SETTINGS["path"]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _line(self, span: Span) -> str:
+        return json.dumps(span.as_dict(), ensure_ascii=False, default=str)
+
+    def export(self, span: Span):
+        line = self._line(span)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPJsonSink(JsonlSink):
+    """Write spans as OTLP/JSON export requests, one per line"""
+
+    def __init__(self, path: str = "logs/traces.otlp.jsonl", service_name: str = DEFAULT_SETTINGS["service_name"]):
+        super().__init__(path)
+        self.service_name = service_name
+
+    def _line(self, span: Span) -> str:
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.start_ns + int(span.duration * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)}
+                           for k, v in span.attributes.items() if v is not None],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            otlp_span["parentSpanId"] = span.parent_id
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "debate"}, "spans": [otlp_span]}],
+        }]}, ensure_ascii=False)
+
+
+class OpenTelemetrySink:
+    """Forward finished spans to the OpenTelemetry API (requires ``opentelemetry``)
+
+    Spans are re-created with their original start and end times; the
+    configured OpenTelemetry SDK decides where they are exported.
+    """
+
+    def __init__(self, service_name: str = DEFAULT_SETTINGS["service_name"]):
+        from opentelemetry import trace
+        self._trace = trace
+        self._tracer = trace.get_tracer(service_name)
+
+    def export(self, span: Span):
+        otel_span = self._tracer.start_span(
+            span.name,
+            start_time=span.start_ns,
+            attributes={k: v if isinstance(v, (bool, int, float, str)) else str(v)
+                        for k, v in span.attributes.items() if v is not None}
+        )
+        if span.error:
+            otel_span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, span.error))
+        otel_span.end(end_time=span.start_ns + int(span.duration * 1e9))
+
+    def close(self):
+        pass
+
+
+def make_sink(settings: dict):
+    """Build the sink named in the tracing settings"""
+    kind = settings["sink"]
+    if kind == "memory":
+        return RingBufferSink(settings["ring_size"])
+    if kind == "jsonl":
+        return JsonlSink(settings["path"])
+    if kind == "otlp_json":
+        return OTLPJsonSink(settings["path"], settings["service_name"])
+    if kind == "opentelemetry":
+        if not opentelemetry_available():
+            raise config_service.ConfigError("tracing sink 'opentelemetry' needs the opentelemetry package")
+        return OpenTelemetrySink(settings["service_name"])
+    raise config_service.ConfigError(f"Unknown tracing sink: {kind}")
+
+
+def configure(settings: Optional[dict] = None, sink=None):
+    """(Re)configure tracing
+
+    Args:
+        settings: Tracing settings (defaults to the ``tracing`` section of config.yaml)
+        sink: A ready-made sink to use instead of building one from the settings
+    """
+    global _sink
+    settings = dict(DEFAULT_SETTINGS, **(settings if settings is not None else get_settings()))
+    if sink is None and settings["enabled"]:
+        try:
+            sink = make_sink(settings)
+        except (config_service.ConfigError, OSError) as e:
+            print(f"Tracing disabled: {e}")
+            sink = None
+    with _sink_lock:
+        previous, _sink = _sink, sink
+    if previous is not None and previous is not sink:
+        previous.close()
+
+
+def disable():
+    configure({"enabled": False})
+
+
+def enabled() -> bool:
+    return _sink is not None
+
+
+def get_sink():
+    return _sink
+
+
+def span(name: str, tags: Optional[Dict] = None, **attributes):
+    """Time a block as a child of the current span
+
+    Usage:
+        with tracing.span("provider.request", model=model) as s:
+            ...
+            s.set(status_code=response.status_code)
+    """
+    if _sink is None:
+        return _NOOP
+    return Span(name, attributes, _current_span.get(), tags)
+
+
+def start_span(name: str, tags: Optional[Dict] = None, **attributes):
+    """Start a span that is ended explicitly with ``.end()``
+
+    Unlike ``span`` it does not become the parent of spans started later,
+    so it is safe to keep open across ``yield`` in async generators; use
+    ``activate`` or ``traced`` to parent work under it.
+    """
+    if _sink is None:
+        return _NOOP
+    return Span(name, attributes, _current_span.get(), tags)
+
+
+@contextlib.contextmanager
+def _tagged(tags: Dict):
+    token = _tags.set(dict(_tags.get(), **tags))
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+@contextlib.contextmanager
+def _activated(parent: Span):
+    tokens = (_current_span.set(parent), _tags.set(parent.tags))
+    try:
+        yield parent
+    finally:
+        _current_span.reset(tokens[0])
+        _tags.reset(tokens[1])
+
+
+def activate(parent):
+    """Make a ``start_span`` span the parent of spans started in this block
+
+    The block must not contain a ``yield``.
+    """
+    if not isinstance(parent, Span):
+        return _NOOP
+    return _activated(parent)
+
+
+async def traced(agen, parent):
+    """Iterate an async generator with ``parent`` active during each step
+
+    Every step of a stream consumed through ``transport.iterate`` runs in
+    its own task, so context variables set in one step are gone in the
+    next; this re-activates the parent around each step instead.
+    """
+    if not isinstance(parent, Span):
+        async for item in agen:
+            yield item
+        return
+    try:
+        while True:
+            with _activated(parent):
+                try:
+                    item = await agen.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        await agen.aclose()
+
+
+def context(**tags):
+    """Tag every span started in this block (e.g. debate_id, turn, agent)"""
+    if _sink is None:
+        return _NOOP
+    return _tagged(tags)
+
+
+configure()
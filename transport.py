@@ -0,0 +1,185 @@
+"""Shared async HTTP transport for provider calls.
+
+Every agent and every debate in the process goes through one pooled
+``httpx.AsyncClient`` per event loop, so keep-alive connections (and HTTP/2
+streams when the ``h2`` package is installed) are reused across turns instead
+of paying a fresh TCP+TLS handshake each time.
+
+Streamlit scripts should use ``run()`` instead of ``asyncio.run()``: it
+executes coroutines on a long-lived background loop, so the connection pool
+survives script reruns.
+"""
+
+import asyncio
+import atexit
+import importlib.util
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+# Defaults used when config.yaml has no ``http`` section
+DEFAULT_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,
+    "connect_timeout": 10.0,
+    "read_timeout": 60.0,
+    "write_timeout": 10.0,
+    "pool_timeout": 10.0,
+    "http2": True,
+}
+
+_settings = dict(DEFAULT_SETTINGS)
+_custom_transport: Optional[httpx.AsyncBaseTransport] = None
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_background_thread: Optional[threading.Thread] = None
+
+
+def http2_available() -> bool:
+    """Return True if the optional ``h2`` package needed for HTTP/2 is installed"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def configure(settings: Optional[dict] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+    """Update pool limits and timeouts used for new clients.
+
+    Args:
+        settings: Mapping with any of the keys in ``DEFAULT_SETTINGS``
+            (typically the ``http`` section of config.yaml)
+        transport: Optional custom httpx transport (e.g. ``httpx.MockTransport``)
+
+    Clients that already exist keep their settings until ``reset()`` is called.
+    """
+    global _custom_transport
+    with _lock:
+        if settings:
+            _settings.update({k: v for k, v in settings.items() if k in DEFAULT_SETTINGS})
+        if transport is not None:
+            _custom_transport = transport
+
+
+def get_settings() -> dict:
+    """Return a copy of the current transport settings"""
+    with _lock:
+        return dict(_settings)
+
+
+def _build_client() -> httpx.AsyncClient:
+    settings = get_settings()
+    limits = httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive_connections"],
+        keepalive_expiry=settings["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(
+        connect=settings["connect_timeout"],
+        read=settings["read_timeout"],
+        write=settings["write_timeout"],
+        pool=settings["pool_timeout"],
+    )
+    kwargs = {"limits": limits, "timeout": timeout}
+    if _custom_transport is not None:
+        kwargs["transport"] = _custom_transport
+    else:
+        kwargs["http2"] = bool(settings["http2"]) and http2_available()
+    return httpx.AsyncClient(**kwargs)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the pooled client for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _build_client()
+        with _lock:
+            _clients[loop] = client
+    return client
+
+
+async def aclose():
+    """Close the client bound to the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def reset():
+    """Forget all clients so the next call picks up new settings or transports"""
+    global _custom_transport
+    with _lock:
+        _clients.clear()
+        _custom_transport = None
+
+
+def _ensure_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop, _background_thread
+    with _lock:
+        if _background_loop is None or _background_loop.is_closed():
+            _background_loop = asyncio.new_event_loop()
+            _background_thread = threading.Thread(
+                target=_background_loop.run_forever,
+                name="debate-transport-loop",
+                daemon=True
+            )
+            _background_thread.start()
+        return _background_loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the shared background loop.
+
+    Returns:
+        A ``concurrent.futures.Future`` for the coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _ensure_background_loop())
+
+
+def run(coro, timeout: Optional[float] = None):
+    """Run a coroutine on the shared background loop and wait for its result"""
+    return submit(coro).result(timeout)
+
+
+async def _anext(agen):
+    try:
+        return False, await agen.__anext__()
+    except StopAsyncIteration:
+        return True, None
+
+
+def iterate(agen):
+    """Consume an async iterator from synchronous code, one item at a time.
+
+    Each step runs on the shared background loop, so the caller (e.g. a
+    Streamlit script) can render items as they arrive.
+    """
+    try:
+        while True:
+            done, item = run(_anext(agen))
+            if done:
+                return
+            yield item
+    finally:
+        run(agen.aclose())
+
+
+def _shutdown():
+    """Close pooled connections on interpreter exit"""
+    loop = _background_loop
+    if loop is None or loop.is_closed():
+        return
+    try:
+        submit(aclose()).result(5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+
+
+atexit.register(_shutdown)
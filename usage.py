@@ -0,0 +1,142 @@
+"""Token usage, cost accounting and budget guards.
+
+Prices come from the ``pricing`` section of config.yaml (USD per million
+prompt and completion tokens, per model). ``UsageTotals`` rolls turns up
+per debate or per session, and ``check_budget`` raises ``BudgetExceeded``
+once a token or cost ceiling from the ``budget`` section is reached.
+"""
+
+from typing import List, Optional
+
+import config_service
+
+# Defaults used when config.yaml has no ``budget`` section (None = no limit)
+DEFAULT_BUDGET = {
+    "max_tokens_per_debate": None,
+    "max_cost_per_debate": None,
+    "max_tokens_per_session": None,
+    "max_cost_per_session": None,
+}
+
+
+class BudgetExceeded(Exception):
+    """Raised when a debate or session has used up its token or cost budget"""
+
+
+def get_budget() -> dict:
+    try:
+        return dict(DEFAULT_BUDGET, **config_service.get_config().get("budget", {}))
+    except config_service.ConfigError:
+        return dict(DEFAULT_BUDGET)
+
+
+def get_price(model: str) -> dict:
+    """Per-million-token prices for a model (zero if the model is not listed)"""
+    try:
+        pricing = config_service.get_config().get("pricing", {})
+    except config_service.ConfigError:
+        pricing = {}
+    price = pricing.get(model) or pricing.get("default") or {}
+    return {"prompt": float(price.get("prompt", 0.0)), "completion": float(price.get("completion", 0.0))}
+
+
+def compute_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost in USD of one call"""
+    price = get_price(model)
+    return (prompt_tokens * price["prompt"] + completion_tokens * price["completion"]) / 1_000_000
+
+
+def make_usage(model: Optional[str], prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency: Optional[float] = None, cached: bool = False) -> dict:
+    """Build the usage record stored with each turn
+
+    Cached and placeholder replies carry zero tokens and zero cost.
+    """
+    return {
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "latency": latency,
+        "cost": compute_cost(model, prompt_tokens, completion_tokens) if model else 0.0,
+        "cached": cached,
+    }
+
+
+def with_discarded(record: dict, discarded: List[dict]) -> dict:
+    """``record`` plus the tokens and cost of replies that were thrown away (e.g. losing hedges)"""
+    record = dict(record)
+    for other in discarded:
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens", "cost"):
+            record[key] = (record.get(key) or 0) + (other.get(key) or 0)
+    return record
+
+
+class UsageTotals:
+    """Running totals of tokens, cost and latency across turns"""
+
+    def __init__(self):
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.latency = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, usage: Optional[dict]):
+        """Add one turn's usage record (as built by make_usage)"""
+        self.turns += 1
+        if not usage:
+            return
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        self.cost += usage.get("cost") or 0.0
+        self.latency += usage.get("latency") or 0.0
+
+    def add_discarded(self, usage: Optional[dict]):
+        """Add the tokens and cost of a reply that was thrown away
+
+        Discarded replies (e.g. a cancelled prefetch) are still billed but are
+        not turns, so they do not count towards the turn or latency averages.
+        """
+        if not usage:
+            return
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        self.cost += usage.get("cost") or 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cost": round(self.cost, 6),
+            "total_latency": round(self.latency, 3),
+            "avg_latency": round(self.latency / self.turns, 3) if self.turns else 0.0,
+        }
+
+
+def check_budget(totals: UsageTotals, scope: str = "debate", scale: float = 1.0):
+    """Raise BudgetExceeded if ``totals`` has reached the configured ceiling
+
+    Args:
+        totals: Usage so far
+        scope: "debate" or "session", selecting which limits apply
+        scale: Share of the limits available to ``totals`` (e.g. one of
+            several worker processes splitting a session budget)
+    """
+    budget = get_budget()
+    max_tokens = budget.get(f"max_tokens_per_{scope}")
+    max_cost = budget.get(f"max_cost_per_{scope}")
+    if max_tokens is not None:
+        max_tokens = int(max_tokens * scale)
+    if max_cost is not None:
+        max_cost = max_cost * scale
+    if max_tokens is not None and totals.total_tokens >= max_tokens:
+        raise BudgetExceeded(f"Token budget reached for this {scope}: {totals.total_tokens}/{max_tokens} tokens")
+    if max_cost is not None and totals.cost >= max_cost:
+        raise BudgetExceeded(f"Cost budget reached for this {scope}: ${totals.cost:.4f}/${max_cost:.4f}")